@@ -1,99 +1,120 @@
 import random
+from bisect import bisect_right
+from itertools import accumulate
+
+import numpy as np
+
+from Demand_Rules import default_model
+from Population import Cohorts, Population, simulate_market_cohorts, simulate_market_columnar
+from Stores import resolve_stores
+
 
 class Agent:
-    def __init__(self, name):
+    def __init__(self, name, rng=random, stores=None):
         self.name = name
-        self.create_customer()
+        self.create_customer(rng, stores)
         self.buy_chance = 0
         self.bought = False
         self.purchase_amount = 0
 
-    def create_customer(self):
+    def create_customer(self, rng=random, stores=None):
         """Assign randomized customer attributes."""
-        locations = [f"Store {i}" for i in range(1, 6)]
-        self.base = random.randint(80, 100)
-        self.age = random.randint(18, 70)
-        self.salary = random.randint(5000, 12000)
-        self.influence = random.uniform(0, 1)
-        self.location = random.choice(locations)
-        self.health = random.randint(50, 100)
-        self.alternative_pull = random.uniform(0, 1)
-        self.festivity = random.uniform(0, 1)
-
-
-def create_population(size: int):
-    """Create a list of agents representing customers."""
-    return [Agent(f"Customer_{i+1}") for i in range(size)]
-
-
-def simulate_market(population, soda_price=3.25, base_popularity=1.0):
+        stores = resolve_stores(stores)
+        self.base = rng.randint(80, 100)
+        self.age = rng.randint(18, 70)
+        self.salary = rng.randint(5000, 12000)
+        self.influence = rng.uniform(0, 1)
+        self.location = stores.choose(rng)  # Store ID
+        self.health = rng.randint(50, 100)
+        self.alternative_pull = rng.uniform(0, 1)
+        self.festivity = rng.uniform(0, 1)
+
+
+def create_population(size: int, columnar=False, cohorts=False, rng=None, model=None, stores=None):
+    """Create a list of agents representing customers (or a columnar Population / Cohorts under `model`'s rules)."""
+    stores = resolve_stores(stores)
+    if cohorts:
+        return Cohorts.generate(size, rng, model, stores)
+    if columnar:
+        return Population.generate(size, rng, stores)
+    rng = rng if rng is not None else random
+    return [Agent(f"Customer_{i+1}", rng, stores) for i in range(size)]
+
+
+def simulate_market(population, soda_price=None, base_popularity=1.0, rng=None, model=None, stores=None, counts=None):
     """
     Simulate soda sales across all agents and store locations.
 
+    Uses the "agent" variant of demand_rules.json by default ($3.25 a can,
+    every buyer takes a 6-pack); pass a DemandModel as `model` for other rules.
+    Agent objects get their buy_chance and bought attributes updated; a list
+    of agents needs its StoreTable as `stores` unless it uses the default 5.
+    A `counts` dict receives "purchases", the number of customers who bought.
+
     Returns:
         total_sales (int)
         total_revenue (float)
         popularity (float)
-        store_sales_list (list of dict)
+        store_sales (int64 array, cans sold per store ID)
     """
-    total_sales = 0
-    total_revenue = 0
-    store_sales = {f"Store {i}": 0 for i in range(1, 6)}
-    popularity = base_popularity
+    model = model or default_model("agent")
+    if isinstance(population, Population):
+        return simulate_market_columnar(population, soda_price, base_popularity, rng, model=model, counts=counts)
+    if isinstance(population, Cohorts):
+        return simulate_market_cohorts(population, soda_price, base_popularity, rng, model=model, counts=counts)
+    return simulate_market_agents(population, soda_price, base_popularity, rng, model, record=True, stores=stores,
+                                  counts=counts)
 
-    for agent in population:
-        # --- Buying probability logic ---
-        agent.buy_chance = agent.base / 100
-
-        # Age influence
-        if 18 <= agent.age <= 28:
-            agent.buy_chance += 0.03
-        elif agent.age >= 70:
-            agent.buy_chance -= 0.03
-
-        # Salary influence
-        if agent.salary < 7000:
-            agent.buy_chance += 0.10
-        elif agent.salary < 10000:
-            agent.buy_chance += 0.07
-        else:
-            agent.buy_chance += 0.04
-
-        # Health influence
-        if agent.health >= 90:
-            agent.buy_chance -= 0.05
-        elif 50 <= agent.health < 89:
-            agent.buy_chance += 0.03
-
-        # Festivity and alternatives
-        if agent.festivity >= 0.8:
-            agent.buy_chance += 0.10
-        if agent.alternative_pull >= 0.7:
-            agent.buy_chance -= 0.15
 
-        # Clamp between 0 and 1
-        agent.buy_chance = max(0.0, min(agent.buy_chance, 1.0))
+def simulate_market_agents(agents, soda_price=None, base_popularity=1.0, rng=None, model=None, record=False,
+                           stores=None, counts=None, columns=None):
+    """
+    simulate_market for a list of Agent objects. Buy chances come from the
+    compiled demand rules over the agents' attributes (no per-agent rule
+    branching); only the purchase draws are made agent by agent, from `rng`.
+    With record=True each agent keeps its buy_chance and whether it bought.
+    Pass `columns` (Population.from_agents of the same agents) to reuse one
+    columnar view, and its cached buy chances, across months.
+    """
+    model = model or default_model()
+    rng = rng if rng is not None else random
+    soda_price = model.default_price if soda_price is None else soda_price
+    if columns is None:
+        columns = Population.from_agents(agents, stores)
+    chances = model.at_price(columns.buy_chance(model), soda_price).tolist()
+    influential = columns.influential(model).tolist()
+    cumulative = list(accumulate(model.can_probs.tolist()))
+    can_counts = model.can_counts.tolist()
+
+    buyer_stores, buyer_cans = [], []
+    popularity = base_popularity
 
+    for agent, chance, is_influential in zip(agents, chances, influential):
         # --- Purchase decision ---
-        if random.random() <= agent.buy_chance:
-            agent.bought = True
-            cans_bought = 6
-            total_sales += cans_bought
-            total_revenue += soda_price * cans_bought
-            store_sales[agent.location] += cans_bought
-
-            # Influential boost
-            if agent.influence >= 0.7:
-                popularity += 0.02
+        bought = rng.random() <= chance
+        if record:
+            agent.buy_chance = chance
+            agent.bought = bought
+        if not bought:
+            continue
+        if model.fixed_cans is not None:
+            cans = model.fixed_cans
         else:
-            agent.bought = False
-
-    # --- Store performance effects ---
-    best_store = max(store_sales, key=store_sales.get)
-    if store_sales[best_store] > (len(population) * 3):
-        popularity += 0.03
+            cans = can_counts[min(bisect_right(cumulative, rng.random()), len(can_counts) - 1)]
+        buyer_stores.append(agent.location)
+        buyer_cans.append(cans)
 
-    # Convert to list format for charts
-    store_sales_list = [{"store": k, "sales": v} for k, v in store_sales.items()]
+        # Influential boost
+        if is_influential:
+            popularity += model.influencer_boost
 
-    return total_sales, total_revenue, popularity, store_sales_list
+    # --- Store performance effects ---
+    total_sales = sum(buyer_cans)
+    if counts is not None:
+        counts["purchases"] = len(buyer_cans)
+    store_sales = np.bincount(np.array(buyer_stores, dtype=np.intp), weights=buyer_cans,
+                              minlength=len(columns.stores)).astype(np.int64)
+    if store_sales.max() > len(agents) * model.best_store_cans:
+        popularity += model.best_store_boost
+
+    return total_sales, soda_price * total_sales, popularity, store_sales
@@ -0,0 +1,123 @@
+"""
+How much did each event earn or cost?
+
+The run is replayed with one event occurrence (or one classification of
+events) suppressed. Counterfactuals use the same seed, and a suppressed event
+still consumes its random draws and goes on cooldown, so every other draw and
+event is identical and only the event's effect differs. Each counterfactual starts from a snapshot taken just
+before its first suppressed event, so the shared months before it are never
+re-simulated, and the counterfactuals run in a batch across a process pool.
+
+Snapshots are state-only and only taken before months that can trigger an
+event; the history and events before them are sliced from the finished
+baseline, so recording them costs the same every month however long the run.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from Simulation import Simulation
+
+REPORT_METRICS = ("profit", "sold", "storage")
+
+
+def _final_metrics(history):
+    """Cumulative profit, total cans sold and final storage of a history."""
+    return {
+        "profit": float(history["profit"][-1]) if len(history) else 0.0,
+        "sold": float(history["sold"].sum()),
+        "storage": float(history["storage"][-1]) if len(history) else 0.0,
+    }
+
+
+def _run_counterfactuals(tasks):
+    """Worker: run each (snapshot state, history prefix, suppressed keys) task to the end."""
+    population = None
+    results = []
+    for state, prefix, suppressed in tasks:
+        # Every task replays the same customers, so generate them once per worker
+        sim = Simulation.from_snapshot(state, prefix, population=population)
+        population = sim.population
+        sim.event_manager.suppressed = set(suppressed)
+        sim.run()
+        results.append(_final_metrics(sim.history))
+    return results
+
+
+class AttributionResult:
+    def __init__(self, baseline, impacts, by):
+        self.baseline = baseline  # Final metrics of the actual run
+        self.impacts = impacts  # One dict per event (or classification), with delta_<metric> = actual - without
+        self.by = by
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.impacts)
+
+
+def attribute_events(sim_kwargs, by="event", processes=None):
+    """
+    Impact of every event of a run of Simulation(**sim_kwargs).
+
+    by="event" suppresses each occurrence on its own; by="classification"
+    suppresses all Popularity, Production or Market events at once. Deltas
+    are actual minus counterfactual, so a positive delta_profit means the
+    event earned money. sim_kwargs must include a seed.
+    """
+    baseline = Simulation(**sim_kwargs)
+    snapshots = {}  # Month (1-based) -> state at the start of that month
+
+    def before_month():
+        # Months whose event roll fails can't start an event, so they need no snapshot
+        if baseline.month < baseline.months and baseline.event_manager.may_trigger():
+            return baseline.snapshot(history=False)[0]
+        return None
+
+    previous = before_month()
+    for record in baseline.run_iter():
+        if record["events"]:
+            snapshots[record["month"]] = previous
+        previous = before_month()
+    history = baseline.history.to_numpy()
+    full = baseline.snapshot()[0]
+
+    def start_state(month):
+        """The snapshot before `month`, with the monthly events and event history of the months before it."""
+        state = snapshots[month]
+        events = {**state["events"], "history": [entry for entry in full["events"]["history"] if entry[1] < month]}
+        return {**state, "events": events, "monthly_events": full["monthly_events"][:month - 1]}
+
+    impacts, tasks = [], []
+    if by == "event":
+        for event, month in baseline.event_manager.event_history:
+            impacts.append({"event": event["Name"], "classification": event["Classification"], "month": month})
+            tasks.append((start_state(month), history[:month - 1], [(event["Name"], month)]))
+    elif by == "classification":
+        first_month = {}
+        counts = {}
+        for event, month in baseline.event_manager.event_history:
+            first_month.setdefault(event["Classification"], month)
+            counts[event["Classification"]] = counts.get(event["Classification"], 0) + 1
+        for classification, month in first_month.items():
+            impacts.append({"classification": classification, "events": counts[classification], "month": month})
+            tasks.append((start_state(month), history[:month - 1], [classification]))
+    else:
+        raise ValueError(f"Unknown attribution grouping: {by}")
+
+    processes = min(processes or os.cpu_count() or 1, max(1, len(tasks)))
+    chunks = [tasks[i::processes] for i in range(processes)]
+    if processes == 1:
+        outcomes = _run_counterfactuals(tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunk_outcomes = list(pool.map(_run_counterfactuals, chunks))
+        # Undo the round-robin split
+        outcomes = [None] * len(tasks)
+        for i, chunk in enumerate(chunk_outcomes):
+            outcomes[i::processes] = chunk
+
+    actual = _final_metrics(baseline.history)
+    for impact, outcome in zip(impacts, outcomes):
+        for metric in REPORT_METRICS:
+            impact[f"delta_{metric}"] = actual[metric] - outcome[metric]
+    return AttributionResult(actual, impacts, by)
@@ -0,0 +1,212 @@
+"""
+Run simulations from a config file without starting Streamlit.
+
+    python Batch_Run.py batch_example.json --output results
+
+The config is JSON (or TOML) with optional "defaults" and a list of "runs".
+Every run accepts the Simulation settings (years or months, growth_rate,
+population_size, resources, soda_price, backend, production_mode, seed,
+population_file, demand_rules, stores) plus a "name", and "ensemble": N to
+run N replicas and write P5/P50/P95 bands instead of one history. "scenarios": [...] runs a list of
+what-if variants (growth_rate / resources / soda_price overrides) in one
+batched pass and writes a per-scenario summary plus their monthly profits.
+
+Single runs with "stores" set also write the last month's sales of every
+store, best first, to <name>_stores.csv.
+
+Single runs with "checkpoint_every" save a checkpoint as they go; run again
+with --resume to continue unfinished runs from their last checkpoint.
+
+With --registry soda_runs.sqlite every run is also stored in the local run
+registry (see Run_Registry.py), to query and overlay later.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from History import METRIC_NAMES, HistoryWriter
+from Simulation import Simulation
+
+DEFAULTS = {
+    "years": 1,
+    "growth_rate": 0.05,
+    "population_size": 50,
+    "resources": {"farms": 1, "waterpumps": 1, "mines": 1},
+    "soda_price": 1.25,
+    "backend": "columnar",
+    "production_mode": "sampled",
+    "seed": None,
+    "population_file": None,  # Saved population (Population.save) to memory-map instead of generating
+    "demand_rules": None,  # Demand spec file (default demand_rules.json)
+    "stores": None,  # Store count, or a .json / .csv store table (see Stores.py); default 5 stores
+    "checkpoint_every": None,  # Months between checkpoints of single runs (<name>.ckpt.npz)
+}
+
+
+def load_config(path):
+    """Read a JSON or TOML batch config and return the list of fully specified runs."""
+    if path.endswith(".toml"):
+        import tomllib
+
+        with open(path, "rb") as f:
+            config = tomllib.load(f)
+    else:
+        with open(path) as f:
+            config = json.load(f)
+
+    defaults = {**DEFAULTS, **config.get("defaults", {})}
+    runs = []
+    for i, run in enumerate(config.get("runs", [{}])):
+        run = {**defaults, **run}
+        run.setdefault("name", f"run_{i + 1}")
+        run.setdefault("months", run["years"] * 12)
+        runs.append(run)
+    return runs
+
+
+def write_csv(path, columns):
+    """Write a dict of equal-length columns as a CSV file."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns.keys())
+        writer.writerows(zip(*columns.values()))
+
+
+def run_params(run):
+    """The settings of a run, as stored in the registry."""
+    return {key: run[key] for key in ("months", "growth_rate", "population_size", "resources", "soda_price",
+                                      "backend", "production_mode", "population_file", "demand_rules", "stores")}
+
+
+def run_single(run, output_dir, export_format="csv", resume=False, registry=None):
+    checkpoint_path = os.path.join(output_dir, f"{run['name']}.ckpt.npz")
+    if resume and os.path.exists(checkpoint_path):
+        sim = Simulation.load_checkpoint(checkpoint_path)
+        print(f"{run['name']}: resuming after month {sim.month}")
+    else:
+        sim = Simulation(months=run["months"], growth_rate=run["growth_rate"],
+                         population_size=run["population_size"], resources=run["resources"],
+                         soda_price=run["soda_price"], backend=run["backend"], production_mode=run["production_mode"], seed=run["seed"],
+                         population_file=run["population_file"], demand_rules=run["demand_rules"],
+                         stores=run["stores"])
+    sim.run(checkpoint_path=checkpoint_path, checkpoint_every=run["checkpoint_every"])
+    if export_format == "csv":
+        write_csv(os.path.join(output_dir, f"{run['name']}.csv"), sim.history_table())
+    else:
+        with HistoryWriter(os.path.join(output_dir, f"{run['name']}.{export_format}"), export_format) as writer:
+            writer.write(sim.history)
+    if run["stores"] is not None:
+        stores = sim.stores.sales_frame(sim.store_sales).sort_values("sales", ascending=False)
+        write_csv(os.path.join(output_dir, f"{run['name']}_stores.csv"),
+                  {column: stores[column].tolist() for column in stores.columns})
+    if registry is not None:
+        registry.record_run(run_params(run), sim.history, seed=sim.seed, name=run["name"])
+    return {
+        "seed": sim.seed,
+        "total_profit": float(sim.profit_history[-1]) if len(sim.profit_history) else 0.0,
+        "avg_monthly_profit": float(sim.monthly_profit_history.mean()) if len(sim.monthly_profit_history) else 0.0,
+        "total_revenue": float(sim.revenue_history.sum()),
+        "total_sold": int(sim.sold_history.sum()),
+        "events": len(sim.event_manager.event_history),
+    }
+
+
+def run_ensemble_bands(run, output_dir, processes, registry=None):
+    # Only ensemble runs pay for the process pool machinery
+    from Ensemble import run_ensemble
+
+    result = run_ensemble(run["ensemble"], run["months"], run["growth_rate"], run["population_size"],
+                          resources=run["resources"], processes=processes, backend=run["backend"],
+                          production_mode=run["production_mode"], seed=run["seed"],
+                          population_file=run["population_file"], demand_rules=run["demand_rules"],
+                          stores=run["stores"], registry=registry, name=run["name"], soda_price=run["soda_price"])
+    bands = result.bands()
+    columns = {"Month": list(range(1, run["months"] + 1))}
+    for metric, metric_bands in bands.items():
+        for band, values in metric_bands.items():
+            columns[f"{metric}_{band}"] = values.tolist()
+    write_csv(os.path.join(output_dir, f"{run['name']}_bands.csv"), columns)
+    return {
+        "seed": result.seed,
+        "runs": result.runs,
+        "total_profit_mean": float(bands["profit"]["mean"][-1]),
+        "total_profit_p5": float(bands["profit"]["p5"][-1]),
+        "total_profit_p50": float(bands["profit"]["p50"][-1]),
+        "total_profit_p95": float(bands["profit"]["p95"][-1]),
+    }
+
+
+def run_scenario_batch(run, output_dir, registry=None):
+    from Scenarios import run_scenarios
+
+    scenarios = [{"growth_rate": run["growth_rate"], "resources": run["resources"], "soda_price": run["soda_price"],
+                  **scenario}
+                 for scenario in run["scenarios"]]
+    result = run_scenarios(scenarios, run["months"], run["population_size"], backend=run["backend"],
+                           seed=run["seed"], population_file=run["population_file"],
+                           demand_rules=run["demand_rules"], stores=run["stores"])
+    table = result.to_frame()
+    write_csv(os.path.join(output_dir, f"{run['name']}_scenarios.csv"),
+              {column: table[column].tolist() for column in table.columns})
+    columns = {"Month": list(range(1, run["months"] + 1))}
+    for i, profits in enumerate(result["profit"]):
+        columns[f"scenario_{i + 1}"] = profits.tolist()
+    write_csv(os.path.join(output_dir, f"{run['name']}_profit.csv"), columns)
+    if registry is not None:
+        batch_id = registry.create_batch("scenarios", run["name"], seed=result.seed, params=run_params(run))
+        histories = np.stack([result[metric] for metric in METRIC_NAMES], axis=-1)
+        registry.record_runs([{**run_params(run), **scenario} for scenario in result.scenarios], histories,
+                             seeds=[result.seed] * len(result), name=run["name"], kind="scenario",
+                             batch_id=batch_id)
+    best = int(table["total_profit"].idxmax())
+    return {
+        "seed": result.seed,
+        "scenarios": len(result),
+        "best_scenario": best + 1,
+        "best_total_profit": float(table["total_profit"][best]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run soda simulations from a config file.")
+    parser.add_argument("config", help="JSON or TOML batch config")
+    parser.add_argument("-o", "--output", default="results", help="directory for CSV and summary output")
+    parser.add_argument("-f", "--format", choices=["csv", "parquet", "arrow"], default="csv",
+                        help="file format for single-run histories (parquet/arrow need pyarrow)")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="worker processes for ensemble runs (default: all cores)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue single runs from their checkpoints in the output directory")
+    parser.add_argument("-r", "--registry", default=None,
+                        help="also store every run in this run registry (SQLite file)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output, exist_ok=True)
+    registry = None
+    if args.registry:
+        from Run_Registry import RunRegistry
+
+        registry = RunRegistry(args.registry)
+    summary = {}
+    for run in load_config(args.config):
+        start = time.perf_counter()
+        if run.get("scenarios"):
+            summary[run["name"]] = run_scenario_batch(run, args.output, registry)
+        elif run.get("ensemble"):
+            summary[run["name"]] = run_ensemble_bands(run, args.output, args.processes, registry)
+        else:
+            summary[run["name"]] = run_single(run, args.output, args.format, args.resume, registry)
+        summary[run["name"]]["seconds"] = round(time.perf_counter() - start, 3)
+        print(f"{run['name']}: done in {summary[run['name']]['seconds']}s")
+
+    with open(os.path.join(args.output, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
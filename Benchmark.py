@@ -0,0 +1,343 @@
+"""
+Benchmarks for the simulation hot paths.
+
+    python Benchmark.py run -o baseline.json            # full sweep (populations up to 10^7)
+    python Benchmark.py run --quick -o current.json     # smaller sweep for quick checks
+    python Benchmark.py compare baseline.json current.json
+
+Every case records the best wall time over a few repeats, peak Python/NumPy
+memory (tracemalloc, measured in a separate pass) and throughput in the
+case's unit (agent-months/sec for market and simulation cases). `compare`
+flags cases that got slower or hungrier than the threshold and exits with
+status 1 if there are any.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+POPULATIONS = [10, 100, 1000, 10**4, 10**5, 10**6, 10**7]
+AGENT_POPULATION_LIMIT = 10**5  # Per-agent objects above this take minutes just to build
+FACILITY_COUNTS = [1, 10, 100, 1000]
+HORIZONS = [12, 60, 120]
+ENSEMBLE_WIDTHS = [4, 16, 64]
+SCENARIO_COUNTS = [1, 16, 256]
+STORE_COUNTS = [5, 100, 10000]
+EVENT_CATALOGS = [12, 1000, 100000]
+QUICK_POPULATION_LIMIT = 10**5
+
+
+class Case:
+    """One benchmark: `setup()` builds the inputs (untimed) and returns the callable to time."""
+
+    def __init__(self, name, setup, units, unit="agent-months", params=None):
+        self.name = name
+        self.setup = setup
+        self.units = units  # Work done by one call, for the throughput figure
+        self.unit = unit
+        self.params = params or {}
+
+
+# ------------------------------
+# Cases
+# ------------------------------
+def market_cases(quick):
+    from Agent import create_population
+    from Simulation import simulate_market
+
+    cases = []
+    for backend in ("agents", "columnar", "cohort"):
+        for size in POPULATIONS:
+            if (backend == "agents" and size > AGENT_POPULATION_LIMIT) or (quick and size > QUICK_POPULATION_LIMIT):
+                continue
+
+            def setup(backend=backend, size=size):
+                population = create_population(size, columnar=backend == "columnar", cohorts=backend == "cohort",
+                                               rng=np.random.default_rng(0) if backend != "agents" else random.Random(0))
+                rng = np.random.default_rng(1) if backend != "agents" else random.Random(1)
+                return lambda: simulate_market(population, rng=rng)
+
+            cases.append(Case(f"market/{backend}/n={size}", setup, size,
+                              params={"backend": backend, "population_size": size}))
+    return cases
+
+
+def production_cases(quick):
+    from Production import Factory, Glass_prod, Resource_prod_batch, Sugar_prod, Water_prod
+
+    cases = []
+    for count in FACILITY_COUNTS:
+        resources = {"farms": count, "waterpumps": count, "mines": count}
+        for mode in ("loop", "sampled"):
+            def setup(mode=mode, resources=resources):
+                rng = random.Random(0) if mode == "loop" else np.random.default_rng(0)
+                factory = Factory(resources, production_mode=mode, rng=rng)
+                return lambda: factory.produce_soda(0.05)
+
+            cases.append(Case(f"factory/{mode}/facilities={count}", setup, 3 * count, "facility-months",
+                              {"production_mode": mode, "facilities": count}))
+
+        def setup_functions(resources=resources):
+            rng = random.Random(0)
+            return lambda: (Water_prod(resources, rng), Sugar_prod(resources, rng), Glass_prod(resources, rng))
+
+        cases.append(Case(f"resource_prod/loop/facilities={count}", setup_functions, 3 * count, "facility-months",
+                          {"facilities": count}))
+
+        def setup_batch(resources=resources):
+            rng = np.random.default_rng(0)
+            return lambda: Resource_prod_batch(resources, months=120, rng=rng)
+
+        cases.append(Case(f"resource_prod/batch120/facilities={count}", setup_batch, 3 * count * 120,
+                          "facility-months", {"facilities": count, "months": 120}))
+    return cases
+
+
+def event_cases(quick):
+    from Events import EventManager
+
+    cases = []
+    for size in EVENT_CATALOGS:
+        if quick and size > 1000:
+            continue
+
+        def setup(size=size):
+            catalog_rng = random.Random(0)
+            catalog = [{"Name": f"Event {i}", "Text": "", "Effect": catalog_rng.randint(-10, 10),
+                        "Time": catalog_rng.randint(1, 6), "CoolDown": catalog_rng.randint(1, 24),
+                        "Classification": catalog_rng.choice(["Popularity", "Production", "Market"])}
+                       for i in range(size)]
+
+            def run():
+                manager = EventManager(random.Random(1), events=catalog)
+                for month in range(120):
+                    manager.update_events()
+                    manager.trigger_random_events(3, current_month=month)
+                    manager.get_popularity_modifier()
+                    manager.get_production_modifier()
+                    manager.get_market_modifier()
+            return run
+
+        cases.append(Case(f"events/catalog={size}", setup, 120, "months", {"catalog_size": size, "months": 120}))
+    return cases
+
+
+def simulation_cases(quick):
+    from Simulation import Simulation
+
+    cases = []
+    sizes = [1000, 10**5] if quick else [1000, 10**5, 10**6]
+    for backend in ("agents", "columnar", "cohort"):
+        for size in sizes:
+            if backend == "agents" and size > 1000:
+                continue
+            for months in HORIZONS:
+                if quick and months > 60:
+                    continue
+
+                def setup(backend=backend, size=size, months=months):
+                    production_mode = "loop" if backend == "agents" else "sampled"
+                    return lambda: Simulation(months, 0.05, size, backend=backend,
+                                              production_mode=production_mode, seed=0).run()
+
+                cases.append(Case(f"simulation/{backend}/n={size}/months={months}", setup, size * months,
+                                  params={"backend": backend, "population_size": size, "months": months}))
+    return cases
+
+
+def ensemble_cases(quick):
+    from Ensemble import run_ensemble
+
+    cases = []
+    for runs in ENSEMBLE_WIDTHS:
+        if quick and runs > 16:
+            continue
+
+        def setup(runs=runs):
+            return lambda: run_ensemble(runs, 60, 0.05, 10**4, backend="cohort", seed=0)
+
+        # Peak memory only covers the parent process; the replicas run in workers
+        cases.append(Case(f"ensemble/runs={runs}", setup, runs * 60 * 10**4,
+                          params={"runs": runs, "months": 60, "population_size": 10**4}))
+    return cases
+
+
+def scenario_cases(quick):
+    from Scenarios import run_scenarios, scenario_grid
+
+    cases = []
+    for count in SCENARIO_COUNTS:
+        if quick and count > 16:
+            continue
+
+        def setup(count=count):
+            prices = np.linspace(1.0, 1.5, count)
+            scenarios = scenario_grid(soda_price=prices.tolist(), resources=[{"farms": 4, "waterpumps": 2, "mines": 6}])
+            return lambda: run_scenarios(scenarios, 60, 10**4, seed=0)
+
+        cases.append(Case(f"scenarios/k={count}", setup, count * 60 * 10**4,
+                          params={"scenarios": count, "months": 60, "population_size": 10**4}))
+    return cases
+
+
+def store_cases(quick):
+    from Agent import create_population
+    from Simulation import simulate_market
+    from Stores import top_stores
+
+    cases = []
+    for backend in ("columnar", "cohort"):
+        for count in STORE_COUNTS:
+            if quick and count > 100:
+                continue
+
+            def setup(backend=backend, count=count):
+                population = create_population(10**5, columnar=backend == "columnar", cohorts=backend == "cohort",
+                                               rng=np.random.default_rng(0), stores=count)
+                rng = np.random.default_rng(1)
+
+                def run():
+                    _, _, _, store_sales = simulate_market(population, rng=rng)
+                    top_stores(store_sales, population.stores)
+                return run
+
+            cases.append(Case(f"stores/{backend}/stores={count}", setup, 10**5,
+                              params={"backend": backend, "population_size": 10**5, "stores": count}))
+    return cases
+
+
+SUITES = {
+    "market": market_cases,
+    "production": production_cases,
+    "events": event_cases,
+    "simulation": simulation_cases,
+    "ensemble": ensemble_cases,
+    "scenarios": scenario_cases,
+    "stores": store_cases,
+}
+
+
+# ------------------------------
+# Measurement
+# ------------------------------
+def measure(case, repeats=3, min_seconds=0.2):
+    """Best seconds per call, peak MB and throughput of one case."""
+    func = case.setup()
+    # Repeat tiny cases inside one timing so timer resolution doesn't dominate
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    inner = max(1, int(min_seconds / max(first, 1e-9)))
+
+    best = first
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(inner):
+            func()
+        best = min(best, (time.perf_counter() - start) / inner)
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "params": case.params,
+        "seconds": best,
+        "peak_mb": peak / 2**20,
+        "throughput": case.units / best if best > 0 else None,
+        "unit": f"{case.unit}/sec",
+    }
+
+
+def run_benchmarks(suites=None, quick=False, repeats=3, name_filter=None):
+    results = {}
+    for suite in suites or SUITES:
+        for case in SUITES[suite](quick):
+            if name_filter and name_filter not in case.name:
+                continue
+            results[case.name] = measure(case, repeats)
+            print(f"{case.name:45s} {results[case.name]['seconds'] * 1000:10.3f} ms "
+                  f"{results[case.name]['peak_mb']:9.1f} MB {results[case.name]['throughput']:14.4g} "
+                  f"{results[case.name]['unit']}")
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=0.25):
+    """List of (case, metric, baseline value, current value) that regressed by more than `threshold`."""
+    regressions = []
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        for metric in ("seconds", "peak_mb"):
+            # Ignore noise on cases too small to measure reliably
+            floor = 1e-5 if metric == "seconds" else 1.0
+            if new[metric] > max(old[metric], floor) * (1 + threshold):
+                regressions.append((name, metric, old[metric], new[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and save the results as JSON")
+    run_parser.add_argument("-o", "--output", default="benchmark.json", help="JSON file for the results")
+    run_parser.add_argument("-s", "--suite", action="append", choices=list(SUITES),
+                            help="suite to run (repeatable, default: all)")
+    run_parser.add_argument("-k", "--filter", help="only run cases whose name contains this text")
+    run_parser.add_argument("-r", "--repeats", type=int, default=3, help="timed repeats per case (best is kept)")
+    run_parser.add_argument("--quick", action="store_true", help="skip the largest sizes")
+
+    compare_parser = commands.add_parser("compare", help="compare results against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("-t", "--threshold", type=float, default=0.25,
+                                help="allowed slowdown / memory growth as a fraction (default 0.25)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run_benchmarks(args.suite, args.quick, args.repeats, args.filter)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {len(report['results'])} results to {args.output}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    for name in sorted(set(baseline["results"]) & set(current["results"])):
+        old, new = baseline["results"][name], current["results"][name]
+        print(f"{name:45s} {old['seconds'] * 1000:10.3f} -> {new['seconds'] * 1000:10.3f} ms "
+              f"({new['seconds'] / old['seconds']:5.2f}x)")
+    regressions = compare(baseline, current, args.threshold)
+    for name, metric, old, new in regressions:
+        print(f"REGRESSION {name}: {metric} {old:.4g} -> {new:.4g}")
+    if not regressions:
+        print("No regressions.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
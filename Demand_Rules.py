@@ -0,0 +1,153 @@
+"""
+Customer demand rules, loaded from a declarative spec (demand_rules.json).
+
+The spec lists the buy-chance rules (threshold cases per attribute, in
+percentage points), the clamp, price elasticity, the can-count distribution,
+the influencer boost and the best-store bonus. DemandModel compiles it into
+whole-array operations, so every backend (agents, columnar, cohort) evaluates
+the same rules without per-customer branching. "variants" override parts of
+the spec, e.g. the 6-pack / $3.25 model of Agent.py.
+"""
+import functools
+import hashlib
+import json
+import os
+
+import numpy as np
+
+DEFAULT_SPEC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "demand_rules.json")
+
+# Case conditions: spec key -> comparison against the attribute
+CONDITIONS = {
+    "min": np.greater_equal,
+    "max": np.less_equal,
+    "below": np.less,
+    "above": np.greater,
+}
+
+
+def load_demand_spec(path=None, variant=None):
+    """Read a demand spec (JSON) and apply one of its variants."""
+    with open(path or DEFAULT_SPEC_PATH) as f:
+        spec = json.load(f)
+    return apply_variant(spec, variant)
+
+
+def apply_variant(spec, variant=None):
+    if variant is None:
+        return spec
+    overrides = spec.get("variants", {})[variant]
+    spec = dict(spec)
+    for section, values in overrides.items():
+        spec[section] = {**spec.get(section, {}), **values} if isinstance(values, dict) else values
+    return spec
+
+
+# ------------------------------
+# Compiled Model
+# ------------------------------
+class DemandModel:
+    """A demand spec compiled into vectorized buy-chance, price and can-count kernels."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.fingerprint = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+        chance = spec["buy_chance"]
+        self.base_attribute = chance["base"]
+        self.scale = chance.get("scale", 100)  # Rule points per certain purchase (100: percentage points)
+        self.clamp = tuple(chance.get("clamp", (0, self.scale)))
+        # Each rule: (attribute, [(conditions, add)]); the first matching case wins, like if / elif / else
+        self.rules = []
+        for rule in chance.get("rules", []):
+            cases = []
+            for case in rule["cases"]:
+                conditions = [(key, case[key]) for key in CONDITIONS if key in case]
+                cases.append((conditions, case.get("add", 0)))
+            self.rules.append((rule["attribute"], cases))
+        # Whole-number rules are summed in integers, so equal attributes give exactly equal chances
+        self.integer = all(float(add).is_integer() for _, cases in self.rules for _, add in cases)
+
+        price = spec.get("price", {})
+        self.default_price = price.get("default", 1.25)
+        self.reference_price = price.get("reference", self.default_price)
+        self.elasticity = price.get("elasticity", 0.0)
+
+        cans = spec.get("cans", {})
+        self.fixed_cans = cans.get("fixed")
+        self.can_counts = np.array(cans.get("counts", [6]), dtype=np.int64)
+        probs = np.array(cans.get("probs", [1.0] * len(self.can_counts)), dtype=np.float64)
+        self.can_probs = probs / probs.sum()
+        self.mean_cans = float(self.fixed_cans if self.fixed_cans is not None else self.can_counts @ self.can_probs)
+
+        influencer = spec.get("influencer", {})
+        self.influencer_attribute = influencer.get("attribute", "influence")
+        self.influencer_threshold = influencer.get("min", np.inf)
+        self.influencer_boost = influencer.get("popularity_boost", 0.0)
+
+        bonus = spec.get("best_store_bonus", {})
+        self.best_store_cans = bonus.get("cans_per_customer", np.inf)
+        self.best_store_boost = bonus.get("popularity_boost", 0.0)
+
+    @classmethod
+    def from_file(cls, path=None, variant=None):
+        return cls(load_demand_spec(path, variant))
+
+    # --- Kernels ---
+    def buy_chance(self, population):
+        """Buy chance of every customer of a columnar population (any object with the attribute arrays)."""
+        base = np.asarray(getattr(population, self.base_attribute))
+        chance = base.astype(np.int32 if self.integer else np.float64)
+        for attribute, cases in self.rules:
+            values = np.asarray(getattr(population, attribute))
+            masks = [self._matches(values, conditions) for conditions, _ in cases]
+            chance += np.select(masks, [add for _, add in cases], 0).astype(chance.dtype)
+        return np.clip(chance, *self.clamp) / self.scale
+
+    @staticmethod
+    def _matches(values, conditions):
+        mask = np.ones(values.shape, dtype=bool)
+        for key, threshold in conditions:
+            mask &= CONDITIONS[key](values, threshold)
+        return mask
+
+    def influential(self, population):
+        return np.asarray(getattr(population, self.influencer_attribute)) >= self.influencer_threshold
+
+    def price_factor(self, price):
+        """Demand multiplier at `price`: (price / reference) ** -elasticity (1 at the reference price)."""
+        if self.elasticity == 0 or price is None or self.reference_price <= 0:
+            return 1.0
+        return (max(price, 1e-9) / self.reference_price) ** -self.elasticity
+
+    def at_price(self, chance, price):
+        """Buy chances adjusted for price (the input itself when the price has no effect)."""
+        factor = self.price_factor(price)
+        if factor == 1.0:
+            return chance
+        return np.clip(chance * factor, 0.0, 1.0)
+
+    def thresholds(self, attribute):
+        """Every (condition, value) the rules test on `attribute`, e.g. for cohort bands."""
+        found = [(key, value) for name, cases in self.rules if name == attribute
+                 for conditions, _ in cases for key, value in conditions]
+        if attribute == self.influencer_attribute:
+            found.append(("min", self.influencer_threshold))
+        return found
+
+
+@functools.lru_cache(maxsize=None)
+def default_model(variant=None):
+    """The model of demand_rules.json (read once per process)."""
+    return DemandModel.from_file(variant=variant)
+
+
+def resolve_model(demand_rules=None, variant=None):
+    """DemandModel from a model, a spec dict, a spec file path, or None for the default."""
+    if isinstance(demand_rules, DemandModel):
+        return demand_rules
+    if demand_rules is None:
+        return default_model(variant)
+    if isinstance(demand_rules, dict):
+        return DemandModel(apply_variant(demand_rules, variant))
+    return DemandModel.from_file(demand_rules, variant)
@@ -0,0 +1,53 @@
+import numpy as np
+
+
+# ------------------------------
+# Largest-Triangle-Three-Buckets
+# ------------------------------
+def lttb(y, points, x=None):
+    """
+    Indices of at most `points` samples of y that keep its visual shape.
+
+    The first and last samples are always kept; every bucket in between
+    contributes the sample forming the largest triangle with the previously
+    kept sample and the average of the next bucket, so peaks and dips survive
+    where plain striding would skip them.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # Bucket boundaries for the n - 2 samples between the fixed endpoints
+    edges = (np.floor(np.arange(points - 1) * (n - 2) / (points - 2)) + 1).astype(np.intp)
+    edges[-1] = n - 1
+    keep = np.empty(points, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average point of the next bucket (the last sample for the final bucket)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_start = end if i + 2 < len(edges) else n - 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        keep[i + 1] = previous
+    return keep
+
+
+def lttb_rows(df, columns, points):
+    """
+    Row positions of a DataFrame that keep the shape of every column in
+    `columns` (the union of each column's LTTB samples), in order.
+    """
+    if len(df) <= points or not columns:
+        return np.arange(len(df))
+    # Share the point budget, so overlaying more metrics doesn't multiply the payload
+    per_column = max(3, points // len(columns))
+    rows = [lttb(df[column].to_numpy(), per_column) for column in columns]
+    return np.unique(np.concatenate(rows))
@@ -0,0 +1,127 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from History import METRIC_NAMES
+from Random_Streams import child_sequences, seed_sequence
+from Simulation import Simulation
+
+PERCENTILES = (5, 50, 95)
+
+
+def _run_replicas(sim_kwargs, seeds):
+    """Worker: run one replica per seed and return their histories as one (metrics, replicas, months) array."""
+    out = np.empty((len(METRIC_NAMES), len(seeds), sim_kwargs["months"]), dtype=np.float32)
+    for i, seed in enumerate(seeds):
+        sim = Simulation(seed=seed, **sim_kwargs)
+        sim.run()
+        out[:, i] = sim.history.to_numpy().T
+    return out
+
+
+class EnsembleResult:
+    """Per-month samples of every metric across replicas, with mean and percentile bands."""
+
+    def __init__(self, samples, seed=None):
+        self.samples = samples  # metric name -> (runs, months) array
+        self.seed = seed
+        self.runs = len(next(iter(samples.values())))
+
+    def mean(self, metric):
+        return self.samples[metric].mean(axis=0)
+
+    def percentile(self, metric, q):
+        return np.percentile(self.samples[metric], q, axis=0)
+
+    def bands(self):
+        """metric -> {"mean", "p5", "p50", "p95"} arrays, one value per month."""
+        result = {}
+        for metric, values in self.samples.items():
+            result[metric] = {"mean": values.mean(axis=0)}
+            for q, band in zip(PERCENTILES, np.percentile(values, PERCENTILES, axis=0)):
+                result[metric][f"p{q}"] = band
+        return result
+
+    def to_frame(self):
+        """Bands as a pandas DataFrame with one row per month and one column per metric/band."""
+        import pandas as pd
+
+        columns = {}
+        for metric, bands in self.bands().items():
+            for band, values in bands.items():
+                columns[f"{metric}_{band}"] = values
+        return pd.DataFrame(columns)
+
+
+def run_ensemble(runs, months, growth_rate, population_size, resources=None, processes=None,
+                 chunk_size=None, backend="columnar", production_mode="sampled", seed=None, population_file=None,
+                 demand_rules=None, stores=None, registry=None, name=None, soda_price=1.25):
+    """
+    Run `runs` independent replicas of Simulation with the same parameters
+    across a process pool (all cores by default).
+
+    Workers only send back compact float32 history arrays, never Simulation
+    or Agent objects, so IPC and memory stay flat as `runs` grows.
+
+    Replica i is seeded with child i of `seed`, so the same seed gives the
+    same result whatever the number of processes or the chunk size.
+
+    With `population_file` (see Population.save) every replica memory-maps the
+    same saved customers instead of generating its own, and the workers share
+    one copy of it through the page cache.
+
+    With a Run_Registry.RunRegistry as `registry`, every replica's history is
+    stored as one batch (named `name`). Blocks are written on a background
+    thread as they arrive, so the workers never wait on the database.
+    """
+    sim_kwargs = {
+        "months": months,
+        "growth_rate": growth_rate,
+        "population_size": population_size,
+        "resources": resources,
+        "soda_price": soda_price,
+        "backend": backend,
+        "production_mode": production_mode,
+        "population_file": population_file,
+        "demand_rules": demand_rules,
+        "stores": stores,
+    }
+    processes = processes or os.cpu_count() or 1
+    # A few chunks per worker keeps the pool busy without one task per replica
+    chunk_size = chunk_size or max(1, runs // (processes * 4))
+    sequence = seed_sequence(seed)
+    seeds = child_sequences(sequence, runs)
+    chunks = [seeds[start:start + chunk_size] for start in range(0, runs, chunk_size)]
+
+    writer = None
+    if registry is not None:
+        batch_id = registry.create_batch("ensemble", name, seed=sequence.entropy, params={**sim_kwargs, "runs": runs})
+        writer = registry.writer()
+
+    samples = np.empty((len(METRIC_NAMES), runs, months), dtype=np.float32)
+    start = 0
+
+    def collect(block):
+        nonlocal start
+        samples[:, start:start + block.shape[1]] = block
+        if writer is not None:
+            # Replica i replays as Simulation(seed=child_sequences(seed, runs)[i])
+            writer.record_runs(sim_kwargs, block.transpose(1, 2, 0), seeds=[sequence.entropy] * block.shape[1],
+                               name=name, kind="replica", batch_id=batch_id,
+                               replicas=list(range(start, start + block.shape[1])))
+        start += block.shape[1]
+
+    try:
+        if processes == 1:
+            for chunk in chunks:
+                collect(_run_replicas(sim_kwargs, chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                for block in pool.map(_run_replicas, [sim_kwargs] * len(chunks), chunks):
+                    collect(block)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return EnsembleResult({name: samples[j] for j, name in enumerate(METRIC_NAMES)}, sequence.entropy)
@@ -0,0 +1,280 @@
+import heapq
+import random
+
+
+class Event:
+    """
+    Catalog of market events.
+
+    Each event has:
+        Name           - unique event name
+        Text           - description shown in the dashboard
+        Effect         - percentage change applied while the event is active
+        Time           - how many months the event stays active
+        CoolDown       - months before the same event can trigger again
+        Classification - "Popularity", "Production" or "Market"
+    """
+
+    Event_List = [
+        # --- Popularity events ---
+        {"Name": "Viral Ad Campaign", "Text": "A social media ad goes viral and boosts brand awareness.",
+         "Effect": 10, "Time": 3, "CoolDown": 12, "Classification": "Popularity"},
+        {"Name": "Celebrity Endorsement", "Text": "A celebrity is seen drinking the soda in public.",
+         "Effect": 8, "Time": 4, "CoolDown": 18, "Classification": "Popularity"},
+        {"Name": "Health Report", "Text": "A health study warns about sugary drinks.",
+         "Effect": -8, "Time": 3, "CoolDown": 12, "Classification": "Popularity"},
+        {"Name": "Bad Review", "Text": "A popular food critic gives the soda a bad review.",
+         "Effect": -5, "Time": 2, "CoolDown": 8, "Classification": "Popularity"},
+
+        # --- Production events ---
+        {"Name": "Equipment Upgrade", "Text": "New bottling equipment speeds up the production line.",
+         "Effect": 10, "Time": 6, "CoolDown": 24, "Classification": "Production"},
+        {"Name": "Bumper Harvest", "Text": "Great weather gives the sugar farms a bumper harvest.",
+         "Effect": 5, "Time": 2, "CoolDown": 12, "Classification": "Production"},
+        {"Name": "Drought", "Text": "A drought lowers the water table and slows the pumps.",
+         "Effect": -10, "Time": 3, "CoolDown": 12, "Classification": "Production"},
+        {"Name": "Machine Breakdown", "Text": "A key machine breaks down and needs repairs.",
+         "Effect": -15, "Time": 1, "CoolDown": 6, "Classification": "Production"},
+
+        # --- Market events ---
+        {"Name": "Summer Heatwave", "Text": "A heatwave sends customers looking for cold drinks.",
+         "Effect": 12, "Time": 2, "CoolDown": 12, "Classification": "Market"},
+        {"Name": "Holiday Season", "Text": "Holiday parties increase soda demand.",
+         "Effect": 8, "Time": 2, "CoolDown": 12, "Classification": "Market"},
+        {"Name": "Competitor Sale", "Text": "A competitor runs a big discount on their drinks.",
+         "Effect": -10, "Time": 2, "CoolDown": 9, "Classification": "Market"},
+        {"Name": "Economic Downturn", "Text": "Customers cut back on spending during a recession.",
+         "Effect": -6, "Time": 6, "CoolDown": 24, "Classification": "Market"},
+    ]
+
+
+# ------------------------------
+# Catalog Loading
+# ------------------------------
+def load_event_catalog(path):
+    """Read a JSON list of events (same keys as Event.Event_List, plus optional Weight and Region)."""
+    import json
+
+    with open(path) as f:
+        return json.load(f)
+
+
+# ------------------------------
+# Event Manager
+# ------------------------------
+class EventManager:
+    """
+    Triggers catalog events and keeps their modifiers.
+
+    Nothing is rescanned per month: modifier totals per (classification,
+    region) are updated only when an event starts or expires, expiries and
+    cooldown ends sit in a min-heap keyed by month, and the weights of the
+    events that can trigger are kept in a Fenwick tree, so a month costs
+    O(k log n) for the k events that change.
+
+    Events may carry a "Weight" (default 1) for weighted selection and a
+    "Region" (default None, meaning everywhere). With `region` set, only
+    global events and that region's events are loaded.
+    """
+
+    def __init__(self, rng=None, events=None, region=None):
+        self.rng = rng if rng is not None else random
+        self.region = region
+        self.events = [e for e in (events if events is not None else Event.Event_List)
+                       if e.get("Region") is None or region is None or e.get("Region") == region]
+        self.index = {event["Name"]: i for i, event in enumerate(self.events)}
+        self.event_history = []  # List of events that occurred
+        # Names, classifications or (name, month) occurrences that are drawn and put on
+        # cooldown but never take effect, for counterfactual runs: the random draws and
+        # later selections stay the same either way
+        self.suppressed = set()
+
+        self.clock = 0  # Months advanced by update_events
+        self.modifiers = {}  # (classification, region): summed Effect of active events
+        self.active = {}  # Activation id: (event, expiry month)
+        self.cooling = {}  # Catalog index: month the event becomes available again
+        self._heap = []  # (month, kind, key) for expiries ("expire", id) and cooldown ends ("ready", index)
+        self._next_id = 0
+
+        # Fenwick tree over the selection weights of available events
+        self._weights = [float(e.get("Weight", 1)) for e in self.events]
+        self._tree = [0.0] * (len(self.events) + 1)
+        for i, weight in enumerate(self._weights):
+            self._tree_add(i, weight)
+        self.available_weight = sum(self._weights)
+        self.available_count = len(self.events)
+
+    # --- Weighted selection ---
+    def _tree_add(self, i, delta):
+        i += 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_find(self, target):
+        """Index of the available event whose cumulative weight range contains target."""
+        pos = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        # Float drift can land on an unavailable slot at the edges; step to a neighbour
+        pos = min(pos, len(self.events) - 1)
+        while pos > 0 and not self._is_available(pos):
+            pos -= 1
+        while not self._is_available(pos):
+            pos += 1
+        return pos
+
+    def _is_available(self, i):
+        return i not in self.cooling and self._weights[i] > 0
+
+    def _set_available(self, i, available):
+        sign = 1 if available else -1
+        self._tree_add(i, sign * self._weights[i])
+        self.available_weight += sign * self._weights[i]
+        self.available_count += sign
+
+    # --- Monthly updates ---
+    def update_events(self):
+        """Advance one month: expire finished events and end cooldowns."""
+        self.clock += 1
+        while self._heap and self._heap[0][0] <= self.clock:
+            _, kind, key = heapq.heappop(self._heap)
+            if kind == "expire":
+                event, _ = self.active.pop(key)
+                self._add_modifier(event, -event["Effect"])
+            else:
+                del self.cooling[key]
+                self._set_available(key, True)
+
+    def _add_modifier(self, event, effect):
+        scope = (event["Classification"], event.get("Region"))
+        self.modifiers[scope] = self.modifiers.get(scope, 0) + effect
+
+    def start_event(self, i, current_month=0, suppressed=False):
+        """
+        Activate catalog event i now and put it on cooldown. A suppressed
+        event only goes on cooldown (no effect, modifiers or history entry),
+        so later selections match the run where it happened.
+        """
+        event = self.events[i]
+        if event["CoolDown"] > 0:
+            self.cooling[i] = self.clock + event["CoolDown"]
+            heapq.heappush(self._heap, (self.cooling[i], "ready", i))
+            self._set_available(i, False)
+        if suppressed:
+            return None
+        self._next_id += 1
+        self.active[self._next_id] = (event, self.clock + event["Time"])
+        heapq.heappush(self._heap, (self.clock + event["Time"], "expire", self._next_id))
+        self._add_modifier(event, event["Effect"])
+        self.event_history.append((event, current_month + 1))
+        return event
+
+    def trigger_random_event(self, chance=0.15, current_month=0):
+        """Try to trigger a random event (chosen in proportion to its Weight)."""
+        if self.rng.random() > chance:
+            return None
+        if self.available_count == 0 or self.available_weight <= 0:
+            return None
+        i = self._tree_find(self.rng.random() * self.available_weight)
+        suppressed = bool(self.suppressed) and self.is_suppressed(self.events[i], current_month + 1)
+        return self.start_event(i, current_month, suppressed)
+
+    def may_trigger(self, chance=0.15):
+        """
+        Whether the next trigger_random_event(chance) can start an event,
+        peeked without using up its draw. It may say True for a month that
+        ends up quiet, never False for one that doesn't.
+        """
+        rng = getattr(self.rng, "rng", self.rng)  # Peek past a Profiling.CountingRNG, so nothing is counted
+        state = rng.getstate()
+        roll = rng.random()
+        rng.setstate(state)
+        return roll <= chance
+
+    def is_suppressed(self, event, month):
+        return (event["Name"] in self.suppressed or event["Classification"] in self.suppressed
+                or (event["Name"], month) in self.suppressed)
+
+    def trigger_random_events(self, count, chance=0.15, current_month=0):
+        """Up to `count` independent trigger attempts in one month; returns the events started."""
+        events = []
+        for _ in range(count):
+            event = self.trigger_random_event(chance, current_month)
+            if event:
+                events.append(event)
+        return events
+
+    # --- Checkpoints ---
+    def state(self, history=True):
+        """
+        JSON-friendly copy of everything that changes during a run (the RNG
+        is saved separately). history=False leaves out the event history,
+        the only part that grows with the run.
+        """
+        state = {
+            "clock": self.clock,
+            "next_id": self._next_id,
+            "active": [[key, self.index[event["Name"]], expiry] for key, (event, expiry) in self.active.items()],
+            "cooling": [[i, month] for i, month in self.cooling.items()],
+            "heap": [list(entry) for entry in self._heap],
+            "modifiers": [[classification, region, total] for (classification, region), total in self.modifiers.items()],
+            "tree": list(self._tree),
+            "available_weight": self.available_weight,
+            "available_count": self.available_count,
+        }
+        if history:
+            state["history"] = [[self.index[event["Name"]], month] for event, month in self.event_history]
+        return state
+
+    def restore(self, state):
+        """Load a state() snapshot into a manager built from the same catalog."""
+        self.clock = state["clock"]
+        self._next_id = state["next_id"]
+        self.active = {key: (self.events[i], expiry) for key, i, expiry in state["active"]}
+        self.cooling = {i: month for i, month in state["cooling"]}
+        self._heap = [tuple(entry) for entry in state["heap"]]
+        heapq.heapify(self._heap)
+        self.modifiers = {(classification, region): total for classification, region, total in state["modifiers"]}
+        self._tree = list(state["tree"])
+        self.available_weight = state["available_weight"]
+        self.available_count = state["available_count"]
+        self.event_history = [(self.events[i], month) for i, month in state.get("history", [])]
+
+    # --- Views ---
+    @property
+    def active_events(self):
+        """List of (event, months_remaining)."""
+        return [(event, expiry - self.clock) for event, expiry in self.active.values()]
+
+    @property
+    def event_cooldowns(self):
+        """Dict of event_name: months_until_available."""
+        return {self.events[i]["Name"]: month - self.clock for i, month in self.cooling.items()}
+
+    def _modifier(self, classification, region):
+        region = self.region if region is None else region
+        total = self.modifiers.get((classification, None), 0)
+        if region is not None:
+            total += self.modifiers.get((classification, region), 0)
+        return total
+
+    def get_popularity_modifier(self, region=None):
+        """Get total popularity modifier from active events."""
+        return self._modifier("Popularity", region) / 100.0  # Convert to percentage
+
+    def get_production_modifier(self, region=None):
+        """Get total production modifier from active events."""
+        modifier = self._modifier("Production", region)
+        # Negative effects reduce production, so convert to multiplier
+        # Effect of -2 means 2% reduction = 0.98 multiplier
+        return max(0.1, 1.0 + (modifier / 100.0))  # Clamp between 0.1 and above
+
+    def get_market_modifier(self, region=None):
+        """Get market modifier (affects sales)."""
+        return self._modifier("Market", region) / 100.0  # Convert to percentage
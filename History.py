@@ -0,0 +1,159 @@
+import numpy as np
+
+# Tracked monthly metrics: (metric name, table / CSV label)
+METRICS = [
+    ("profit", "Total Profit"),  # Cumulative profit (revenue - costs)
+    ("monthly_profit", "Monthly Profit"),
+    ("revenue", "Revenue"),
+    ("total_expenses", "Total Expenses"),  # Production + resource costs
+    ("production_costs", "Production Costs"),
+    ("resource_costs", "Resource Costs"),
+    ("popularity", "Popularity"),
+    ("storage", "Storage"),
+    ("production", "Production"),
+    ("sold", "Sold"),
+]
+METRIC_NAMES = [name for name, _ in METRICS]
+
+
+def format_year_month(month_num):
+    """Convert month number (1-based) to Year/Month format."""
+    year = ((month_num - 1) // 12) + 1
+    month = ((month_num - 1) % 12) + 1
+    return f"Year {year}, Month {month}"
+
+
+# ------------------------------
+# History Buffer
+# ------------------------------
+class History:
+    """
+    Preallocated, column-oriented monthly history.
+
+    All metrics live in one (months, metrics) array in Fortran order, so every
+    metric is a contiguous column and pandas / NumPy get views, not copies.
+    """
+
+    def __init__(self, months, dtype=np.float64):
+        self.months = months
+        self.buffer = np.zeros((months, len(METRICS)), dtype=dtype, order="F")
+        self.length = 0  # Months recorded so far
+
+    def append(self, **values):
+        """Record one month; `values` holds one value per metric name."""
+        row = self.buffer[self.length]
+        for i, name in enumerate(METRIC_NAMES):
+            row[i] = values[name]
+        self.length += 1
+
+    def column(self, name):
+        """View of one metric over the recorded months."""
+        return self.buffer[:self.length, METRIC_NAMES.index(name)]
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def __len__(self):
+        return self.length
+
+    def to_numpy(self):
+        """(months recorded, metrics) view of the whole buffer."""
+        return self.buffer[:self.length]
+
+    def to_frame(self, year_month=True):
+        """pandas DataFrame backed by the buffer (no copy of the metric columns)."""
+        import pandas as pd
+
+        df = pd.DataFrame(self.to_numpy(), columns=[label for _, label in METRICS], copy=False)
+        if year_month:
+            df.insert(0, "Year/Month", [format_year_month(m) for m in range(1, self.length + 1)])
+        return df
+
+    def to_arrow(self, extra_columns=None):
+        """pyarrow Table of the recorded months (metric columns wrap the buffer without copying)."""
+        pa = _require_pyarrow()
+        columns = {"month": np.arange(1, self.length + 1, dtype=np.int32)}
+        for name in (extra_columns or {}):
+            columns[name] = np.full(self.length, extra_columns[name])
+        for name in METRIC_NAMES:
+            columns[name] = self.column(name)
+        return pa.table(columns)
+
+    def to_parquet_bytes(self):
+        """Parquet file contents, e.g. for a download button."""
+        pa = _require_pyarrow()
+        sink = pa.BufferOutputStream()
+        with HistoryWriter(sink, format="parquet") as writer:
+            writer.write(self)
+        return sink.getvalue().to_pybytes()
+
+
+# ------------------------------
+# Streaming Export
+# ------------------------------
+class HistoryWriter:
+    """
+    Stream many histories (e.g. every replica of an ensemble) into one Parquet
+    or Arrow IPC file, one record batch at a time, without building a giant
+    table in memory first.
+    """
+
+    def __init__(self, path, format="parquet", dtype=np.float64, batch_rows=65536):
+        self.pa = _require_pyarrow()
+        self.path = path
+        self.format = format
+        fields = [self.pa.field("run", self.pa.int64()), self.pa.field("month", self.pa.int32())]
+        fields += [self.pa.field(name, self.pa.from_numpy_dtype(np.dtype(dtype))) for name in METRIC_NAMES]
+        self.schema = self.pa.schema(fields)
+        self.dtype = dtype
+        if format == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(path, self.schema)
+        elif format == "arrow":
+            self._writer = self.pa.ipc.new_file(path, self.schema)
+        else:
+            raise ValueError(f"Unknown export format: {format}")
+        self.runs_written = 0
+        # Short histories are buffered so each row group / batch holds ~batch_rows rows
+        self.batch_rows = batch_rows
+        self._pending = []
+        self._pending_rows = 0
+
+    def write(self, history, run=None):
+        """Append one history as a record batch (tagged with its run number)."""
+        run = self.runs_written if run is None else run
+        arrays = [
+            self.pa.array(np.full(history.length, run, dtype=np.int64)),
+            self.pa.array(np.arange(1, history.length + 1, dtype=np.int32)),
+        ]
+        arrays += [self.pa.array(history.column(name).astype(self.dtype, copy=False)) for name in METRIC_NAMES]
+        self._pending.append(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self._pending_rows += history.length
+        self.runs_written += 1
+        if self._pending_rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._writer.write_table(self.pa.Table.from_batches(self._pending, schema=self.schema))
+            self._pending = []
+            self._pending_rows = 0
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as exc:
+        raise ImportError("Parquet/Arrow export needs pyarrow: pip install pyarrow") from exc
+    return pa
@@ -0,0 +1,142 @@
+"""
+Minimal client for Job_Server.py (standard library only, so any tool can copy or import it).
+
+    from Job_Client import JobClient
+
+    client = JobClient("http://127.0.0.1:8765")
+    job = client.submit("run", {"years": 2, "population_size": 500, "seed": 7})
+    status = client.wait(job["id"])
+    columns = client.result(job["id"], columns=["month", "profit"])
+
+From the command line:
+
+    python Job_Client.py run --years 2 --population 500 --seed 7
+    python Job_Client.py ensemble --runs 32 --years 5
+    python Job_Client.py sweep --price 1.0 --price 1.25 --price 1.5
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+DEFAULT_URL = "http://127.0.0.1:8765"  # Job_Server.py's default address
+WAIT_TIMEOUT = 3600  # Longest wait() blocks by default, in seconds
+
+
+class JobError(RuntimeError):
+    """A request the server rejected, or a job that failed."""
+
+
+class JobClient:
+    def __init__(self, url=DEFAULT_URL, timeout=120):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _open(self, path, body=None, **query):
+        query = {name: value for name, value in query.items() if value is not None}
+        url = f"{self.url}{path}" + (f"?{urlencode(query)}" if query else "")
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as exc:
+            detail = json.loads(exc.read() or b"{}")
+            raise JobError(detail.get("detail") or detail.get("error") or str(exc)) from None
+
+    def _json(self, path, body=None, **query):
+        with self._open(path, body, **query) as response:
+            return json.load(response)
+
+    # --- Jobs ---
+    def submit(self, kind="run", params=None, **extra):
+        """Queue a job ({"id", "status", "merged", "seed"}); extra is runs=N (ensemble) or scenarios=[...] (sweep)."""
+        return self._json("/jobs", {"kind": kind, "params": params or {}, **extra})
+
+    def status(self, job_id, wait=None):
+        return self._json(f"/jobs/{job_id}", wait=wait)
+
+    def wait(self, job_id, timeout=WAIT_TIMEOUT, poll=30):
+        """
+        Status of the finished job; long-polls the server `poll` seconds at a
+        time. Raises JobError if it failed or is still unfinished after
+        `timeout` seconds (None waits for as long as it takes).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            left = poll if deadline is None else min(poll, max(0.0, deadline - time.monotonic()))
+            status = self.status(job_id, wait=left)
+            if status["status"] == "failed":
+                raise JobError(status.get("error", "Job failed"))
+            if status["status"] == "done":
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                raise JobError(f"Job {job_id} is still {status['status']} after {timeout} s")
+
+    def result(self, job_id, columns=None, page_size=5000):
+        """The whole result table as {column: list}, fetched page by page."""
+        names = ",".join(columns) if columns else None
+        table, offset = None, 0
+        while offset is not None:
+            page = self._json(f"/jobs/{job_id}/result", offset=offset, limit=page_size, columns=names)
+            if table is None:
+                table = {name: [] for name in page["columns"]}
+            for row in page["rows"]:
+                for name, value in zip(page["columns"], row):
+                    table[name].append(value)
+            offset = page["next_offset"]
+        return table
+
+    def stream(self, job_id, columns=None):
+        """Yield the result rows as dicts while they arrive (NDJSON), without holding the whole table."""
+        names = ",".join(columns) if columns else None
+        with self._open(f"/jobs/{job_id}/result", format="ndjson", columns=names) as response:
+            header = json.loads(response.readline())
+            for line in response:
+                yield dict(zip(header["columns"], json.loads(line)))
+
+    def run(self, kind="run", params=None, columns=None, **extra):
+        """Submit, wait and fetch in one call: (status, result table)."""
+        job = self.submit(kind, params, **extra)
+        status = self.wait(job["id"])
+        return status, self.result(job["id"], columns)
+
+    def stats(self):
+        return self._json("/stats")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Submit a job to a running Job_Server.py and print its summary.")
+    parser.add_argument("kind", choices=["run", "ensemble", "sweep"])
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--population", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--backend", default="columnar")
+    parser.add_argument("--runs", type=int, default=8, help="replicas of an ensemble")
+    parser.add_argument("--price", type=float, action="append", help="soda price (repeat for a sweep)")
+    args = parser.parse_args(argv)
+
+    params = {"years": args.years, "population_size": args.population, "seed": args.seed, "backend": args.backend}
+    extra = {}
+    if args.kind == "ensemble":
+        extra["runs"] = args.runs
+    if args.kind == "sweep":
+        extra["scenarios"] = [{"soda_price": price} for price in args.price or [1.0, 1.25, 1.5]]
+    elif args.price:
+        params["soda_price"] = args.price[0]
+
+    client = JobClient(args.url)
+    job = client.submit(args.kind, params, **extra)
+    status = client.wait(job["id"])
+    print(json.dumps({"id": job["id"], "seed": status["seed"], "seconds": round(status["seconds"], 3),
+                      "summary": status["summary"]}, indent=2))
+    for row in client.stream(job["id"], columns=status["columns"][:4]):
+        if row.get("month", 1) > 3:
+            break
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,681 @@
+"""
+Local HTTP/JSON job server for simulation runs, ensembles and sweeps.
+
+    python Job_Server.py --port 8765 --workers 4
+
+Tools submit jobs over HTTP instead of embedding the dashboard (see
+Job_Client.py for a client):
+
+    POST /jobs                {"kind": "run", "params": {"years": 2, "seed": 7, "soda_price": 1.4}}
+                              {"kind": "ensemble", "runs": 32, "params": {...}}
+                              {"kind": "sweep", "scenarios": [{"soda_price": 1.0}, ...], "params": {...}}
+    GET  /jobs/<id>?wait=10   status and summary, waiting up to 10 s for the job to finish
+    GET  /jobs/<id>/result?offset=0&limit=500&columns=month,profit
+                              one page of the result table
+    GET  /jobs/<id>/result?format=ndjson
+                              the whole result table streamed, one JSON row per line
+    GET  /stats               queue, batching and warm-population counters
+
+`params` takes the Simulation settings (years or months, growth_rate,
+population_size, resources, soda_price, backend, production_mode, seed,
+stores, population_file, demand_rules). Requests without a seed get a fresh
+one, returned with the job so the run can be replayed.
+
+Jobs run on a fixed set of worker processes that live as long as the
+server. Each keeps its most recently used populations in memory, so runs
+with the same customers (same seed, size, backend and stores, or the same
+population_file) skip building them, and the server prefers a worker that
+already holds a task's customers. Identical requests share one job. Queued
+runs with the same customers go to one worker as a single batch, simulated
+back to back on one population; every run still gives exactly the result
+of Simulation(**params).
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from Ensemble import EnsembleResult
+from History import METRIC_NAMES
+from Jobs import DONE, FAILED, QUEUED, RUNNING
+from Random_Streams import child_sequences, seed_sequence
+from Result_Cache import ResultCache
+from Simulation import Simulation
+from Stores import resolve_stores, top_stores
+
+DEFAULT_PORT = 8765
+KINDS = ("run", "ensemble", "sweep")
+PARAM_DEFAULTS = {
+    "months": 12,
+    "growth_rate": 0.05,
+    "population_size": 50,
+    "resources": {"farms": 1, "waterpumps": 1, "mines": 1},
+    "soda_price": 1.25,
+    "backend": "columnar",
+    "production_mode": "sampled",
+    "seed": None,
+    "stores": None,
+    "population_file": None,
+    "demand_rules": None,
+}
+MAX_BATCH = 32  # Runs sent to a worker in one batch
+ENSEMBLE_CHUNK = 8  # Replicas per ensemble task, so an ensemble spreads over the workers
+WARM_POPULATIONS = 8  # Populations each worker keeps in memory
+MAX_FINISHED_JOBS = 1000  # Finished jobs kept for lookups and identical requests
+MAX_PAGE = 10000  # Rows per result page
+STREAM_ROWS = 1000  # Rows per chunk of a streamed result
+MAX_WAIT = 60.0  # Longest ?wait= a status request may block, in seconds
+
+
+def job_params(params):
+    """Full Simulation settings from a request's params ("years" may replace "months"); raises ValueError."""
+    params = dict(params or {})
+    if "years" in params:
+        params["months"] = _number(int, "years", params.pop("years"), low=1) * 12
+    unknown = set(params) - set(PARAM_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+    params = {**PARAM_DEFAULTS, **params}
+    resources = params["resources"] or {}
+    if not isinstance(resources, dict) or set(resources) - set(PARAM_DEFAULTS["resources"]):
+        raise ValueError(f"resources takes counts of {', '.join(PARAM_DEFAULTS['resources'])}")
+    params["resources"] = {name: _number(int, f"resources.{name}", count, low=0)
+                           for name, count in {**PARAM_DEFAULTS["resources"], **resources}.items()}
+    params["months"] = _number(int, "months", params["months"], low=1)
+    params["population_size"] = _number(int, "population_size", params["population_size"], low=1)
+    params["growth_rate"] = _number(float, "growth_rate", params["growth_rate"])
+    params["soda_price"] = _number(float, "soda_price", params["soda_price"], low=0)
+    if params["backend"] not in ("agents", "columnar", "cohort"):
+        raise ValueError(f"Unknown backend {params['backend']!r}")
+    if params["production_mode"] not in ("loop", "sampled"):
+        raise ValueError(f"Unknown production_mode {params['production_mode']!r}")
+    if params["stores"] is not None:
+        try:
+            resolve_stores(params["stores"])
+        except (TypeError, KeyError, OSError) as exc:
+            raise ValueError(f"Bad stores: {exc}") from None
+    if params["seed"] is None:
+        params["seed"] = seed_sequence(None).entropy
+    else:
+        params["seed"] = _number(int, "seed", params["seed"], low=0)
+    return params
+
+
+def _number(kind, name, value, low=None):
+    """`value` as an int or float (kind), at least `low`; raises ValueError naming the setting."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{name} must be a number, not {value!r}")
+    try:
+        number = kind(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, not {value!r}") from None
+    if kind is float and not np.isfinite(number):
+        raise ValueError(f"{name} must be finite")
+    if low is not None and number < low:
+        raise ValueError(f"{name} must be at least {low}")
+    return number
+
+
+def population_key(params):
+    """Settings that decide a run's customers: runs with the same key can share one population."""
+    return ResultCache.make_key(backend=params["backend"], population_size=params["population_size"],
+                                stores=params["stores"], demand_rules=params["demand_rules"],
+                                population_file=params["population_file"],
+                                seed=None if params["population_file"] else params["seed"])
+
+
+# ------------------------------
+# Worker Processes
+# ------------------------------
+def _population(warm, key, params):
+    """(customers for `params`, whether they were warm); built the way Simulation builds them."""
+    population = warm.pop(key, None)
+    hit = population is not None
+    if population is None:
+        population = Simulation(**params).population
+    warm[key] = population
+    while len(warm) > WARM_POPULATIONS:
+        warm.popitem(last=False)
+    return population, hit
+
+
+def _error(exc):
+    return f"{type(exc).__name__}: {exc}"
+
+
+# Every task returns (result, warm population hits, population lookups)
+def _run_batch(warm, key, batch):
+    """
+    Runs that share their customers, back to back on one population: one
+    RunResult per run, or the error message of a run that failed, so one bad
+    run never fails the others in its batch.
+    """
+    results, hits = [], 0
+    for params in batch:
+        try:
+            population, hit = _population(warm, key, params)
+            hits += hit
+            sim = Simulation(population=population, **params)
+            sim.run()
+            results.append(sim.result())
+        except Exception as exc:
+            results.append(_error(exc))
+    return results, hits, len(batch)
+
+
+def _run_replicas(warm, key, payload):
+    """Ensemble replicas, one per seed, as a (metrics, replicas, months) array like Ensemble.run_ensemble's."""
+    params, seeds = payload
+    out = np.empty((len(METRIC_NAMES), len(seeds), params["months"]), dtype=np.float32)
+    hits = 0
+    for i, seed in enumerate(seeds):
+        population = None
+        if params["population_file"]:
+            # Replicas only share customers when they come from a file
+            population, hit = _population(warm, key, {**params, "seed": seed})
+            hits += hit
+        sim = Simulation(population=population, **{**params, "seed": seed})
+        sim.run()
+        out[:, i] = sim.history.to_numpy().T
+    return out, hits, len(seeds) if params["population_file"] else 0
+
+
+def _run_sweep(warm, key, payload):
+    """Scenarios.run_scenarios on the (warm) customers of `params`."""
+    from Scenarios import run_scenarios
+
+    params, scenarios = payload
+    population, hit = _population(warm, key, params)
+    result = run_scenarios(scenarios, params["months"], params["population_size"], backend=params["backend"],
+                           seed=params["seed"], population=population, demand_rules=params["demand_rules"])
+    return result, int(hit), 1
+
+
+_TASKS = {"run": _run_batch, "ensemble": _run_replicas, "sweep": _run_sweep}
+
+
+def _worker(conn):
+    """Worker process: runs the tasks the server sends, keeping recent populations warm, until told to stop."""
+    warm = OrderedDict()  # Population key -> population, least recently used first
+    while True:
+        task = conn.recv()
+        if task is None:
+            conn.close()
+            return
+        kind, key, payload = task
+        try:
+            conn.send(("ok", *_TASKS[kind](warm, key, payload)))
+        except Exception as exc:  # Reported on the job instead of killing the worker
+            conn.send(("error", _error(exc), 0, 0))
+
+
+class _WorkerHandle:
+    def __init__(self):
+        self.restart()
+
+    def restart(self):
+        """Start a fresh worker process (also after the previous one died)."""
+        self.conn, child_conn = mp.Pipe()
+        self.process = mp.Process(target=_worker, args=(child_conn,), daemon=True)
+        self.process.start()
+        self.warm = OrderedDict()  # Mirror of the worker's warm population keys
+
+    def remember(self, key):
+        self.warm.pop(key, None)
+        self.warm[key] = True
+        while len(self.warm) > WARM_POPULATIONS:
+            self.warm.popitem(last=False)
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+
+
+# ------------------------------
+# Jobs and Results
+# ------------------------------
+class ResultTable:
+    """A finished job's result as named, equal-length columns, served in pages or streamed row by row."""
+
+    def __init__(self, columns):
+        self.columns = {name: np.asarray(values) for name, values in columns.items()}
+        self.length = len(next(iter(self.columns.values())))
+
+    def select(self, names=None):
+        """Column names to serve (all by default); raises ValueError on unknown ones."""
+        if not names:
+            return list(self.columns)
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        return list(names)
+
+    def rows(self, start, stop, names):
+        """Rows start..stop-1 as lists of plain Python values, in the order of `names`."""
+        return [list(row) for row in zip(*(self.columns[name][start:stop].tolist() for name in names))]
+
+
+class ServerJob:
+    """One submitted job: its settings, progress and, once done, its result table and summary."""
+
+    def __init__(self, job_id, kind, params, extra):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.extra = extra  # Replica count (ensemble) or scenario list (sweep)
+        self.status = QUEUED
+        self.requests = 1  # Identical requests answered by this job
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.table = None
+        self.summary = None
+        self.error = None
+        self.pending = 0  # Ensemble tasks still to come back
+        self.samples = None  # Ensemble samples, filled in as tasks come back
+        self._finished = threading.Event()
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def describe(self):
+        info = {"id": self.id, "kind": self.kind, "status": self.status, "seed": self.params["seed"],
+                "requests": self.requests, "params": self.params}
+        if self.started is not None:
+            info["queued_seconds"] = self.started - self.submitted
+        if self.finished is not None:
+            info["seconds"] = self.finished - self.submitted
+        if self.status == DONE:
+            info["summary"] = self.summary
+            info["rows"] = self.table.length
+            info["columns"] = list(self.table.columns)
+        if self.error is not None:
+            info["error"] = self.error
+        return info
+
+
+def _run_output(result):
+    """(table, summary) of a RunResult."""
+    history = result.history
+    columns = {"month": np.arange(1, len(history) + 1), **{name: history[name] for name in METRIC_NAMES}}
+    labels, values = top_stores(result.store_sales, result.stores)
+    summary = {
+        "total_profit": float(history["profit"][-1]) if len(history) else 0.0,
+        "avg_monthly_profit": float(history["monthly_profit"].mean()) if len(history) else 0.0,
+        "total_revenue": float(history["revenue"].sum()),
+        "total_sold": int(history["sold"].sum()),
+        "events": len(result.event_history),
+        "top_stores": dict(zip(labels, values)),
+    }
+    return ResultTable(columns), summary
+
+
+def _safe_run_output(result):
+    """_run_output of one run of a batch, passing on (or returning) the error message of a failed run."""
+    if isinstance(result, str):
+        return result
+    try:
+        return _run_output(result)
+    except Exception as exc:
+        return _error(exc)
+
+
+def _ensemble_output(samples, seed):
+    """(table, summary) of ensemble samples: mean and P5/P50/P95 bands per month."""
+    bands = EnsembleResult({name: samples[j] for j, name in enumerate(METRIC_NAMES)}, seed).bands()
+    columns = {"month": np.arange(1, samples.shape[2] + 1)}
+    for metric, metric_bands in bands.items():
+        for band, values in metric_bands.items():
+            columns[f"{metric}_{band}"] = values
+    summary = {f"total_profit_{band}": float(values[-1]) for band, values in bands["profit"].items()}
+    summary["runs"] = samples.shape[1]
+    return ResultTable(columns), summary
+
+
+def _sweep_output(result):
+    """(table, summary) of a ScenarioResult: one row per scenario and month, totals per scenario."""
+    count, months = result["profit"].shape
+    columns = {"scenario": np.repeat(np.arange(count), months), "month": np.tile(np.arange(1, months + 1), count)}
+    for name, values in result.metrics.items():
+        columns[name] = values.ravel()
+    return ResultTable(columns), {"scenarios": result.totals()}
+
+
+# ------------------------------
+# Scheduler
+# ------------------------------
+class JobQueue:
+    """
+    Jobs queued onto persistent worker processes. One thread per worker
+    takes the next task (preferring one whose customers that worker holds
+    warm), sends it over, and files the result on the jobs it belongs to.
+    """
+
+    def __init__(self, workers=None):
+        self._lock = threading.Condition()
+        self._jobs = OrderedDict()  # Job id -> ServerJob, oldest first
+        self._tasks = []  # [kind, population key, payload, jobs], oldest first
+        self._closing = False
+        self.started = time.time()
+        self.counters = {"requests": 0, "merged_requests": 0, "tasks": 0, "batched_runs": 0,
+                         "warm_hits": 0, "warm_misses": 0}
+        self.workers = workers or os.cpu_count() or 1
+        self._workers = [_WorkerHandle() for _ in range(self.workers)]
+        self._threads = [threading.Thread(target=self._serve, args=(worker,), daemon=True, name="job-worker")
+                         for worker in self._workers]
+        for thread in self._threads:
+            thread.start()
+
+    # --- Submitting ---
+    def submit(self, request):
+        """(job, merged) for a request dict; merged is True when an identical job already existed."""
+        kind = request.get("kind", "run")
+        if kind not in KINDS:
+            raise ValueError(f"Unknown job kind {kind!r} (expected one of {', '.join(KINDS)})")
+        params = job_params(request.get("params"))
+        extra = None
+        if kind == "ensemble":
+            extra = int(request.get("runs", 8))
+            if extra < 1:
+                raise ValueError("An ensemble needs at least one run")
+        elif kind == "sweep":
+            extra = request.get("scenarios")
+            if not extra:
+                raise ValueError("A sweep needs a list of scenarios")
+            if params["backend"] not in ("columnar", "cohort"):
+                raise ValueError("Sweeps need the columnar or cohort backend")
+        job_id = ResultCache.make_key(kind=kind, params=params, extra=extra)[:16]
+
+        with self._lock:
+            self.counters["requests"] += 1
+            job = self._jobs.get(job_id)
+            if job is not None and job.status != FAILED:
+                job.requests += 1
+                self.counters["merged_requests"] += 1
+                self._jobs.move_to_end(job_id)
+                return job, True
+            job = ServerJob(job_id, kind, params, extra)
+            self._jobs[job_id] = job
+            key = population_key(params)
+            if kind == "run":
+                self._tasks.append(["run", key, [params], [job]])
+            elif kind == "ensemble":
+                seeds = child_sequences(seed_sequence(params["seed"]), extra)
+                job.samples = np.empty((len(METRIC_NAMES), extra, params["months"]), dtype=np.float32)
+                job.pending = -(-extra // ENSEMBLE_CHUNK)
+                base = {name: value for name, value in params.items() if name != "seed"}
+                for start in range(0, extra, ENSEMBLE_CHUNK):
+                    self._tasks.append(["ensemble", key, (base, seeds[start:start + ENSEMBLE_CHUNK]), [(job, start)]])
+            else:
+                scenarios = [{"growth_rate": params["growth_rate"], "resources": params["resources"],
+                              "soda_price": params["soda_price"], **scenario} for scenario in extra]
+                self._tasks.append(["sweep", key, (params, scenarios), [job]])
+            self._lock.notify_all()
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {"workers": self.workers, "queued_tasks": len(self._tasks), "jobs": statuses,
+                    "uptime": time.time() - self.started, **self.counters}
+
+    # --- Dispatching ---
+    def _next_task(self, worker):
+        """Take the next task for `worker`, folding every queued run with the same customers into it."""
+        index = next((i for i, task in enumerate(self._tasks[:64]) if task[1] in worker.warm), 0)
+        task = self._tasks.pop(index)
+        if task[0] == "run":
+            kind, key, batch, jobs = task
+            same = [t for t in self._tasks if t[0] == "run" and t[1] == key][:MAX_BATCH - 1]
+            for other in same:
+                batch.extend(other[2])
+                jobs.extend(other[3])
+            if same:
+                taken = {id(t) for t in same}
+                self._tasks = [t for t in self._tasks if id(t) not in taken]
+            if len(batch) > 1:
+                self.counters["batched_runs"] += len(batch)
+        self.counters["tasks"] += 1
+        return task
+
+    def _serve(self, worker):
+        while True:
+            with self._lock:
+                while not self._tasks and not self._closing:
+                    self._lock.wait()
+                if self._closing:
+                    return
+                kind, key, payload, jobs = self._next_task(worker)
+                now = time.time()
+                for job in self._jobs_of(kind, jobs):
+                    if job.status == QUEUED:
+                        job.status, job.started = RUNNING, now
+            try:
+                worker.conn.send((kind, key, payload))
+                status, result, hits, lookups = worker.conn.recv()
+            except (EOFError, OSError) as exc:
+                status, result, hits, lookups = "error", f"Worker stopped: {exc!r}", 0, 0
+                worker.restart()
+            if lookups:
+                worker.remember(key)
+            # Tables are built off the lock; only filing them onto the jobs holds it
+            try:
+                if status == "ok" and kind == "run":
+                    result = [_safe_run_output(run) for run in result]
+                elif status == "ok" and kind == "sweep":
+                    result = _sweep_output(result)
+            except Exception as exc:  # Fails the jobs instead of killing this dispatcher
+                status, result = "error", _error(exc)
+            with self._lock:
+                self.counters["warm_hits"] += hits
+                self.counters["warm_misses"] += lookups - hits
+                self._file(kind, jobs, status, result)
+
+    @staticmethod
+    def _jobs_of(kind, jobs):
+        return [job for job, _ in jobs] if kind == "ensemble" else jobs
+
+    def _file(self, kind, jobs, status, result):
+        """Store a task's result on its jobs (called with the lock held)."""
+        if status != "ok":
+            for job in self._jobs_of(kind, jobs):
+                if job.status != FAILED:
+                    self._finish(job, error=result)
+            return
+        if kind == "run":
+            for job, output in zip(jobs, result):
+                if isinstance(output, str):  # That run failed on its own
+                    self._finish(job, error=output)
+                    continue
+                job.table, job.summary = output
+                self._finish(job)
+        elif kind == "ensemble":
+            job, start = jobs[0]
+            if job.status == FAILED:
+                return
+            job.samples[:, start:start + result.shape[1]] = result
+            job.pending -= 1
+            if job.pending == 0:
+                try:
+                    job.table, job.summary = _ensemble_output(job.samples, job.params["seed"])
+                except Exception as exc:
+                    self._finish(job, error=_error(exc))
+                else:
+                    self._finish(job)
+                job.samples = None
+        else:
+            job = jobs[0]
+            job.table, job.summary = result
+            self._finish(job)
+
+    def _finish(self, job, error=None):
+        job.status = FAILED if error is not None else DONE
+        job.error = error
+        job.finished = time.time()
+        job._finished.set()
+        # Forget the oldest finished jobs past MAX_FINISHED_JOBS
+        finished = [job_id for job_id, other in self._jobs.items() if other.status in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+            self._lock.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=60)
+        for worker in self._workers:
+            worker.close()
+
+
+# ------------------------------
+# HTTP Server
+# ------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "SodaJobServer/1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object")
+            job, merged = self.server.jobs.submit(request)
+        except (ValueError, TypeError) as exc:
+            return self._send_json(400, {"error": str(exc)})
+        self._send_json(200 if merged else 202, {"id": job.id, "status": job.status, "merged": merged,
+                                                 "seed": job.params["seed"]})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split("/") if part]
+        if parts == ["stats"]:
+            return self._send_json(200, self.server.jobs.stats())
+        if len(parts) not in (2, 3) or parts[0] != "jobs" or (len(parts) == 3 and parts[2] != "result"):
+            return self._send_json(404, {"error": "Not found"})
+        job = self.server.jobs.get(parts[1])
+        if job is None:
+            return self._send_json(404, {"error": f"No job {parts[1]}"})
+        try:
+            if "wait" in query:
+                job.wait(min(float(query["wait"]), MAX_WAIT))
+            if len(parts) == 2:
+                return self._send_json(200, job.describe())
+            if job.status != DONE:
+                return self._send_json(409, {"error": f"Job is {job.status}", "status": job.status,
+                                             **({"detail": job.error} if job.error else {})})
+            names = job.table.select(query["columns"].split(",") if query.get("columns") else None)
+            if query.get("format") == "ndjson":
+                return self._stream(job.table, names)
+            offset = max(0, int(query.get("offset", 0)))
+            limit = min(max(1, int(query.get("limit", 1000))), MAX_PAGE)
+        except ValueError as exc:
+            return self._send_json(400, {"error": str(exc)})
+        end = min(offset + limit, job.table.length)
+        self._send_json(200, {"columns": names, "rows": job.table.rows(offset, end, names), "offset": offset,
+                              "total": job.table.length, "next_offset": end if end < job.table.length else None})
+
+    def _stream(self, table, names):
+        """The whole table as chunked NDJSON: a header line, then one JSON array per row."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._chunk(json.dumps({"columns": names, "total": table.length}) + "\n")
+        for start in range(0, table.length, STREAM_ROWS):
+            rows = table.rows(start, min(start + STREAM_ROWS, table.length), names)
+            self._chunk("".join(json.dumps(row) + "\n" for row in rows))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class JobServer(ThreadingHTTPServer):
+    """
+    The HTTP front end and its JobQueue. Port 0 picks a free port (see
+    .url). start() serves from a background thread, e.g. inside tests or
+    the load test; serve_forever() blocks.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, workers=None, verbose=False):
+        self.jobs = JobQueue(workers)
+        self.verbose = verbose
+        super().__init__((host, port), _Handler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True, name="job-server").start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        self.jobs.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve simulation jobs over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    server = JobServer(args.host, args.port, args.workers, args.verbose)
+    print(f"Serving simulation jobs on {server.url} with {server.jobs.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.jobs.close()
+
+
+if __name__ == "__main__":
+    main()
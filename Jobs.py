@@ -0,0 +1,126 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, CANCELLED, FAILED = "queued", "running", "done", "cancelled", "failed"
+
+
+# ------------------------------
+# Simulation Job
+# ------------------------------
+class SimulationJob:
+    """
+    Handle of one simulation running in the background.
+
+    The worker steps the simulation month by month, so progress and partial
+    history can be read at any time, and cancel() takes effect after the
+    current month.
+    """
+
+    def __init__(self, key, make_simulation, stop_when=None, on_done=None):
+        self.key = key
+        self.make_simulation = make_simulation  # Called on the worker, so setup doesn't block the caller
+        self.stop_when = stop_when
+        self.on_done = on_done  # on_done(job) once the result is ready
+        self.status = QUEUED
+        self.simulation = None
+        self.month = 0
+        self.months = None
+        self.last_record = None
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+
+    @property
+    def progress(self):
+        return self.month / self.months if self.months else 0.0
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished, failed or been cancelled."""
+        return self._finished.wait(timeout)
+
+    def partial_history(self):
+        """History recorded so far (a view that keeps growing while the job runs), or None before it starts."""
+        return self.simulation.history if self.simulation is not None else None
+
+    def run(self):
+        try:
+            if self._cancel.is_set():
+                self.status = CANCELLED
+                return
+            self.status = RUNNING
+            sim = self.make_simulation()
+            self.months = sim.months
+            self.simulation = sim
+            stopped_month = None
+            for record in sim.run_iter():
+                self.month = record["month"]
+                self.last_record = record
+                if self.stop_when is not None and self.stop_when(record):
+                    stopped_month = record["month"]
+                    break
+                if self._cancel.is_set():
+                    self.status = CANCELLED
+                    return
+            self.result = sim.result(stopped_month)
+            # DONE only after on_done, so a finished job always has its result stored
+            if self.on_done is not None:
+                self.on_done(self)
+            self.status = DONE
+        except Exception as exc:  # Reported through the handle instead of killing the worker
+            self.error = exc
+            self.status = FAILED
+        finally:
+            self._finished.set()
+
+
+# ------------------------------
+# Job Manager
+# ------------------------------
+class JobManager:
+    """
+    Background pool for simulation jobs, shared by every dashboard session.
+
+    Jobs are keyed (e.g. by ResultCache.make_key), and submitting a key that is
+    already queued or running returns the existing job instead of starting
+    another one.
+    """
+
+    def __init__(self, max_workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="simulation")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, make_simulation, stop_when=None, on_done=None):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.active and not job._cancel.is_set():
+                return job
+            job = SimulationJob(key, make_simulation, stop_when, on_done)
+            self._jobs[key] = job
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, key):
+        return self._jobs.get(key)
+
+    def _run(self, job):
+        job.run()
+        with self._lock:
+            # Finished jobs are handed out through their results (and the result cache), not kept here
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            with self._lock:
+                for job in self._jobs.values():
+                    job.cancel()
+        self._pool.shutdown(wait=True)
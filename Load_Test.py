@@ -0,0 +1,121 @@
+"""
+Load test for Job_Server.py: throughput and tail latency against concurrency.
+
+    python Load_Test.py                                  # starts a local server with all cores
+    python Load_Test.py --workers 4 --concurrency 1 4 16 64 --requests 200
+    python Load_Test.py --url http://127.0.0.1:8765 -o load.json
+
+Every client thread submits run jobs, waits for them and fetches their
+profit column, one request at a time. Settings are drawn from a small grid
+of seeds and prices, like tools exploring what-ifs on common random
+numbers: requests that repeat one already made are merged, and runs on the
+same customers are batched onto warm populations. Each concurrency level
+uses its own seeds, so it never reuses an earlier level's results.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+import numpy as np
+
+from Job_Client import JobClient
+
+CONCURRENCY = [1, 2, 4, 8, 16]
+
+
+def run_level(client, concurrency, requests, params, seeds, prices):
+    """One concurrency level: per-request latencies (seconds), wall time and the server counters' change."""
+    before = client.stats()
+    latencies, lock = [], threading.Lock()
+    remaining = [requests]
+
+    def user(index):
+        rng = random.Random(index)
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            settings = {**params, "seed": rng.choice(seeds), "soda_price": rng.choice(prices)}
+            start = time.perf_counter()
+            job = client.submit("run", settings)
+            client.wait(job["id"])
+            client.result(job["id"], columns=["profit"])
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    after = client.stats()
+    counters = {name: after[name] - before[name] for name in ("requests", "merged_requests", "tasks",
+                                                              "batched_runs", "warm_hits", "warm_misses")}
+    return np.array(latencies), seconds, counters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the simulation job server.")
+    parser.add_argument("--url", help="server to test (default: start a local one)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes of the local server")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=CONCURRENCY,
+                        help="client threads per level")
+    parser.add_argument("-n", "--requests", type=int, default=64, help="requests per level")
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--population", type=int, default=2000)
+    parser.add_argument("--backend", default="columnar")
+    parser.add_argument("--seeds", type=int, default=4, help="distinct seeds (customer sets) per level")
+    parser.add_argument("--prices", type=int, default=16, help="distinct soda prices")
+    parser.add_argument("-o", "--output", help="also save the results as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url is None:
+        from Job_Server import JobServer
+
+        server = JobServer(port=0, workers=args.workers).start()
+    client = JobClient(args.url or server.url)
+    params = {"years": args.years, "population_size": args.population, "backend": args.backend}
+    prices = np.round(np.linspace(1.0, 1.6, args.prices), 4).tolist()
+
+    print(f"{'clients':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'merged':>7} "
+          f"{'batched':>8} {'warm':>6}")
+    results = []
+    try:
+        for level, concurrency in enumerate(args.concurrency):
+            seeds = [level * 1000 + i + 1 for i in range(args.seeds)]
+            latencies, seconds, counters = run_level(client, concurrency, args.requests, params, seeds, prices)
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+            lookups = counters["warm_hits"] + counters["warm_misses"]
+            row = {
+                "concurrency": concurrency,
+                "requests": len(latencies),
+                "seconds": seconds,
+                "throughput": len(latencies) / seconds,
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+                "merged_share": counters["merged_requests"] / max(1, counters["requests"]),
+                "batched_share": counters["batched_runs"] / max(1, counters["requests"] - counters["merged_requests"]),
+                "warm_share": counters["warm_hits"] / max(1, lookups),
+            }
+            results.append(row)
+            print(f"{concurrency:7d} {row['throughput']:8.1f} {p50:9.1f} {p95:9.1f} {p99:9.1f} "
+                  f"{row['merged_share']:7.0%} {row['batched_share']:8.0%} {row['warm_share']:6.0%}")
+    finally:
+        if server is not None:
+            server.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
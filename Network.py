@@ -0,0 +1,270 @@
+"""
+Multi-factory production network.
+
+Each site is a factory with its own resources, storage, regional stores and
+customer base (a Simulation). Sites are sharded across worker processes; every month
+the coordinator sends each shard the arrivals and shipments for its sites and
+gets back one small array per site (stock, demand, sold, profit). Transfers
+along links are planned from those reports and arrive after the link's lag.
+"""
+import multiprocessing as mp
+import os
+import traceback
+
+import numpy as np
+
+from History import METRIC_NAMES
+from Random_Streams import child_sequences
+from Simulation import Simulation
+from Stores import resolve_stores
+
+REPORT_FIELDS = ["storage", "demand", "sold", "monthly_profit"]
+
+
+class Site:
+    """
+    Configuration of one production site and the stores it serves. `stores`
+    takes anything Stores.resolve_stores does (a count, names, a spec or a
+    store file); default 5 stores.
+    """
+
+    def __init__(self, name, resources, population_size, growth_rate=0.05, soda_price=1.25, stores=None):
+        self.name = name
+        self.resources = resources
+        self.population_size = population_size
+        self.growth_rate = growth_rate
+        self.soda_price = soda_price
+        self.stores = stores
+
+
+class Link:
+    """Transport route: up to `capacity` cans per month, arriving `lag` months after shipping."""
+
+    def __init__(self, source, target, capacity, lag=1, cost_per_can=0.05):
+        self.source = source
+        self.target = target
+        self.capacity = capacity
+        self.lag = lag
+        self.cost_per_can = cost_per_can
+
+
+# ------------------------------
+# Shards
+# ------------------------------
+class _Shard:
+    """The simulations of a subset of sites, advanced one month per step."""
+
+    def __init__(self, sites, seeds, months, backend):
+        self.sims = [Simulation(months=months, growth_rate=site.growth_rate, population_size=site.population_size,
+                                resources=site.resources, backend=backend, production_mode="sampled",
+                                seed=seed, soda_price=site.soda_price, stores=site.stores)
+                     for site, seed in zip(sites, seeds)]
+        self.months_run = [sim.run_iter() for sim in self.sims]
+        self.store_sales = [np.zeros(len(sim.stores), dtype=np.int64) for sim in self.sims]  # Over the whole run
+
+    def step(self, arrivals, shipments):
+        report = np.empty((len(self.sims), len(REPORT_FIELDS)))
+        for i, (sim, months_run) in enumerate(zip(self.sims, self.months_run)):
+            factory = sim.factory
+            factory.soda_stored = max(0, factory.soda_stored - int(shipments[i])) + int(arrivals[i])
+            record = next(months_run)
+            report[i] = [record[field] for field in REPORT_FIELDS]
+            self.store_sales[i] += record["store_sales"]
+        return report
+
+    def finish(self):
+        """(histories as a (sites, months, metrics) array, store sales of each site)."""
+        return np.stack([sim.history.to_numpy() for sim in self.sims]), self.store_sales
+
+
+def _shard_worker(conn, sites, seeds, months, backend):
+    """
+    Worker process: owns one shard and answers step messages with ("ok",
+    reply) until told to stop. A failure is sent back as ("error",
+    traceback) and ends the worker.
+    """
+    try:
+        shard = _Shard(sites, seeds, months, backend)
+        while True:
+            message = conn.recv()
+            if message is None:
+                conn.send(("ok", shard.finish()))
+                break
+            conn.send(("ok", shard.step(*message)))
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+    conn.close()
+
+
+class _LocalShard:
+    def __init__(self, *args):
+        self.shard = _Shard(*args)
+
+    def submit(self, arrivals, shipments):
+        self._report = self.shard.step(arrivals, shipments)
+
+    def collect(self):
+        return self._report
+
+    def finish(self):
+        return self.shard.finish()
+
+    def close(self):
+        pass
+
+
+class _ProcessShard:
+    def __init__(self, *args):
+        self.conn, child_conn = mp.Pipe()
+        self.process = mp.Process(target=_shard_worker, args=(child_conn, *args), daemon=True)
+        self.process.start()
+
+    def submit(self, arrivals, shipments):
+        try:
+            self.conn.send((arrivals, shipments))
+        except OSError:
+            pass  # The worker stopped; collect() reports why
+
+    def collect(self):
+        try:
+            status, reply = self.conn.recv()
+        except EOFError:
+            raise RuntimeError(f"Network shard process died (exit code {self.process.exitcode})") from None
+        if status == "error":
+            raise RuntimeError(f"Network shard failed:\n{reply}")
+        return reply
+
+    def finish(self):
+        self.conn.send(None)
+        result = self.collect()
+        self.process.join()
+        return result
+
+    def close(self):
+        """Stop the worker (after another shard failed)."""
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+
+
+# ------------------------------
+# Network
+# ------------------------------
+class NetworkResult:
+    def __init__(self, site_names, histories, shipped, unmet, transfer_costs, stores, store_sales):
+        self.site_names = site_names
+        self.histories = histories  # (sites, months, metrics), metrics as in History.METRIC_NAMES
+        self.shipped = shipped  # (months, links) cans shipped along each link
+        self.unmet = unmet  # (months, sites) cans demanded but not sold
+        self.transfer_costs = transfer_costs  # (months,) shipping costs
+        self.stores = stores  # Stores.StoreTable of each site
+        self.store_sales = store_sales  # Cans sold per store ID over the run, one array per site
+
+    def site_metric(self, name):
+        """(sites, months) array of one history metric."""
+        return self.histories[:, :, METRIC_NAMES.index(name)]
+
+    def network_profit(self):
+        """Cumulative profit of the whole network, after shipping costs."""
+        return self.site_metric("monthly_profit").sum(axis=0).cumsum() - self.transfer_costs.cumsum()
+
+    def store_frame(self):
+        """One row per store of every site: the site, the store's sales_frame columns and its share of its site."""
+        import pandas as pd
+
+        frames = [stores.sales_frame(sales).assign(site=name)
+                  for name, stores, sales in zip(self.site_names, self.stores, self.store_sales)]
+        return pd.concat(frames, ignore_index=True)
+
+    def sales_by(self, attribute):
+        """Network-wide sales per value of a store attribute (e.g. "region"), over the sites that have it."""
+        totals = {}
+        for stores, sales in zip(self.stores, self.store_sales):
+            if attribute in stores.attributes:
+                for value, total in stores.sales_by(sales, attribute).items():
+                    totals[value] = totals.get(value, 0) + total
+        return totals
+
+
+class Network:
+    def __init__(self, sites, links, months, seed=None, processes=None, backend="cohort"):
+        self.sites = sites
+        self.links = links
+        self.months = months
+        self.seed = seed
+        self.processes = processes if processes is not None else os.cpu_count() or 1
+        self.backend = backend
+        self.site_index = {site.name: i for i, site in enumerate(sites)}
+
+    def run(self):
+        n_sites = len(self.sites)
+        # Site i always gets seed child i, so results don't depend on the sharding
+        seeds = child_sequences(self.seed, n_sites)
+        stores = [resolve_stores(site.stores) for site in self.sites]
+        n_shards = max(1, min(self.processes, n_sites))
+        shard_sites = np.array_split(np.arange(n_sites), n_shards)
+        shard_class = _ProcessShard if n_shards > 1 else _LocalShard
+        # Shards get the resolved store tables, so store files are read once
+        sites = [Site(site.name, site.resources, site.population_size, site.growth_rate, site.soda_price, table)
+                 for site, table in zip(self.sites, stores)]
+        shards = [shard_class([sites[i] for i in ids], [seeds[i] for i in ids], self.months, self.backend)
+                  for ids in shard_sites]
+        try:
+            return self._run_shards(shards, shard_sites, stores)
+        except BaseException:
+            # A failed shard leaves the others waiting for their next month
+            for shard in shards:
+                shard.close()
+            raise
+
+    def _run_shards(self, shards, shard_sites, stores):
+        n_sites = len(self.sites)
+        sources = np.array([self.site_index[link.source] for link in self.links], dtype=np.intp)
+        targets = np.array([self.site_index[link.target] for link in self.links], dtype=np.intp)
+        max_lag = max([link.lag for link in self.links], default=0)
+        pipeline = np.zeros((self.months + max_lag + 1, n_sites))  # Cans arriving at each site per month
+        shipments = np.zeros(n_sites)
+        shipped = np.zeros((self.months, len(self.links)))
+        unmet = np.zeros((self.months, n_sites))
+        transfer_costs = np.zeros(self.months)
+
+        for month in range(self.months):
+            for shard, ids in zip(shards, shard_sites):
+                shard.submit(pipeline[month, ids], shipments[ids])
+            report = np.empty((n_sites, len(REPORT_FIELDS)))
+            for shard, ids in zip(shards, shard_sites):
+                report[ids] = shard.collect()
+
+            storage, demand, sold = report[:, 0], report[:, 1], report[:, 2]
+            unmet[month] = demand - sold
+
+            if month == self.months - 1:
+                break
+
+            # Plan next month's transfers: spare stock moves towards sites that ran
+            # short, net of what is already on its way to them
+            surplus = storage.copy()
+            # Only the next max_lag + 1 months can have shipments in flight
+            need = unmet[month] - pipeline[month + 1:month + 2 + max_lag].sum(axis=0)
+            shipments = np.zeros(n_sites)
+            for k, link in enumerate(self.links):
+                a, b = sources[k], targets[k]
+                quantity = max(0.0, min(link.capacity, surplus[a], need[b]))
+                if quantity <= 0:
+                    continue
+                surplus[a] -= quantity
+                need[b] -= quantity
+                shipments[a] += quantity
+                shipped[month, k] = quantity
+                transfer_costs[month] += quantity * link.cost_per_can
+                # Shipped at the start of next month, arrives `lag` months later
+                pipeline[min(month + 1 + link.lag, len(pipeline) - 1), b] += quantity
+
+        histories = np.empty((n_sites, self.months, len(METRIC_NAMES)))
+        store_sales = [None] * n_sites
+        for shard, ids in zip(shards, shard_sites):
+            histories[ids], shard_sales = shard.finish()
+            for i, sales in zip(ids, shard_sales):
+                store_sales[i] = sales
+        return NetworkResult([site.name for site in self.sites], histories, shipped, unmet, transfer_costs, stores,
+                             store_sales)
@@ -0,0 +1,187 @@
+"""
+Search farms / waterpumps / mines and soda price for the most profitable plan.
+
+Candidates are first screened analytically (production is capped by
+min(water, sugar, glass), so unbalanced or oversized plans only add running
+costs), then raced by successive halving: every survivor is simulated on the
+same seeds (common random numbers), the weaker half is dropped and the rest
+get more replicas, with all simulations spread over a process pool.
+"""
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Events import Event
+from Population import CAN_COUNTS, CAN_PROBS, Population
+from Production import YIELD_HIGH, YIELD_LOW
+from Random_Streams import child_sequences
+from Simulation import COST_PER_CAN, FACILITY_COSTS, Simulation
+
+# Expected raw yield of one facility, converted to recipe units
+MEAN_YIELD = (YIELD_LOW + YIELD_HIGH) / 2
+UNIT_YIELD = {"waterpumps": MEAN_YIELD, "farms": MEAN_YIELD / 2, "mines": MEAN_YIELD / 3}
+RECIPE_INPUTS = {"waterpumps": 1, "farms": 2, "mines": 3}  # Raw units per recipe unit (water, sugar, glass)
+PRODUCTION_NOISE = 50  # Largest monthly +/- variation of Factory.produce_soda
+
+
+def _max_event_effect(classification):
+    """Largest summed Effect (percent) that active events of one classification can reach at once."""
+    return sum(event["Effect"] * math.ceil(event["Time"] / max(1, event["CoolDown"]))
+               for event in Event.Event_List if event["Classification"] == classification and event["Effect"] > 0)
+
+
+# ------------------------------
+# Analytic Screening
+# ------------------------------
+def expected_capacity(resources, growth_rate):
+    """Expected sodas produced per month (ignoring events and noise)."""
+    bottleneck = min(resources[name] * UNIT_YIELD[name] for name in UNIT_YIELD)
+    return bottleneck * (1.0 + growth_rate) * 10
+
+
+def expected_demand(population_size, sample_size=20000, seed=0):
+    """Expected cans demanded per month, from the mean buy chance of a sample population."""
+    sample = Population.generate(min(population_size, sample_size), np.random.default_rng(seed))
+    return population_size * sample.buy_chance().mean() * float(CAN_COUNTS @ CAN_PROBS)
+
+
+def monthly_running_cost(resources):
+    return sum(resources[name] * cost for name, cost in FACILITY_COSTS.items())
+
+
+def is_unbalanced(resources, slack=0.25):
+    """
+    True when some resource could lose a facility and still out-produce the
+    bottleneck by more than `slack`: that facility only adds running cost.
+    """
+    bottleneck = min(resources[name] * UNIT_YIELD[name] for name in UNIT_YIELD)
+    return any(resources[name] > 0 and (resources[name] - 1) * UNIT_YIELD[name] > bottleneck * (1 + slack)
+               for name in UNIT_YIELD)
+
+
+def is_oversized(resources, growth_rate, demand, margin=0.5):
+    """True when a plan one balanced step smaller would still cover demand with `margin` to spare."""
+    step = MEAN_YIELD * (1.0 + growth_rate) * 10  # Capacity of one pump + two farms + three mines
+    return expected_capacity(resources, growth_rate) - step > demand * (1 + margin)
+
+
+def profit_upper_bound(resources, price, months, growth_rate, population_size):
+    """
+    Cumulative profit no run of the plan can exceed: every month sells at
+    most the best-case production (top yields, every positive Production
+    event active, full upward noise) and at most every customer buying the
+    largest can count with every positive Market event active. Revenue
+    rounding adds at most one can's price a month.
+    """
+    recipes = min(resources[name] * YIELD_HIGH // units for name, units in RECIPE_INPUTS.items())
+    multiplier = 1.0 + _max_event_effect("Production") / 100.0
+    produced = int(recipes * (1.0 + growth_rate) * multiplier * 10) + PRODUCTION_NOISE
+    demanded = population_size * int(CAN_COUNTS.max()) * (1.0 + _max_event_effect("Market") / 100.0)
+    margin = max(0.0, price - COST_PER_CAN)
+    return months * (margin * min(produced, demanded) + price - monthly_running_cost(resources))
+
+
+# ------------------------------
+# Simulation Workers
+# ------------------------------
+def _evaluate(sim_kwargs, seeds):
+    """Worker: final cumulative profit of one candidate on each seed."""
+    profits = np.empty(len(seeds))
+    for i, seed in enumerate(seeds):
+        sim = Simulation(seed=seed, **sim_kwargs)
+        sim.run()
+        profits[i] = sim.history["profit"][-1]
+    return profits
+
+
+def score(profits, objective="mean"):
+    """Mean profit, or a percentile such as "p5" for a risk-adjusted objective."""
+    if objective == "mean":
+        return float(np.mean(profits))
+    return float(np.percentile(profits, float(objective.lstrip("p"))))
+
+
+class OptimizationResult:
+    def __init__(self, best, best_score, candidates, screened_out):
+        self.best = best  # {"resources": {...}, "soda_price": ..., "score": ..., "replicas": ...}
+        self.best_score = best_score
+        self.candidates = candidates  # Every raced candidate, best first
+        self.screened_out = screened_out  # Reason -> plans dropped analytically or by the profit bound
+
+
+def optimize(months, growth_rate, population_size, max_facilities=12, prices=(1.25,), objective="mean",
+             min_replicas=8, max_replicas=128, keep_fraction=0.5, processes=None, seed=0,
+             backend="cohort", production_mode="sampled"):
+    """
+    Find a near-optimal resources dict and soda price.
+
+    Every combination of 0..max_facilities farms / waterpumps / mines and each
+    price is a candidate. objective is "mean" for expected cumulative profit
+    or "pN" for its N-th percentile (e.g. "p5" to guard against bad years).
+    """
+    demand = expected_demand(population_size, seed=seed)
+    screened_out = {"unbalanced": 0, "oversized": 0, "bound": 0}
+
+    plans = []
+    for farms, waterpumps, mines in itertools.product(range(max_facilities + 1), repeat=3):
+        resources = {"farms": farms, "waterpumps": waterpumps, "mines": mines}
+        if is_unbalanced(resources):
+            screened_out["unbalanced"] += len(prices)
+        elif is_oversized(resources, growth_rate, demand):
+            screened_out["oversized"] += len(prices)
+        else:
+            plans.extend({"resources": resources, "soda_price": price} for price in prices)
+
+    if not plans:
+        return OptimizationResult(None, None, [], screened_out)
+
+    # Common random numbers: every candidate sees the same seeds, so differences
+    # between candidates come from the plan, not from luck
+    seeds = child_sequences(seed, max_replicas)
+    sim_kwargs = {"months": months, "growth_rate": growth_rate, "population_size": population_size,
+                  "backend": backend, "production_mode": production_mode}
+    profits = {i: np.empty(0) for i in range(len(plans))}
+    alive = list(range(len(plans)))
+    replicas = min_replicas
+
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count() or 1) as pool:
+        while True:
+            # Only simulate the seeds each survivor hasn't run yet
+            jobs = {i: pool.submit(_evaluate, {**sim_kwargs, "resources": plans[i]["resources"],
+                                               "soda_price": plans[i]["soda_price"]},
+                                   seeds[len(profits[i]):replicas])
+                    for i in alive}
+            for i, job in jobs.items():
+                profits[i] = np.concatenate([profits[i], job.result()])
+
+            scores = {i: score(profits[i], objective) for i in alive}
+            best_score = max(scores.values())
+
+            # Branch and bound: every replica's profit, and so any objective, stays below the
+            # plan's bound, so plans whose bound is under the best score can never win
+            survivors = []
+            for i in alive:
+                plan = plans[i]
+                bound = profit_upper_bound(plan["resources"], plan["soda_price"], months, growth_rate, population_size)
+                if bound < best_score:
+                    screened_out["bound"] += 1
+                else:
+                    survivors.append(i)
+            survivors.sort(key=scores.get, reverse=True)
+
+            if replicas >= max_replicas or len(survivors) <= 1:
+                alive = survivors
+                break
+            alive = survivors[:max(1, math.ceil(len(survivors) * keep_fraction))]
+            replicas = min(max_replicas, replicas * 2)
+
+    candidates = []
+    for i in sorted(profits, key=lambda i: (len(profits[i]), score(profits[i], objective) if len(profits[i]) else -math.inf),
+                    reverse=True):
+        if len(profits[i]):
+            candidates.append({**plans[i], "score": score(profits[i], objective), "replicas": len(profits[i])})
+    best = candidates[0] if candidates else None
+    return OptimizationResult(best, best["score"] if best else None, candidates, screened_out)
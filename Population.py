@@ -0,0 +1,346 @@
+import json
+
+import numpy as np
+
+from Demand_Rules import default_model
+from Random_Streams import seed_sequence
+from Stores import resolve_stores
+
+# Customer attributes, in generation order: (low, high, kind). Integers are
+# drawn from low..high inclusive, floats from [low, high), like Agent.create_customer;
+# the store is drawn from the population's StoreTable
+ATTRIBUTE_RANGES = {
+    "base": (80, 100, "int"),
+    "age": (18, 70, "int"),
+    "salary": (5000, 12000, "int"),
+    "influence": (0.0, 1.0, "float"),
+    "location": (None, None, "store"),
+    "health": (50, 100, "int"),
+    "alternative_pull": (0.0, 1.0, "float"),
+    "festivity": (0.0, 1.0, "float"),
+}
+
+# Can-count distribution of a purchase in the default demand rules
+# (demand_rules.json): 50% buy a 6-pack, 15% buy 4-5 cans, 35% buy 1-3 cans
+CAN_COUNTS = default_model().can_counts
+CAN_PROBS = default_model().can_probs
+
+# Population files: magic, uint32 header length, JSON header, then one
+# 64-byte-aligned block per column. Version 2 keeps the store table spec
+# instead of the store names
+POPULATION_MAGIC = b"SODAPOP\0"
+POPULATION_SCHEMA_VERSION = 2
+POPULATION_COLUMNS = ["base", "age", "salary", "influence", "location", "health", "alternative_pull", "festivity"]
+_ALIGN = 64
+
+
+# ------------------------------
+# Columnar Population
+# ------------------------------
+class Population:
+    """Customer population stored as one typed NumPy array per attribute."""
+
+    def __init__(self, base, age, salary, influence, location, health,
+                 alternative_pull, festivity, stores=None):
+        # Stores.StoreTable; location holds each customer's store ID (uint8 up to 256 stores)
+        self.stores = resolve_stores(stores)
+        self.base = np.asarray(base, dtype=np.uint8)
+        self.age = np.asarray(age, dtype=np.uint8)
+        self.salary = np.asarray(salary, dtype=np.uint16)
+        self.influence = np.asarray(influence, dtype=np.float32)
+        self.location = np.asarray(location, dtype=self.stores.dtype)
+        self.health = np.asarray(health, dtype=np.uint8)
+        self.alternative_pull = np.asarray(alternative_pull, dtype=np.float32)
+        self.festivity = np.asarray(festivity, dtype=np.float32)
+        self._buy_chance = {}  # DemandModel fingerprint -> buy chances
+        self._influential = {}
+
+    @classmethod
+    def generate(cls, size, rng=None, stores=None):
+        """Create `size` customers with the same attribute ranges as Agent.create_customer."""
+        rng = rng if rng is not None else np.random.default_rng()
+        stores = resolve_stores(stores)
+        columns = {}
+        for name, (low, high, kind) in ATTRIBUTE_RANGES.items():
+            if kind == "store":
+                columns[name] = stores.sample(size, rng)
+            elif kind == "int":
+                columns[name] = rng.integers(low, high + 1, size)
+            else:
+                columns[name] = low + (high - low) * rng.random(size, dtype=np.float32)
+        return cls(stores=stores, **columns)
+
+    @classmethod
+    def from_agents(cls, agents, stores=None):
+        """Convert a list of Agent objects into a columnar population."""
+        return cls(
+            base=[a.base for a in agents],
+            age=[a.age for a in agents],
+            salary=[a.salary for a in agents],
+            influence=[a.influence for a in agents],
+            location=[a.location for a in agents],
+            health=[a.health for a in agents],
+            alternative_pull=[a.alternative_pull for a in agents],
+            festivity=[a.festivity for a in agents],
+            stores=stores,
+        )
+
+    def __len__(self):
+        return len(self.base)
+
+    # --- Persistence ---
+    def save(self, path, seed=None):
+        """
+        Write the population to a compact binary file that Population.open can
+        memory-map. `seed` (the seed it was generated from) is kept in the header.
+        """
+        columns, offset = [], 0
+        for name in POPULATION_COLUMNS:
+            array = getattr(self, name)
+            columns.append({"name": name, "dtype": array.dtype.str, "offset": offset})
+            offset += -(-array.nbytes // _ALIGN) * _ALIGN
+        header = {
+            "schema_version": POPULATION_SCHEMA_VERSION,
+            "size": len(self),
+            "seed": None if seed is None else str(seed),  # May be a 128-bit entropy value
+            "stores": self.stores.spec,
+            "columns": columns,
+        }
+        header_bytes = json.dumps(header).encode()
+        data_start = -(-(len(POPULATION_MAGIC) + 4 + len(header_bytes)) // _ALIGN) * _ALIGN
+
+        with open(path, "wb") as f:
+            f.write(POPULATION_MAGIC)
+            f.write(np.uint32(len(header_bytes)).tobytes())
+            f.write(header_bytes)
+            for column in columns:
+                f.write(b"\0" * (data_start + column["offset"] - f.tell()))
+                np.ascontiguousarray(getattr(self, column["name"])).tofile(f)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Memory-map a population file read-only. Nothing is copied or parsed
+        beyond the header, and processes that open the same file share its
+        pages. The header is available as `.file_header` (schema version, seed).
+        """
+        header, data_start = read_population_header(path)
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        arrays = {}
+        for column in header["columns"]:
+            dtype = np.dtype(column["dtype"])
+            start = data_start + column["offset"]
+            arrays[column["name"]] = data[start:start + header["size"] * dtype.itemsize].view(dtype)
+        population = cls(stores=header.get("stores", header.get("store_names")), **arrays)
+        population.file_header = header
+        return population
+
+    def buy_chance(self, model=None):
+        """Buying probability of every customer under a DemandModel (cached, attributes never change)."""
+        model = model or default_model()
+        if model.fingerprint not in self._buy_chance:
+            self._buy_chance[model.fingerprint] = model.buy_chance(self)
+        return self._buy_chance[model.fingerprint]
+
+    def influential(self, model=None):
+        """Mask of customers whose purchases boost popularity."""
+        model = model or default_model()
+        if model.fingerprint not in self._influential:
+            self._influential[model.fingerprint] = model.influential(self)
+        return self._influential[model.fingerprint]
+
+
+def read_population_header(path):
+    """(header dict, byte offset of the first column) of a population file."""
+    with open(path, "rb") as f:
+        if f.read(len(POPULATION_MAGIC)) != POPULATION_MAGIC:
+            raise ValueError(f"{path} is not a population file")
+        length = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+        header = json.loads(f.read(length))
+    if header["schema_version"] not in (1, POPULATION_SCHEMA_VERSION):
+        raise ValueError(f"{path} has population schema version {header['schema_version']}, "
+                         f"expected {POPULATION_SCHEMA_VERSION}")
+    data_start = -(-(len(POPULATION_MAGIC) + 4 + length) // _ALIGN) * _ALIGN
+    return header, data_start
+
+
+def save_population(path, size, seed=None, stores=None):
+    """Generate `size` customers from `seed` and save them to `path`; returns the seed's entropy."""
+    sequence = seed_sequence(seed)
+    Population.generate(size, np.random.default_rng(sequence), stores).save(path, seed=sequence.entropy)
+    return sequence.entropy
+
+
+def simulate_market_columnar(population, soda_price=None, base_popularity=1.0, rng=None, fixed_cans=None, model=None,
+                             counts=None):
+    """
+    Whole-array version of simulate_market for a columnar Population.
+
+    Buy chances, price elasticity, can counts and popularity boosts come from
+    `model` (a Demand_Rules.DemandModel, default demand_rules.json).
+    fixed_cans overrides the model's can-count distribution. A `counts` dict
+    receives "purchases", the number of customers who bought (for profiling).
+
+    Returns:
+        total_sales (int)
+        total_revenue (float)
+        popularity (float)
+        store_sales (int64 array, cans sold per store ID)
+    """
+    model = model or default_model()
+    rng = rng if rng is not None else np.random.default_rng()
+    soda_price = model.default_price if soda_price is None else soda_price
+    fixed_cans = model.fixed_cans if fixed_cans is None else fixed_cans
+    size = len(population)
+
+    # --- Purchase decision ---
+    chance = model.at_price(population.buy_chance(model), soda_price)
+    buyers = np.flatnonzero(rng.random(size) <= chance)
+    if fixed_cans is not None:
+        cans = np.full(len(buyers), fixed_cans, dtype=np.int64)
+    else:
+        cans = rng.choice(model.can_counts, size=len(buyers), p=model.can_probs)
+
+    total_sales = int(cans.sum())
+    total_revenue = soda_price * total_sales
+    if counts is not None:
+        counts["purchases"] = len(buyers)
+    store_sales = np.bincount(population.location[buyers], weights=cans,
+                              minlength=len(population.stores)).astype(np.int64)
+
+    # Influential boost
+    popularity = base_popularity + model.influencer_boost * int(np.count_nonzero(population.influential(model)[buyers]))
+
+    # Best store bonus
+    if store_sales.max() > size * model.best_store_cans:
+        popularity += model.best_store_boost
+
+    return total_sales, total_revenue, popularity, store_sales
+
+
+# ------------------------------
+# Cohort-Aggregated Population
+# ------------------------------
+class Cohorts:
+    """
+    Population grouped into cohorts of customers that share the same buy chance,
+    influencer flag and store. Every demand rule is a threshold test, so a
+    population of any size collapses into a few hundred cohorts.
+    """
+
+    def __init__(self, chance, influential, location, count, stores=None):
+        self.chance = np.asarray(chance, dtype=np.float64)
+        self.influential = np.asarray(influential, dtype=bool)
+        self.location = np.asarray(location, dtype=np.intp)
+        self.count = np.asarray(count, dtype=np.int64)
+        self.stores = resolve_stores(stores)
+        self.size = int(self.count.sum())
+
+    @classmethod
+    def from_population(cls, population, counts=None, model=None):
+        """Group a columnar Population into cohorts (counts optionally weights each row)."""
+        n_stores = len(population.stores)
+        chances, chance_id = np.unique(population.buy_chance(model), return_inverse=True)
+        key = (chance_id.ravel() * 2 + population.influential(model)) * n_stores + population.location
+        keys, inverse = np.unique(key, return_inverse=True)
+        weights = np.ones(len(key), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        count = np.bincount(inverse.ravel(), weights=weights, minlength=len(keys)).astype(np.int64)
+
+        keep = count > 0
+        keys, count = keys[keep], count[keep]
+        return cls(
+            chance=chances[keys // (2 * n_stores)],
+            influential=(keys // n_stores) % 2 == 1,
+            location=keys % n_stores,
+            count=count,
+            stores=population.stores,
+        )
+
+    @classmethod
+    def generate(cls, size, rng=None, model=None, stores=None):
+        """
+        Draw cohort sizes for `size` customers directly, without creating them.
+
+        Each attribute only matters through the bands between the thresholds
+        the demand rules test, so one representative value per band (weighted
+        by the band's share of its ATTRIBUTE_RANGES range) is enough to
+        evaluate the rules. Stores are picked independently of the other
+        attributes, so the customers of each (chance, influencer) cohort are
+        then split across the stores with one multinomial: the grid never
+        grows with the store count.
+        """
+        model = model or default_model()
+        rng = rng if rng is not None else np.random.default_rng()
+        stores = resolve_stores(stores)
+        if model.thresholds("location"):
+            raise ValueError("Cohorts can't be generated for demand rules that test the store")
+        names = [name for name in ATTRIBUTE_RANGES if name != "location"]
+        bands = [attribute_bands(name, model) for name in names]
+        values = np.meshgrid(*[v for v, _ in bands], indexing="ij")
+        probs = np.prod(np.meshgrid(*[p for _, p in bands], indexing="ij"), axis=0)
+
+        grid = Population(location=np.zeros(probs.size), stores=1,
+                          **{name: v.ravel() for name, v in zip(names, values)})
+        counts = rng.multinomial(size, probs.ravel() / probs.sum())
+        cohorts = cls.from_population(grid, counts=counts, model=model)
+        per_store = rng.multinomial(cohorts.count, stores.weight)  # (cohorts, stores)
+        cohort, location = np.nonzero(per_store)
+        return cls(cohorts.chance[cohort], cohorts.influential[cohort], location, per_store[cohort, location], stores)
+
+    def __len__(self):
+        return self.size
+
+
+def attribute_bands(name, model):
+    """(representative values, probabilities) of the bands of one attribute under `model`'s thresholds."""
+    low, high, kind = ATTRIBUTE_RANGES[name]
+    if kind == "int":
+        if name == model.base_attribute:
+            # Every base value is its own chance
+            values = np.arange(low, high + 1)
+            return values, np.full(len(values), 1 / len(values))
+        end = high + 1
+        cuts = {value + (key in ("max", "above")) for key, value in model.thresholds(name)}
+    else:
+        end = high
+        cuts = {float(np.nextafter(np.float32(value), np.float32(np.inf))) if key in ("max", "above") else value
+                for key, value in model.thresholds(name)}
+    edges = [low] + sorted(c for c in cuts if low < c < end) + [end]
+    values = np.array(edges[:-1], dtype=np.float32 if kind == "float" else np.int64)
+    return values, np.diff(np.array(edges, dtype=np.float64)) / (end - low)
+
+
+def simulate_market_cohorts(cohorts, soda_price=None, base_popularity=1.0, rng=None, fixed_cans=None, model=None,
+                            counts=None):
+    """
+    Cohort version of simulate_market: buyers are drawn per cohort with a
+    binomial and their can counts with a multinomial, so a month costs
+    O(#cohorts) whatever the population size.
+    """
+    model = model or default_model()
+    rng = rng if rng is not None else np.random.default_rng()
+    soda_price = model.default_price if soda_price is None else soda_price
+    fixed_cans = model.fixed_cans if fixed_cans is None else fixed_cans
+
+    # --- Purchase decision ---
+    buyers = rng.binomial(cohorts.count, model.at_price(cohorts.chance, soda_price))
+    if fixed_cans is not None:
+        cans = buyers * fixed_cans
+    else:
+        cans = rng.multinomial(buyers, model.can_probs) @ model.can_counts
+
+    total_sales = int(cans.sum())
+    total_revenue = soda_price * total_sales
+    if counts is not None:
+        counts["purchases"] = int(buyers.sum())
+    store_sales = np.bincount(cohorts.location, weights=cans,
+                              minlength=len(cohorts.stores)).astype(np.int64)
+
+    # Influential boost
+    popularity = base_popularity + model.influencer_boost * int(buyers[cohorts.influential].sum())
+
+    # Best store bonus
+    if store_sales.max() > cohorts.size * model.best_store_cans:
+        popularity += model.best_store_boost
+
+    return total_sales, total_revenue, popularity, store_sales
@@ -1,21 +1,170 @@
 import random
+from functools import lru_cache
+from statistics import NormalDist
 
-def Water_prod(resources):
+import numpy as np
+
+def Water_prod(resources, rng=random):
     water = 0
     for _ in range(resources["waterpumps"]):
-        water += random.randint(30, 60)  # Increased by 10 (was 20-50, now 30-60)
+        water += rng.randint(30, 60)  # Increased by 10 (was 20-50, now 30-60)
     return water
 
-def Sugar_prod(resources):
+def Sugar_prod(resources, rng=random):
     sugar_cane = 0
     for _ in range(resources["farms"]):
-        sugar_cane += random.randint(30, 60)  # Increased by 10 (was 20-50, now 30-60)
+        sugar_cane += rng.randint(30, 60)  # Increased by 10 (was 20-50, now 30-60)
     sugar = sugar_cane // 2  # 2 sugarcane = 1 sugar
     return sugar
 
-def Glass_prod(resources):
+def Glass_prod(resources, rng=random):
     sand = 0
     for _ in range(resources["mines"]):
-        sand += random.randint(30, 60)  # Increased by 10 (was 20-50, now 30-60)
+        sand += rng.randint(30, 60)  # Increased by 10 (was 20-50, now 30-60)
     glass = sand // 3  # 3 sand = 1 glass
     return glass
+
+
+# ------------------------------
+# Sampled (O(1)) Production
+# ------------------------------
+# Instead of one randint(30, 60) per facility, draw the total yield of all
+# facilities at once: exactly (from the distribution of the sum) up to
+# EXACT_THRESHOLD facilities, and from a normal approximation beyond that.
+YIELD_LOW = 30
+YIELD_HIGH = 60
+EXACT_THRESHOLD = 64
+
+
+@lru_cache(maxsize=None)
+def _yield_cdf(count):
+    """CDF of the summed yield of `count` facilities, offset by count * YIELD_LOW."""
+    single = np.full(YIELD_HIGH - YIELD_LOW + 1, 1.0 / (YIELD_HIGH - YIELD_LOW + 1))
+    pmf = np.ones(1)
+    for _ in range(count):
+        pmf = np.convolve(pmf, single)
+    cdf = np.cumsum(pmf)
+    cdf[-1] = 1.0
+    return cdf
+
+
+def sample_yield(count, rng=None, size=None):
+    """Total raw yield of `count` facilities (one value, or an array of `size` draws)."""
+    rng = rng if rng is not None else np.random.default_rng()
+    count = int(count)
+    if count <= 0:
+        return 0 if size is None else np.zeros(size, dtype=np.int64)
+
+    if count <= EXACT_THRESHOLD:
+        total = count * YIELD_LOW + np.searchsorted(_yield_cdf(count), rng.random(size), side="right")
+    else:
+        # Sum of `count` uniform integers: mean 45 and variance (31^2 - 1) / 12 = 80 per facility
+        mean = count * (YIELD_LOW + YIELD_HIGH) / 2
+        std = np.sqrt(count * ((YIELD_HIGH - YIELD_LOW + 1) ** 2 - 1) / 12)
+        total = np.clip(np.rint(rng.normal(mean, std, size)), count * YIELD_LOW, count * YIELD_HIGH)
+
+    if size is None:
+        return int(total)
+    return np.asarray(total, dtype=np.int64)
+
+
+def sample_yield_shared(counts, rng=None):
+    """
+    Total raw yield for every entry of `counts` (one per scenario) from a
+    single shared draw, so entries with more facilities never yield less.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    counts = np.asarray(counts, dtype=np.int64)
+    u = max(rng.random(), 1e-12)  # Inverse-CDF draw, shared by every count
+    total = np.zeros(counts.shape, dtype=np.int64)
+    for count in np.unique(counts):
+        count = int(count)
+        if count <= 0:
+            continue
+        if count <= EXACT_THRESHOLD:
+            value = count * YIELD_LOW + np.searchsorted(_yield_cdf(count), u, side="right")
+        else:
+            mean = count * (YIELD_LOW + YIELD_HIGH) / 2
+            std = np.sqrt(count * ((YIELD_HIGH - YIELD_LOW + 1) ** 2 - 1) / 12)
+            value = np.clip(np.rint(mean + std * NormalDist().inv_cdf(u)), count * YIELD_LOW, count * YIELD_HIGH)
+        total[counts == count] = value
+    return total
+
+
+def Water_prod_sampled(resources, rng=None):
+    return sample_yield(resources["waterpumps"], rng)
+
+def Sugar_prod_sampled(resources, rng=None):
+    return sample_yield(resources["farms"], rng) // 2  # 2 sugarcane = 1 sugar
+
+def Glass_prod_sampled(resources, rng=None):
+    return sample_yield(resources["mines"], rng) // 3  # 3 sand = 1 glass
+
+
+def Resource_prod_batch(resources, months=1, rng=None):
+    """
+    Water, sugar and glass yields for many months (and scenarios) in one call.
+
+    `resources` is a resources dict, giving arrays of shape (months,), or a list
+    of resources dicts (one per scenario), giving arrays of shape (scenarios, months).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    scenarios = [resources] if isinstance(resources, dict) else list(resources)
+
+    water = np.stack([sample_yield(r["waterpumps"], rng, months) for r in scenarios])
+    sugar = np.stack([sample_yield(r["farms"], rng, months) for r in scenarios]) // 2
+    glass = np.stack([sample_yield(r["mines"], rng, months) for r in scenarios]) // 3
+
+    if isinstance(resources, dict):
+        return water[0], sugar[0], glass[0]
+    return water, sugar, glass
+
+
+# ------------------------------
+# Factory Class
+# ------------------------------
+class Factory:
+    def __init__(self, resources=None, production_mode="loop", rng=None):
+        self.soda_produced = 0
+        self.soda_stored = 0
+        self.resources = resources if resources else {"farms": 1, "waterpumps": 1, "mines": 1}
+        # "loop" rolls every facility separately, "sampled" draws each resource total in O(1)
+        self.production_mode = production_mode
+        # random.Random (or the random module) in "loop" mode, a NumPy Generator in "sampled" mode
+        if rng is None:
+            rng = np.random.default_rng() if production_mode == "sampled" else random
+        self.rng = rng
+
+    def produce_soda(self, growth_rate, production_multiplier=1.0):
+        """Simulate soda production based on available resources."""
+        # Get raw materials from resources
+        if self.production_mode == "sampled":
+            water = Water_prod_sampled(self.resources, self.rng)
+            sugar = Sugar_prod_sampled(self.resources, self.rng)
+            glass = Glass_prod_sampled(self.resources, self.rng)
+        else:
+            water = Water_prod(self.resources, self.rng)
+            sugar = Sugar_prod(self.resources, self.rng)
+            glass = Glass_prod(self.resources, self.rng)
+        
+        # Production is limited by the scarcest resource
+        # Each recipe (1 water + 1 sugar + 1 glass) produces 10 sodas
+        max_production = min(water, sugar, glass)
+        
+        # Apply production multiplier (events can affect this)
+        # Growth rate is a percentage increase: 0.05 = 5% growth = 105% of base (1.0 + 0.05 = 1.05)
+        production_efficiency = 1.0 + growth_rate  # Add 1 to make it a multiplier (0.05 becomes 1.05 = 105%)
+        base_production = int(max_production * production_efficiency * production_multiplier * 10)  # 10x production per recipe
+        
+        # Realistic production variation (scaled for higher production)
+        if self.production_mode == "sampled":
+            produced = base_production + int(self.rng.integers(-50, 51))
+        else:
+            produced = base_production + self.rng.randint(-50, 50)
+        produced = max(0, produced)  # Ensure production is never negative
+        self.soda_produced = produced
+        return produced
+    
+    def update_resources(self, resources):
+        """Update resource counts."""
+        self.resources = resources
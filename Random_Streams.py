@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+
+# Every part of the model draws from its own stream, so changing how much
+# randomness one part uses never shifts the numbers another part sees.
+STREAM_NAMES = ("population", "market", "production", "events")
+
+
+def seed_sequence(seed=None):
+    """SeedSequence for an int seed (or fresh OS entropy when seed is None)."""
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def child_sequences(seed, count):
+    """
+    The first `count` children of a seed. Unlike SeedSequence.spawn this has no
+    side effects, so asking twice always gives the same children.
+    """
+    parent = seed_sequence(seed)
+    return [np.random.SeedSequence(parent.entropy, spawn_key=parent.spawn_key + (i,))
+            for i in range(count)]
+
+
+def make_streams(seed=None):
+    """One independent NumPy Generator per name in STREAM_NAMES, all derived from `seed`."""
+    children = child_sequences(seed, len(STREAM_NAMES))
+    return {name: np.random.default_rng(child) for name, child in zip(STREAM_NAMES, children)}
+
+
+def python_random(generator):
+    """random.Random seeded from a NumPy Generator, for the per-agent / per-facility code paths."""
+    return random.Random(int(generator.integers(2**63)))
+
+
+def rng_state(rng):
+    """JSON-friendly state of a NumPy Generator or random.Random (for checkpoints)."""
+    rng = getattr(rng, "rng", rng)  # Unwrap a Profiling.CountingRNG
+    if isinstance(rng, np.random.Generator):
+        return {"numpy": rng.bit_generator.state}
+    version, internal, gauss_next = rng.getstate()
+    return {"python": [version, list(internal), gauss_next]}
+
+
+def set_rng_state(rng, state):
+    """Restore a state saved by rng_state into the same kind of random source."""
+    rng = getattr(rng, "rng", rng)
+    if "numpy" in state:
+        rng.bit_generator.state = state["numpy"]
+    else:
+        version, internal, gauss_next = state["python"]
+        rng.setstate((version, tuple(internal), gauss_next))
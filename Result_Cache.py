@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+# ------------------------------
+# Result Cache
+# ------------------------------
+class ResultCache:
+    """
+    Finished runs keyed on their parameters and seed.
+
+    Recent results live in a bounded in-memory LRU; with `disk_dir` set they
+    are also written to disk, so they survive restarts and can be shared by
+    several dashboard processes. Safe to share between Streamlit sessions
+    (threads).
+    """
+
+    def __init__(self, max_entries=128, disk_dir=None, max_disk_entries=10000):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(**params):
+        """Stable key for a run's parameters (order-independent, dicts included)."""
+        text = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, key):
+        """Cached result for `key`, or None. Disk hits are promoted into memory."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._remember(key, result)
+        self._write_disk(key, result)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # --- Disk tier ---
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _read_disk(self, key):
+        if not self.disk_dir or not os.path.exists(self._path(key)):
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                result = pickle.load(f)
+            os.utime(self._path(key))  # Keeps disk pruning least-recently-used
+            return result
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None  # Missing or half-written file: treat as a miss
+
+    def _write_disk(self, key, result):
+        if not self.disk_dir:
+            return
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Drop the oldest disk entries once there are more than max_disk_entries."""
+        files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir) if name.endswith(".pkl")]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,352 @@
+"""
+Local registry of finished runs, in one SQLite file.
+
+    python Run_Registry.py list soda_runs.sqlite --where population_size=1000 --limit 20
+    python Run_Registry.py export soda_runs.sqlite 3 7 12 --metric profit -o overlay.csv
+
+Every run keeps its parameters (indexed, so filters stay fast across
+thousands of runs), its seed, summary metrics and its per-month history.
+Ensembles and scenario sweeps are stored as batches of runs. Inserts are
+bulk (one transaction per batch), and RegistryWriter moves them onto a
+background thread, so the code producing results never waits on the disk.
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from History import METRIC_NAMES
+
+DEFAULT_PATH = "soda_runs.sqlite"
+
+# Parameters with their own indexed columns; everything else goes into the params JSON
+PARAM_COLUMNS = ["months", "growth_rate", "population_size", "farms", "waterpumps", "mines", "soda_price",
+                 "backend", "production_mode"]
+SUMMARY_COLUMNS = ["total_profit", "avg_monthly_profit", "total_revenue", "total_sold", "final_storage"]
+RUN_COLUMNS = ["id", "batch_id", "created", "name", "kind", "seed", "replica", "stopped_month",
+               *PARAM_COLUMNS, *SUMMARY_COLUMNS]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    name TEXT,
+    kind TEXT NOT NULL,
+    seed TEXT,
+    params TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    batch_id INTEGER REFERENCES batches(id),
+    created REAL NOT NULL,
+    name TEXT,
+    kind TEXT NOT NULL,
+    seed TEXT,
+    replica INTEGER,
+    stopped_month INTEGER,
+    months INTEGER, growth_rate REAL, population_size INTEGER,
+    farms INTEGER, waterpumps INTEGER, mines INTEGER, soda_price REAL,
+    backend TEXT, production_mode TEXT,
+    params TEXT,
+    total_profit REAL, avg_monthly_profit REAL, total_revenue REAL, total_sold REAL, final_storage REAL
+);
+CREATE TABLE IF NOT EXISTS history (
+    run_id INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    {", ".join(f"{name} REAL" for name in METRIC_NAMES)},
+    PRIMARY KEY (run_id, month)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_settings ON runs (population_size, growth_rate, soda_price, months);
+CREATE INDEX IF NOT EXISTS runs_resources ON runs (farms, waterpumps, mines);
+CREATE INDEX IF NOT EXISTS runs_batch ON runs (batch_id, replica);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created);
+CREATE INDEX IF NOT EXISTS runs_profit ON runs (total_profit);
+"""
+
+
+def _split_params(params):
+    """(indexed column values, remaining params) of a run's settings."""
+    params = dict(params)
+    resources = params.pop("resources", None) or {}
+    columns = {name: params.pop(name, None) for name in PARAM_COLUMNS if name not in ("farms", "waterpumps", "mines")}
+    for name in ("farms", "waterpumps", "mines"):
+        columns[name] = resources.get(name)
+    # NumPy scalars (e.g. from a scenario grid) become plain numbers sqlite can bind
+    columns = {name: value.item() if isinstance(value, np.generic) else value for name, value in columns.items()}
+    params.pop("seed", None)
+    return columns, params
+
+
+def _summaries(histories):
+    """Summary columns of a (runs, months, metrics) array."""
+    profit = histories[:, :, METRIC_NAMES.index("profit")]
+    monthly = histories[:, :, METRIC_NAMES.index("monthly_profit")]
+    months = histories.shape[1]
+    return {
+        "total_profit": profit[:, -1] if months else np.zeros(len(histories)),
+        "avg_monthly_profit": monthly.mean(axis=1) if months else np.zeros(len(histories)),
+        "total_revenue": histories[:, :, METRIC_NAMES.index("revenue")].sum(axis=1),
+        "total_sold": histories[:, :, METRIC_NAMES.index("sold")].sum(axis=1),
+        "final_storage": histories[:, -1, METRIC_NAMES.index("storage")] if months else np.zeros(len(histories)),
+    }
+
+
+def _history_array(history):
+    """(months, metrics) float array of a History or array."""
+    return np.asarray(history.to_numpy() if hasattr(history, "to_numpy") else history, dtype=np.float64)
+
+
+# ------------------------------
+# Registry
+# ------------------------------
+class RunRegistry:
+    """
+    Runs stored in a SQLite file, safe to share between threads (one
+    connection per thread) and processes (WAL journal: readers don't block
+    the writer).
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Writing ---
+    def create_batch(self, kind, name=None, seed=None, params=None):
+        """New batch (an ensemble or scenario sweep) to add runs to; returns its id."""
+        with self._connect() as conn:
+            cursor = conn.execute("INSERT INTO batches (created, name, kind, seed, params) VALUES (?, ?, ?, ?, ?)",
+                                  (time.time(), name, kind, None if seed is None else str(seed),
+                                   json.dumps(params or {}, default=str)))
+        return cursor.lastrowid
+
+    def record_run(self, params, history, seed=None, name=None, kind="single", stopped_month=None):
+        """Store one finished run (History or (months, metrics) array); returns its id."""
+        return self.record_runs([params], _history_array(history)[None], seeds=[seed], name=name, kind=kind,
+                                stopped_months=[stopped_month])[0]
+
+    def record_runs(self, params, histories, seeds=None, name=None, kind="single", batch_id=None,
+                    replicas=None, stopped_months=None):
+        """
+        Bulk-insert runs in one transaction. `params` is one settings dict per
+        run (or one shared by all), `histories` a (runs, months, metrics) array.
+        Returns the new run ids.
+        """
+        histories = np.asarray(histories, dtype=np.float64)
+        count, months = histories.shape[:2]
+        params = [params] * count if isinstance(params, dict) else list(params)
+        seeds = seeds if seeds is not None else [None] * count
+        replicas = replicas if replicas is not None else [None] * count
+        stopped_months = stopped_months if stopped_months is not None else [None] * count
+        summaries = _summaries(histories)
+        created = time.time()
+
+        rows = []
+        for i in range(count):
+            columns, extra = _split_params(params[i])
+            rows.append((batch_id, created, name, kind, None if seeds[i] is None else str(seeds[i]), replicas[i],
+                         stopped_months[i], *[columns[c] for c in PARAM_COLUMNS],
+                         json.dumps(extra, default=str), *[float(summaries[c][i]) for c in SUMMARY_COLUMNS]))
+
+        insert_run = (f"INSERT INTO runs (id, batch_id, created, name, kind, seed, replica, stopped_month, "
+                      f"{', '.join(PARAM_COLUMNS)}, params, {', '.join(SUMMARY_COLUMNS)}) "
+                      f"VALUES ({', '.join('?' * (9 + len(PARAM_COLUMNS) + len(SUMMARY_COLUMNS)))})")
+        insert_month = (f"INSERT INTO history (run_id, month, {', '.join(METRIC_NAMES)}) "
+                        f"VALUES ({', '.join('?' * (2 + len(METRIC_NAMES)))})")
+        conn = self._connect()
+        with conn:
+            # Take the write lock before picking ids, so concurrent writers can't claim the same ones
+            conn.execute("BEGIN IMMEDIATE")
+            first = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM runs").fetchone()[0]
+            ids = list(range(first, first + count))
+            conn.executemany(insert_run, [(run_id, *row) for run_id, row in zip(ids, rows)])
+            month_numbers = np.arange(1, months + 1)
+            conn.executemany(insert_month, (
+                (run_id, int(month), *values)
+                for run_id, history in zip(ids, histories.tolist())
+                for month, values in zip(month_numbers, history)
+            ))
+        return ids
+
+    def writer(self):
+        """A RegistryWriter that inserts on a background thread."""
+        return RegistryWriter(self)
+
+    def delete(self, run_ids):
+        run_ids = [int(i) for i in run_ids]
+        marks = ", ".join("?" * len(run_ids))
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM history WHERE run_id IN ({marks})", run_ids)
+            conn.execute(f"DELETE FROM runs WHERE id IN ({marks})", run_ids)
+
+    # --- Queries ---
+    def find(self, limit=None, order_by="id DESC", **filters):
+        """
+        Matching runs as a DataFrame (newest first). Each filter is a column
+        of RUN_COLUMNS with a value, a (low, high) range or a list of values,
+        e.g. find(population_size=1000, growth_rate=(0.0, 0.1), kind=["single", "scenario"]).
+        """
+        import pandas as pd
+
+        where, args = [], []
+        for column, value in filters.items():
+            if column not in RUN_COLUMNS:
+                raise ValueError(f"Unknown run column: {column}")
+            if isinstance(value, tuple):
+                where.append(f"{column} BETWEEN ? AND ?")
+                args.extend(value)
+            elif isinstance(value, list):
+                where.append(f"{column} IN ({', '.join('?' * len(value))})")
+                args.extend(value)
+            elif value is None:
+                where.append(f"{column} IS NULL")
+            else:
+                where.append(f"{column} = ?")
+                args.append(value)
+        column, _, direction = order_by.partition(" ")
+        if column not in RUN_COLUMNS or direction.upper() not in ("", "ASC", "DESC"):
+            raise ValueError(f"Cannot order runs by: {order_by}")
+
+        sql = f"SELECT {', '.join(RUN_COLUMNS)}, params FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order_by}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return pd.read_sql_query(sql, self._connect(), params=args)
+
+    def history(self, run_id):
+        """(months, metrics) array of one run, in History.METRIC_NAMES order."""
+        rows = self._connect().execute(
+            f"SELECT {', '.join(METRIC_NAMES)} FROM history WHERE run_id = ? ORDER BY month", (int(run_id),)
+        ).fetchall()
+        return np.array(rows, dtype=np.float64).reshape(len(rows), len(METRIC_NAMES))
+
+    def overlay(self, run_ids, metric="profit"):
+        """One metric of several runs as a DataFrame: a row per month, a column per run id."""
+        import pandas as pd
+
+        if metric not in METRIC_NAMES:
+            raise ValueError(f"Unknown metric: {metric}")
+        run_ids = [int(i) for i in run_ids]
+        frame = pd.read_sql_query(
+            f"SELECT run_id, month, {metric} FROM history WHERE run_id IN ({', '.join('?' * len(run_ids))})",
+            self._connect(), params=run_ids)
+        return frame.pivot(index="month", columns="run_id", values=metric).reindex(columns=run_ids)
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# ------------------------------
+# Background Writer
+# ------------------------------
+class RegistryWriter:
+    """
+    Queues record_runs calls and performs them on a background thread, so
+    e.g. an ensemble keeps collecting worker results while earlier blocks
+    are written. close() (or leaving the `with` block) waits for the queue.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.error = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._work, name="registry-writer", daemon=True)
+        self._thread.start()
+
+    def record_runs(self, *args, **kwargs):
+        self._queue.put((args, kwargs))
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self.error is None:
+                try:
+                    self.registry.record_runs(*item[0], **item[1])
+                except Exception as exc:  # Reported by close(), not lost on the thread
+                    self.error = exc
+        self.registry.close()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ------------------------------
+# Command Line
+# ------------------------------
+def _parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the local run registry.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list matching runs")
+    list_parser.add_argument("registry", nargs="?", default=DEFAULT_PATH)
+    list_parser.add_argument("-w", "--where", action="append", default=[],
+                             help="column=value or column=low..high, e.g. growth_rate=0.0..0.1")
+    list_parser.add_argument("-n", "--limit", type=int, default=50)
+    list_parser.add_argument("--order-by", default="id DESC")
+
+    export_parser = commands.add_parser("export", help="write one metric of several runs side by side as CSV")
+    export_parser.add_argument("registry")
+    export_parser.add_argument("runs", nargs="+", type=int)
+    export_parser.add_argument("-m", "--metric", default="profit", choices=METRIC_NAMES)
+    export_parser.add_argument("-o", "--output", default="overlay.csv")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.registry):
+        parser.error(f"No registry at {args.registry}")
+    registry = RunRegistry(args.registry)
+    if args.command == "list":
+        filters = {}
+        for condition in args.where:
+            column, _, value = condition.partition("=")
+            low, dots, high = value.partition("..")
+            filters[column] = (_parse_value(low), _parse_value(high)) if dots else _parse_value(value)
+        runs = registry.find(limit=args.limit, order_by=args.order_by, **filters)
+        print(runs.drop(columns="params").to_string(index=False))
+    else:
+        registry.overlay(args.runs, args.metric).to_csv(args.output)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Many what-if scenarios in one pass.
+
+run_scenarios advances K scenarios (each with its own growth_rate, resources
+and soda_price) in lockstep: storage, popularity, production and the
+accounting are arrays indexed by scenario, and every month evaluates the
+customers once for all scenarios. Scenarios use common random numbers (the
+same customers, events and draws), so differences between them come from
+their settings alone.
+"""
+import itertools
+
+import numpy as np
+
+from Agent import create_population
+from Demand_Rules import resolve_model
+from Events import EventManager
+from History import METRIC_NAMES
+from Population import Cohorts, Population
+from Production import sample_yield_shared
+from Random_Streams import make_streams, python_random, seed_sequence
+from Simulation import COST_PER_CAN, FACILITY_COSTS, POPULARITY_DECAY
+
+
+def scenario_grid(**axes):
+    """
+    Every combination of the given settings, e.g.
+    scenario_grid(growth_rate=[0.0, 0.05], soda_price=[1.0, 1.25, 1.5]) gives 6 scenarios.
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+# ------------------------------
+# Batched Market
+# ------------------------------
+def _price_levels(prices, model):
+    """Distinct price factors (ascending) and the level of every scenario."""
+    factors = np.array([model.price_factor(price) for price in prices], dtype=np.float64)
+    return np.unique(factors, return_inverse=True)
+
+
+def _market_columnar(population, levels, rng, model):
+    """
+    Cans, store sales and influential buyers per price level for a columnar
+    Population. Each customer gets one uniform draw and buys at every level
+    whose factor is at least draw / chance, so one pass serves all levels.
+    """
+    chance = population.buy_chance(model)
+    draws = rng.random(len(population))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        needed = np.where(chance > 0, draws / chance, np.inf)  # Smallest price factor at which each customer buys
+    buyers = np.flatnonzero(needed <= levels[-1])
+    level = np.searchsorted(levels, needed[buyers], side="left")
+    if model.fixed_cans is not None:
+        cans = np.full(len(buyers), model.fixed_cans, dtype=np.int64)
+    else:
+        cans = rng.choice(model.can_counts, size=len(buyers), p=model.can_probs)
+
+    n_levels, n_stores = len(levels), len(population.stores)
+    store_sales = np.bincount(level * n_stores + population.location[buyers], weights=cans,
+                              minlength=n_levels * n_stores).reshape(n_levels, n_stores).cumsum(axis=0)
+    influential = np.bincount(level, weights=population.influential(model)[buyers], minlength=n_levels).cumsum()
+    return store_sales.astype(np.int64), influential
+
+
+def _market_cohorts(cohorts, levels, rng, model):
+    """
+    Cohort version of _market_columnar: the buyers added by each higher price
+    level are drawn as a binomial of the customers who didn't buy yet, so
+    buyers only grow with the level, as in the columnar version.
+    """
+    n_levels = len(levels)
+    added = np.empty((len(cohorts.count), n_levels), dtype=np.int64)
+    remaining = cohorts.count.copy()
+    previous = np.zeros(len(cohorts.count))
+    for j, factor in enumerate(levels):
+        chance = np.clip(cohorts.chance * factor, 0.0, 1.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = np.where(previous < 1, (chance - previous) / (1 - previous), 0.0)
+        added[:, j] = rng.binomial(remaining, np.clip(step, 0.0, 1.0))
+        remaining -= added[:, j]
+        previous = chance
+
+    if model.fixed_cans is not None:
+        cans = added * model.fixed_cans
+    else:
+        cans = rng.multinomial(added, model.can_probs) @ model.can_counts
+    cans = cans.cumsum(axis=1)
+
+    store_sales = np.stack([np.bincount(cohorts.location, weights=cans[:, j], minlength=len(cohorts.stores))
+                            for j in range(n_levels)]).astype(np.int64)
+    influential = added.cumsum(axis=1)[cohorts.influential].sum(axis=0)
+    return store_sales, influential
+
+
+def simulate_market_scenarios(population, prices, base_popularity, rng=None, model=None):
+    """
+    simulate_market for K scenarios at once, one price and base popularity each.
+
+    Returns (sales, revenue, popularity) arrays of shape (K,) and the store
+    sales as a (K, stores) array.
+    """
+    model = model or resolve_model()
+    rng = rng if rng is not None else np.random.default_rng()
+    prices = np.asarray(prices, dtype=np.float64)
+    levels, level_of = _price_levels(prices, model)
+    if isinstance(population, Cohorts):
+        store_sales, influential = _market_cohorts(population, levels, rng, model)
+    else:
+        store_sales, influential = _market_columnar(population, levels, rng, model)
+
+    store_sales = store_sales[level_of]
+    sales = store_sales.sum(axis=1)
+    popularity = base_popularity + model.influencer_boost * influential[level_of]
+    # Best store bonus
+    popularity = popularity + np.where(store_sales.max(axis=1) > len(population) * model.best_store_cans,
+                                       model.best_store_boost, 0.0)
+    return sales, prices * sales, popularity, store_sales
+
+
+# ------------------------------
+# Scenario Runs
+# ------------------------------
+class ScenarioResult:
+    """Monthly metrics of K scenarios, each a (scenarios, months) array."""
+
+    def __init__(self, scenarios, metrics, store_sales, monthly_events, stores, seed=None):
+        self.scenarios = scenarios  # One settings dict per scenario
+        self.metrics = metrics  # Metric name (History.METRIC_NAMES plus "demand") -> (scenarios, months) array
+        self.store_sales = store_sales  # (scenarios, stores) sales of the last month
+        self.monthly_events = monthly_events  # Events of every month, shared by all scenarios
+        self.stores = stores  # Stores.StoreTable of the store IDs in store_sales
+        self.seed = seed
+
+    def __getitem__(self, metric):
+        return self.metrics[metric]
+
+    def __len__(self):
+        return len(self.scenarios)
+
+    def totals(self):
+        """One dict per scenario: its settings and its totals."""
+        rows = []
+        for i, scenario in enumerate(self.scenarios):
+            row = {"growth_rate": scenario["growth_rate"], **scenario["resources"], "soda_price": scenario["soda_price"]}
+            row["total_profit"] = float(self.metrics["profit"][i, -1]) if self.metrics["profit"].shape[1] else 0.0
+            row["total_revenue"] = float(self.metrics["revenue"][i].sum())
+            row["total_sold"] = int(self.metrics["sold"][i].sum())
+            row["final_storage"] = float(self.metrics["storage"][i, -1]) if self.metrics["storage"].shape[1] else 0.0
+            rows.append(row)
+        return rows
+
+    def to_frame(self):
+        """totals() as a DataFrame, one row per scenario."""
+        import pandas as pd
+
+        return pd.DataFrame(self.totals())
+
+
+def _complete(scenario, model):
+    """A scenario dict with every setting filled in."""
+    resources = {"farms": 1, "waterpumps": 1, "mines": 1, **(scenario.get("resources") or {})}
+    return {"growth_rate": scenario.get("growth_rate", 0.05), "resources": resources,
+            "soda_price": scenario.get("soda_price", model.default_price)}
+
+
+def run_scenarios(scenarios, months, population_size, backend="columnar", seed=None, population_file=None,
+                  population=None, demand_rules=None, history_dtype=np.float64, stores=None):
+    """
+    Run every scenario (a dict with growth_rate, resources and soda_price;
+    missing settings take the Simulation defaults) for `months` months in
+    lockstep on one shared population.
+
+    Production is always sampled, and the backend is "columnar" or "cohort".
+    With the same seed, the customers and the event timeline are those of
+    Simulation(..., backend=backend, seed=seed); scenarios at the reference
+    price with at most EXACT_THRESHOLD facilities of each kind replay its
+    production_mode="sampled" run exactly.
+
+    `stores` only applies to generated customers: a population_file or
+    prebuilt `population` keeps its own stores, so passing both raises
+    ValueError.
+    """
+    if backend not in ("columnar", "cohort"):
+        raise ValueError("run_scenarios needs the columnar or cohort backend")
+    if stores is not None and (population_file is not None or population is not None):
+        raise ValueError("stores can't be combined with population_file or population, which keep their own stores")
+    model = resolve_model(demand_rules)
+    scenarios = [_complete(scenario, model) for scenario in scenarios]
+    sequence = seed_sequence(seed)
+    streams = make_streams(sequence)
+
+    if population is None:
+        if population_file is not None:
+            population = Population.open(population_file)
+            if backend == "cohort":
+                population = Cohorts.from_population(population, model=model)
+        else:
+            population = create_population(population_size, columnar=(backend == "columnar"),
+                                           cohorts=(backend == "cohort"), rng=streams["population"], model=model,
+                                           stores=stores)
+    market_rng, production_rng = streams["market"], streams["production"]
+    event_manager = EventManager(python_random(streams["events"]))
+
+    # Scenario settings as (K,) arrays
+    growth = np.array([s["growth_rate"] for s in scenarios], dtype=np.float64)
+    prices = np.array([s["soda_price"] for s in scenarios], dtype=np.float64)
+    facilities = {name: np.array([s["resources"][name] for s in scenarios], dtype=np.int64)
+                  for name in FACILITY_COSTS}
+    resource_costs = sum(cost * facilities[name] for name, cost in FACILITY_COSTS.items()).astype(np.float64)
+
+    count = len(scenarios)
+    metrics = {name: np.zeros((count, months), dtype=history_dtype) for name in [*METRIC_NAMES, "demand"]}
+    storage = np.zeros(count, dtype=np.int64)
+    base_popularity = np.ones(count)
+    cumulative_profit = np.zeros(count)
+    store_sales = np.zeros((count, len(population.stores)), dtype=np.int64)
+    monthly_events = []
+
+    for month in range(months):
+        # --- Events (shared by every scenario) ---
+        event_manager.update_events()
+        new_event = event_manager.trigger_random_event(chance=0.15, current_month=month)
+        monthly_events.append([new_event] if new_event else [])
+        popularity_mod = event_manager.get_popularity_modifier()
+        production_mod = event_manager.get_production_modifier()
+        market_mod = event_manager.get_market_modifier()
+
+        # --- Market ---
+        demand, revenue, popularity, store_sales = simulate_market_scenarios(
+            population, prices, base_popularity * (1.0 + popularity_mod), market_rng, model)
+        if market_mod != 0:
+            demand = np.trunc(demand * (1.0 + market_mod)).astype(np.int64)
+            revenue = revenue * (1.0 + market_mod)
+
+        # --- Production ---
+        water = sample_yield_shared(facilities["waterpumps"], production_rng)
+        sugar = sample_yield_shared(facilities["farms"], production_rng) // 2
+        glass = sample_yield_shared(facilities["mines"], production_rng) // 3
+        recipes = np.minimum(np.minimum(water, sugar), glass)
+        produced = np.trunc(recipes * (1.0 + growth) * production_mod * 10).astype(np.int64)
+        produced = np.maximum(0, produced + int(production_rng.integers(-50, 51)))
+
+        # --- Sales capped by stock, and accounting ---
+        sold = np.clip(demand, 0, np.maximum(0, produced + storage))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            revenue = np.where(demand > 0, revenue * (sold / demand), revenue)
+        revenue = np.maximum(0.0, revenue)
+        production_costs = sold * COST_PER_CAN
+        monthly_profit = revenue - production_costs - resource_costs
+        cumulative_profit += monthly_profit
+        storage = np.maximum(0, storage + produced - sold)
+
+        for name, values in (("profit", cumulative_profit), ("monthly_profit", monthly_profit),
+                             ("revenue", revenue), ("total_expenses", production_costs + resource_costs),
+                             ("production_costs", production_costs), ("resource_costs", resource_costs),
+                             ("popularity", popularity), ("storage", storage), ("production", produced),
+                             ("sold", sold), ("demand", demand)):
+            metrics[name][:, month] = values
+
+        base_popularity = np.maximum(0.0, popularity - POPULARITY_DECAY)
+
+    return ScenarioResult(scenarios, metrics, store_sales, monthly_events, population.stores,
+                          seed=sequence.entropy)
@@ -0,0 +1,432 @@
+import json
+import os
+
+import numpy as np
+
+from Agent import create_population, simulate_market_agents
+from Demand_Rules import default_model, resolve_model
+from Events import EventManager
+from History import METRICS, History, format_year_month
+from Population import Cohorts, Population, simulate_market_cohorts, simulate_market_columnar
+from Production import Factory
+from Random_Streams import make_streams, python_random, rng_state, seed_sequence, set_rng_state
+from Stores import resolve_stores
+
+CHECKPOINT_VERSION = 1
+
+# Monthly accounting, shared with the batched scenarios (Scenarios.py) and the optimizer's screening
+COST_PER_CAN = 0.25  # Ingredients, bottling and packaging of one sold can
+FACILITY_COSTS = {"farms": 40, "waterpumps": 25, "mines": 35}  # Monthly upkeep per facility
+POPULARITY_DECAY = 0.05  # Popularity lost every month
+
+
+# ------------------------------
+# Market Model
+# ------------------------------
+def simulate_market(population, soda_price=1.25, base_popularity=1.0, rng=None, model=None, stores=None, counts=None,
+                    columns=None):
+    """
+    The dashboard market model: demand_rules.json (or `model`) on any
+    population backend. A `counts` dict receives "purchases" (buying customers);
+    `columns` is a prebuilt columnar view of an agent list.
+    """
+    model = model or default_model()
+    # Columnar populations are evaluated as whole arrays
+    if isinstance(population, Population):
+        return simulate_market_columnar(population, soda_price, base_popularity, rng, model=model, counts=counts)
+    # Cohort populations draw purchases per cohort (binomial/multinomial)
+    if isinstance(population, Cohorts):
+        return simulate_market_cohorts(population, soda_price, base_popularity, rng, model=model, counts=counts)
+    return simulate_market_agents(population, soda_price, base_popularity, rng, model, stores=stores, counts=counts,
+                                  columns=columns)
+
+
+# ------------------------------
+# Simulation Class
+# ------------------------------
+class Simulation:
+    def __init__(self, months, growth_rate, population_size, resources=None, backend="agents",
+                 production_mode="loop", seed=None, history_dtype=np.float64, soda_price=1.25, profiler=None,
+                 population_file=None, population=None, demand_rules=None, stores=None):
+        self.months = months
+        self.growth_rate = growth_rate
+        self.population_size = population_size
+        self.soda_price = soda_price
+        self.resources = resources if resources else {"farms": 1, "waterpumps": 1, "mines": 1}
+        # "agents" (one Agent object per customer), "columnar" (NumPy arrays)
+        # or "cohort" (customers grouped by shared buy chance, O(#cohorts) per month)
+        self.backend = backend
+        self.production_mode = production_mode
+        self.population_file = population_file
+        # Buy-chance rules, price elasticity and can counts: a DemandModel, spec dict or spec path
+        self.demand_model = resolve_model(demand_rules)
+        # Store count, names, customer weights and attributes: a count, StoreTable, spec dict or file
+        self.stores = resolve_stores(stores)
+
+        # Separate random streams for population, market, production and events,
+        # all derived from one seed so a run can be replayed exactly
+        self.seed_sequence = seed_sequence(seed)
+        self.seed = self.seed_sequence.entropy
+        streams = make_streams(self.seed_sequence)
+        if backend == "agents":
+            population_rng = python_random(streams["population"])
+            self.market_rng = python_random(streams["market"])
+        else:
+            population_rng = streams["population"]
+            self.market_rng = streams["market"]
+        production_rng = streams["production"] if production_mode == "sampled" else python_random(streams["production"])
+
+        self.factory = Factory(self.resources, production_mode, production_rng)
+        if population is not None:
+            # Prebuilt customers (e.g. shared by several counterfactual runs of one setup)
+            self.population = population
+            self.stores = getattr(population, "stores", self.stores)
+        elif population_file is not None:
+            # A saved population (Population.save) is memory-mapped instead of regenerated
+            if backend == "agents":
+                raise ValueError("population_file needs the columnar or cohort backend")
+            population = Population.open(population_file)
+            self.population_size = len(population)
+            self.stores = population.stores
+            self.population = (population if backend == "columnar"
+                               else Cohorts.from_population(population, model=self.demand_model))
+        else:
+            self.population = create_population(population_size, columnar=(backend == "columnar"),
+                                                cohorts=(backend == "cohort"), rng=population_rng,
+                                                model=self.demand_model, stores=self.stores)
+        self.event_manager = EventManager(python_random(streams["events"]))
+
+        # Optional Profiling.Profiler; its RNG wrappers count draws, so only install them when profiling
+        self.profiler = profiler
+        if profiler is not None:
+            self.market_rng = profiler.wrap_rng(self.market_rng)
+            self.factory.rng = profiler.wrap_rng(self.factory.rng)
+            self.event_manager.rng = profiler.wrap_rng(self.event_manager.rng)
+
+        # Monthly metrics go into one preallocated column buffer (np.float32 halves its size)
+        self.history = History(months, dtype=history_dtype)
+        self.monthly_events = []  # Track events per month
+
+        # Running state, kept on the simulation so a run can be consumed month by month
+        self.month = 0  # Next month to simulate (0-based)
+        self.base_popularity = 1.0
+        self.cumulative_profit = 0.0  # Track cumulative profit across all months
+        self.store_sales = np.zeros(len(self.stores), dtype=np.int64)  # Cans sold per store ID in the latest month
+
+    def run(self, stop_when=None, checkpoint_path=None, checkpoint_every=None):
+        """
+        Run the remaining months and return the last month's store sales array.
+
+        stop_when(record) can end the run early, e.g.
+        stop_when=lambda r: r["profit"] < -1000 stops once cumulative profit drops below -$1000.
+        With checkpoint_path and checkpoint_every, a checkpoint is saved every
+        `checkpoint_every` months so a crashed run can resume with load_checkpoint.
+        """
+        for record in self.run_iter():
+            if checkpoint_every and record["month"] % checkpoint_every == 0:
+                self.save_checkpoint(checkpoint_path)
+            if stop_when is not None and stop_when(record):
+                break
+        return self.store_sales
+
+    def run_iter(self):
+        """
+        Simulate month by month, yielding each month's record as soon as it is
+        computed. Stop consuming the generator to cancel the rest of the run.
+        """
+        profiler = self.profiler
+        # Agent attributes never change during a run, so their columnar view
+        # (and its buy chances) is built once instead of every month
+        agent_columns = (Population.from_agents(self.population, self.stores)
+                         if not isinstance(self.population, (Population, Cohorts)) else None)
+        while self.month < self.months:
+            month = self.month
+            if profiler is not None:
+                profiler.start_month(month)
+            # Update event manager
+            self.event_manager.update_events()
+            
+            # Try to trigger a random event
+            new_event = self.event_manager.trigger_random_event(chance=0.15, current_month=month)
+            month_events = []
+            if new_event:
+                month_events.append(new_event)
+            
+            # Get event modifiers
+            popularity_mod = self.event_manager.get_popularity_modifier()
+            production_mod = self.event_manager.get_production_modifier()
+            market_mod = self.event_manager.get_market_modifier()
+            if profiler is not None:
+                profiler.lap("events")
+            
+            # Apply popularity modifier to base popularity
+            adjusted_popularity = self.base_popularity * (1.0 + popularity_mod)
+            
+            # Simulate market with adjusted popularity
+            market_counts = {} if profiler is not None else None
+            total_sales, total_revenue, popularity, store_sales = simulate_market(
+                self.population, soda_price=self.soda_price, base_popularity=adjusted_popularity, rng=self.market_rng,
+                model=self.demand_model, stores=self.stores, counts=market_counts,
+                columns=agent_columns
+            )
+            
+            # Apply market modifier to sales (affects demand)
+            if market_mod != 0:
+                total_sales = int(total_sales * (1.0 + market_mod))
+                total_revenue = total_revenue * (1.0 + market_mod)
+            if profiler is not None:
+                profiler.lap("market")
+            
+            # Produce soda with production modifier
+            produced = self.factory.produce_soda(self.growth_rate, production_mod)
+            available = max(0, produced + self.factory.soda_stored)  # Ensure available is never negative
+            if profiler is not None:
+                profiler.lap("production")
+
+            # Cap sales by available soda and adjust revenue proportionally
+            original_sales = total_sales
+            total_sales = min(total_sales, available)
+            total_sales = max(0, total_sales)  # Ensure sold is never negative
+            if original_sales > 0:
+                total_revenue = total_revenue * (total_sales / original_sales)
+            total_revenue = max(0, total_revenue)  # Ensure revenue is never negative
+
+            # Calculate production costs (realistic cost structure)
+            # Cost per can includes: ingredients, bottling, packaging
+            # Reduced cost due to economies of scale with 10x production efficiency
+            production_costs = total_sales * COST_PER_CAN  # Only cost for sold cans
+            
+            # Calculate resource maintenance costs (scaled to be profitable at reasonable scale)
+            # These represent labor, utilities, maintenance for each facility
+            # Costs are lower to allow profitability with smaller customer bases
+            resource_costs = sum(self.resources[name] * cost for name, cost in FACILITY_COSTS.items())
+            
+            # Calculate monthly profit (revenue - production costs - resource costs)
+            monthly_profit = total_revenue - production_costs - resource_costs
+            # Allow negative profit (losses) - no max(0) constraint
+            
+            # Add monthly profit to cumulative total
+            self.cumulative_profit += monthly_profit
+            
+            # Track monthly costs
+            total_expenses = production_costs + resource_costs
+
+            # Update storage
+            if total_sales > produced:
+                self.factory.soda_stored -= (total_sales - produced)
+                self.factory.soda_produced = 0
+            else:
+                self.factory.soda_stored += produced - total_sales
+            self.factory.soda_stored = max(0, self.factory.soda_stored)  # Ensure storage is never negative
+            if profiler is not None:
+                profiler.lap("accounting")
+
+            # Record data
+            self.history.append(
+                profit=self.cumulative_profit,  # Cumulative profit (adds up year to year)
+                monthly_profit=monthly_profit,
+                revenue=total_revenue,
+                total_expenses=total_expenses,
+                production_costs=production_costs,
+                resource_costs=resource_costs,
+                popularity=popularity,
+                storage=self.factory.soda_stored,
+                production=produced,
+                sold=total_sales,  # Sold = quantity of sodas
+            )
+            self.monthly_events.append(month_events)
+
+            self.store_sales = store_sales
+
+            # Apply monthly popularity depreciation
+            self.base_popularity = max(0.0, popularity - POPULARITY_DECAY)
+            self.month += 1
+            if profiler is not None:
+                profiler.lap("history")
+                profiler.count("agents_evaluated", self.population_size)
+                profiler.count("purchases", market_counts["purchases"])
+                profiler.count("cans_demanded", original_sales)
+                profiler.count("events_triggered", len(month_events))
+                profiler.end_month()
+
+            yield {
+                "month": month + 1,  # 1-based, like the Year/Month labels
+                "demand": original_sales,  # Cans customers wanted, before the stock cap
+                "sold": total_sales,
+                "revenue": total_revenue,
+                "production_costs": production_costs,
+                "resource_costs": resource_costs,
+                "total_expenses": total_expenses,
+                "monthly_profit": monthly_profit,
+                "profit": self.cumulative_profit,
+                "production": produced,
+                "storage": self.factory.soda_stored,
+                "popularity": popularity,
+                "events": month_events,
+                "store_sales": store_sales,
+            }
+
+    # --- Checkpoints ---
+    def snapshot(self, history=True):
+        """
+        Full run state: settings, running totals, factory, event manager, RNG
+        states and recorded history. The population is not included; it is
+        rebuilt from the seed (or population_file) on restore.
+
+        history=False takes only the state, in time independent of the months
+        run so far: the history array (returned as None), the monthly events
+        and the event history are left out, and whoever restores it passes
+        them back in (see Attribution.py).
+        """
+        events = self.event_manager
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "config": {
+                "months": self.months,
+                "growth_rate": self.growth_rate,
+                "population_size": self.population_size,
+                "resources": self.resources,
+                "backend": self.backend,
+                "production_mode": self.production_mode,
+                "seed": {"entropy": str(self.seed_sequence.entropy), "spawn_key": list(self.seed_sequence.spawn_key)},
+                "history_dtype": np.dtype(self.history.buffer.dtype).str,
+                "soda_price": self.soda_price,
+                "population_file": self.population_file,
+                "demand_rules": self.demand_model.spec,
+                "stores": self.stores.spec,
+            },
+            "month": self.month,
+            "base_popularity": self.base_popularity,
+            "cumulative_profit": self.cumulative_profit,
+            "store_sales": self.store_sales.tolist(),
+            "factory": {"soda_stored": self.factory.soda_stored, "soda_produced": self.factory.soda_produced},
+            "events": events.state(history),
+            "rng": {"market": rng_state(self.market_rng), "production": rng_state(self.factory.rng),
+                    "events": rng_state(events.rng)},
+        }
+        if not history:
+            return state, None
+        state["monthly_events"] = [[events.index[event["Name"]] for event in month] for month in self.monthly_events]
+        return state, self.history.to_numpy()
+
+    @classmethod
+    def from_snapshot(cls, state, history, profiler=None, population=None):
+        """Rebuild a Simulation from snapshot() output; it continues exactly where the original stopped."""
+        if state["version"] != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {state['version']}")
+        config = dict(state["config"])
+        seed = config.pop("seed")
+        config["seed"] = np.random.SeedSequence(int(seed["entropy"]), spawn_key=tuple(seed["spawn_key"]))
+        config["history_dtype"] = np.dtype(config["history_dtype"])
+        sim = cls(profiler=profiler, population=population, **config)
+
+        sim.month = state["month"]
+        sim.base_popularity = state["base_popularity"]
+        sim.cumulative_profit = state["cumulative_profit"]
+        store_sales = state["store_sales"]
+        if store_sales and isinstance(store_sales[0], dict):  # Older checkpoints kept [{"store": name, "sales": n}, ...]
+            store_sales = [entry["sales"] for entry in store_sales]
+        if store_sales:
+            sim.store_sales = np.asarray(store_sales, dtype=np.int64)
+        sim.factory.soda_stored = state["factory"]["soda_stored"]
+        sim.factory.soda_produced = state["factory"]["soda_produced"]
+        sim.event_manager.restore(state["events"])
+        sim.monthly_events = [[sim.event_manager.events[i] for i in month] for month in state.get("monthly_events", [])]
+        set_rng_state(sim.market_rng, state["rng"]["market"])
+        set_rng_state(sim.factory.rng, state["rng"]["production"])
+        set_rng_state(sim.event_manager.rng, state["rng"]["events"])
+        sim.history.buffer[:len(history)] = history
+        sim.history.length = len(history)
+        return sim
+
+    def save_checkpoint(self, path):
+        """Write snapshot() to a compressed .npz file (atomically, so a crash never leaves half a checkpoint)."""
+        state, history = self.snapshot()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, history=history,
+                                state=np.frombuffer(json.dumps(state, default=_json_default).encode(), dtype=np.uint8))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_checkpoint(cls, path, profiler=None):
+        with np.load(path) as data:
+            state = json.loads(data["state"].tobytes())
+            history = data["history"]
+        return cls.from_snapshot(state, history, profiler)
+
+    def result(self, stopped_month=None):
+        """Compact RunResult of the months run so far (no population or RNG state)."""
+        return RunResult(self.history, self.store_sales, list(self.event_manager.event_history),
+                         self.seed, stopped_month,
+                         self.profiler.report() if self.profiler is not None else None, self.stores)
+
+    def history_table(self):
+        """Monthly histories as named columns (the layout of the dashboard table and CSV export)."""
+        columns = {"Year/Month": [format_year_month(m) for m in range(1, len(self.history) + 1)]}
+        for name, label in METRICS:
+            columns[label] = self.history[name]
+        return columns
+
+    # The old per-metric history lists are now read-only views of the history buffer
+
+    @property
+    def profit_history(self):
+        return self.history["profit"]
+
+    @property
+    def monthly_profit_history(self):
+        return self.history["monthly_profit"]
+
+    @property
+    def revenue_history(self):
+        return self.history["revenue"]
+
+    @property
+    def total_expenses_history(self):
+        return self.history["total_expenses"]
+
+    @property
+    def production_costs_history(self):
+        return self.history["production_costs"]
+
+    @property
+    def resource_costs_history(self):
+        return self.history["resource_costs"]
+
+    @property
+    def popularity_history(self):
+        return self.history["popularity"]
+
+    @property
+    def storage_history(self):
+        return self.history["storage"]
+
+    @property
+    def production_history(self):
+        return self.history["production"]
+
+    @property
+    def sold_history(self):
+        return self.history["sold"]
+
+
+def _json_default(value):
+    """NumPy scalars in checkpoint state (e.g. store sales) become plain numbers."""
+    return value.item()
+
+
+# ------------------------------
+# Run Result
+# ------------------------------
+class RunResult:
+    """What the dashboard and caches keep of a finished run: small and cheap to pickle."""
+
+    def __init__(self, history, store_sales, event_history, seed, stopped_month=None, profile=None, stores=None):
+        self.history = history
+        self.store_sales = store_sales  # Cans sold per store ID in the last month
+        self.stores = resolve_stores(stores)
+        self.event_history = event_history  # List of (event, month) tuples
+        self.seed = seed
+        self.stopped_month = stopped_month  # Month an early stop ended the run, if any
+        self.profile = profile  # Profiler.report() of the run, when it was profiled
@@ -1,506 +1,517 @@
-import random
-import matplotlib.pyplot as plt
+import os
+
 import streamlit as st
-import importlib.util
-
-# Import Event class from file with spaces in name
-spec = importlib.util.spec_from_file_location("event_module", "Event List and caculator.py")
-event_module = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(event_module)
-Event = event_module.Event
-
-# Import Production functions
-spec_prod = importlib.util.spec_from_file_location("production_module", "Production.py")
-production_module = importlib.util.module_from_spec(spec_prod)
-spec_prod.loader.exec_module(production_module)
-Water_prod = production_module.Water_prod
-Sugar_prod = production_module.Sugar_prod
-Glass_prod = production_module.Glass_prod
-
-
-# ------------------------------
-# Factory Class
-# ------------------------------
-class Factory:
-    def __init__(self, resources=None):
-        self.soda_produced = 0
-        self.soda_stored = 0
-        self.resources = resources if resources else {"farms": 1, "waterpumps": 1, "mines": 1}
-
-    def produce_soda(self, growth_rate, production_multiplier=1.0):
-        """Simulate soda production based on available resources."""
-        # Get raw materials from resources
-        water = Water_prod(self.resources)
-        sugar = Sugar_prod(self.resources)
-        glass = Glass_prod(self.resources)
-        
-        # Production is limited by the scarcest resource
-        # Each recipe (1 water + 1 sugar + 1 glass) produces 10 sodas
-        max_production = min(water, sugar, glass)
-        
-        # Apply production multiplier (events can affect this)
-        # Growth rate is a percentage increase: 0.05 = 5% growth = 105% of base (1.0 + 0.05 = 1.05)
-        production_efficiency = 1.0 + growth_rate  # Add 1 to make it a multiplier (0.05 becomes 1.05 = 105%)
-        base_production = int(max_production * production_efficiency * production_multiplier * 10)  # 10x production per recipe
-        
-        # Realistic production variation (scaled for higher production)
-        produced = base_production + random.randint(-50, 50)
-        produced = max(0, produced)  # Ensure production is never negative
-        self.soda_produced = produced
-        return produced
-    
-    def update_resources(self, resources):
-        """Update resource counts."""
-        self.resources = resources
-
-
-# ------------------------------
-# Agent Class
-# ------------------------------
-class Agent:
-    def __init__(self, name):
-        self.name = name
-        self.create_customer()
-
-    def create_customer(self):
-        locations = ['Store 1', 'Store 2', 'Store 3', 'Store 4', 'Store 5']
-        self.base = random.randint(80, 100)
-        self.age = random.randint(18, 70)
-        self.salary = random.randint(5000, 12000)
-        self.influence = random.uniform(0, 1)
-        self.location = random.choice(locations)
-        self.health = random.randint(50, 100)
-        self.alternative_pull = random.uniform(0, 1)
-        self.festivity = random.uniform(0, 1)
-
-
-# ------------------------------
-# Simulation Functions
-# ------------------------------
-def create_population(size: int):
-    return [Agent(f"Customer_{i+1}") for i in range(size)]
-
-
-def simulate_market(population, soda_price=1.25, base_popularity=1.0):
-    total_sales = 0
-    total_revenue = 0
-    store_sales = {f"Store {i}": 0 for i in range(1, 6)}
-    popularity = base_popularity
-
-    for agent in population:
-        buy_chance = agent.base / 100
-
-        # Adjust buy chance
-        if 18 <= agent.age <= 28:
-            buy_chance += 0.03
-        elif agent.age >= 70:
-            buy_chance -= 0.03
-
-        if agent.salary < 7000:
-            buy_chance += 0.10
-        elif agent.salary < 10000:
-            buy_chance += 0.07
-        else:
-            buy_chance += 0.04
-
-        if agent.health >= 90:
-            buy_chance -= 0.05
-        elif 50 <= agent.health < 89:
-            buy_chance += 0.03
-
-        if agent.festivity >= 0.8:
-            buy_chance += 0.1
-        if agent.alternative_pull >= 0.7:
-            buy_chance -= 0.15
-
-        buy_chance = max(0, min(buy_chance, 1))
-
-        # Decide if agent buys
-        if random.random() <= buy_chance:
-            # Realistic: customers buy more cans to increase sales volume
-            # Higher chance of buying 6-packs or multiple cans
-            if random.random() < 0.5:  # 50% chance of buying a 6-pack
-                cans = 6
-            elif random.random() < 0.3:  # 30% chance of buying 4-5 cans
-                cans = random.randint(4, 5)
-            else:  # 20% chance of buying 1-3 individual cans
-                cans = random.randint(1, 3)
-            total_sales += cans
-            total_revenue += soda_price * cans
-            store_sales[agent.location] += cans
-
-            if agent.influence >= 0.7:
-                popularity += 0.02
-
-    # Best store bonus
-    best_store = max(store_sales, key=store_sales.get)
-    if store_sales[best_store] > len(population) * 3:
-        popularity += 0.03
-
-    # Convert to list format for charts
-    store_sales_list = [{"store": k, "sales": v} for k, v in store_sales.items()]
-    return total_sales, total_revenue, popularity, store_sales_list
-
-
-# ------------------------------
-# Event Manager
-# ------------------------------
-class EventManager:
-    def __init__(self):
-        self.active_events = []  # List of (event, months_remaining)
-        self.event_cooldowns = {}  # Dict of event_name: months_until_available
-        self.event_history = []  # List of events that occurred
-        
-    def update_events(self):
-        """Update active events and cooldowns."""
-        # Decrease time for active events
-        self.active_events = [(event, time - 1) for event, time in self.active_events if time > 1]
-        
-        # Decrease cooldowns
-        for event_name in list(self.event_cooldowns.keys()):
-            self.event_cooldowns[event_name] -= 1
-            if self.event_cooldowns[event_name] <= 0:
-                del self.event_cooldowns[event_name]
-    
-    def trigger_random_event(self, chance=0.15, current_month=0):
-        """Try to trigger a random event."""
-        if random.random() > chance:
-            return None
-        
-        # Get available events (not on cooldown)
-        available_events = [e for e in Event.Event_List 
-                           if e["Name"] not in self.event_cooldowns]
-        
-        if not available_events:
-            return None
-        
-        # Select random event
-        event = random.choice(available_events)
-        
-        # Add to active events
-        self.active_events.append((event, event["Time"]))
-        
-        # Add to cooldown
-        self.event_cooldowns[event["Name"]] = event["CoolDown"]
-        
-        # Add to history with current month
-        self.event_history.append((event, current_month + 1))
-        
-        return event
-    
-    def get_popularity_modifier(self):
-        """Get total popularity modifier from active events."""
-        modifier = 0
-        for event, _ in self.active_events:
-            if event["Classification"] == "Popularity":
-                modifier += event["Effect"]
-        return modifier / 100.0  # Convert to percentage
-    
-    def get_production_modifier(self):
-        """Get total production modifier from active events."""
-        modifier = 0
-        for event, _ in self.active_events:
-            if event["Classification"] == "Production":
-                modifier += event["Effect"]
-        # Negative effects reduce production, so convert to multiplier
-        # Effect of -2 means 2% reduction = 0.98 multiplier
-        return max(0.1, 1.0 + (modifier / 100.0))  # Clamp between 0.1 and above
-    
-    def get_market_modifier(self):
-        """Get market modifier (affects sales)."""
-        modifier = 0
-        for event, _ in self.active_events:
-            if event["Classification"] == "Market":
-                modifier += event["Effect"]
-        return modifier / 100.0  # Convert to percentage
-
-
-# ------------------------------
-# Simulation Class
-# ------------------------------
-class Simulation:
-    def __init__(self, months, growth_rate, population_size, resources=None):
-        self.months = months
-        self.growth_rate = growth_rate
-        self.population_size = population_size
-        self.resources = resources if resources else {"farms": 1, "waterpumps": 1, "mines": 1}
-        self.factory = Factory(self.resources)
-        self.population = create_population(population_size)
-        self.event_manager = EventManager()
-
-        # Tracking lists
-        self.profit_history = []  # Total profit (revenue - costs)
-        self.revenue_history = []
-        self.popularity_history = []
-        self.storage_history = []
-        self.production_history = []
-        self.sold_history = []
-        self.monthly_events = []  # Track events per month
-        self.monthly_profit_history = []  # Track monthly profit (not cumulative)
-        self.production_costs_history = []  # Track production costs
-        self.resource_costs_history = []  # Track resource maintenance costs
-        self.total_expenses_history = []  # Track total expenses (production + resource costs)
-
-    def run(self):
-        base_popularity = 1.0
-        cumulative_profit = 0.0  # Track cumulative profit across all months
-        for month in range(self.months):
-            # Update event manager
-            self.event_manager.update_events()
-            
-            # Try to trigger a random event
-            new_event = self.event_manager.trigger_random_event(chance=0.15, current_month=month)
-            month_events = []
-            if new_event:
-                month_events.append(new_event)
-            
-            # Get event modifiers
-            popularity_mod = self.event_manager.get_popularity_modifier()
-            production_mod = self.event_manager.get_production_modifier()
-            market_mod = self.event_manager.get_market_modifier()
-            
-            # Apply popularity modifier to base popularity
-            adjusted_popularity = base_popularity * (1.0 + popularity_mod)
-            
-            # Simulate market with adjusted popularity
-            total_sales, total_revenue, popularity, store_sales = simulate_market(
-                self.population, soda_price=1.25, base_popularity=adjusted_popularity
-            )
-            
-            # Apply market modifier to sales (affects demand)
-            if market_mod != 0:
-                total_sales = int(total_sales * (1.0 + market_mod))
-                total_revenue = total_revenue * (1.0 + market_mod)
-            
-            # Produce soda with production modifier
-            produced = self.factory.produce_soda(self.growth_rate, production_mod)
-            available = max(0, produced + self.factory.soda_stored)  # Ensure available is never negative
-
-            # Cap sales by available soda and adjust revenue proportionally
-            original_sales = total_sales
-            total_sales = min(total_sales, available)
-            total_sales = max(0, total_sales)  # Ensure sold is never negative
-            if original_sales > 0:
-                total_revenue = total_revenue * (total_sales / original_sales)
-            total_revenue = max(0, total_revenue)  # Ensure revenue is never negative
-
-            # Calculate production costs (realistic cost structure)
-            # Cost per can includes: ingredients, bottling, packaging
-            # Reduced cost due to economies of scale with 10x production efficiency
-            cost_per_can = 0.25  # Lower cost per can due to batch production efficiency
-            production_costs = total_sales * cost_per_can  # Only cost for sold cans
-            
-            # Calculate resource maintenance costs (scaled to be profitable at reasonable scale)
-            # These represent labor, utilities, maintenance for each facility
-            # Costs are lower to allow profitability with smaller customer bases
-            farm_cost = self.resources["farms"] * 40  # $40 per farm per month (labor, land, equipment)
-            waterpump_cost = self.resources["waterpumps"] * 25  # $25 per waterpump per month (utilities, maintenance)
-            mine_cost = self.resources["mines"] * 35  # $35 per mine per month (labor, equipment, processing)
-            resource_costs = farm_cost + waterpump_cost + mine_cost
-            
-            # Calculate monthly profit (revenue - production costs - resource costs)
-            monthly_profit = total_revenue - production_costs - resource_costs
-            # Allow negative profit (losses) - no max(0) constraint
-            
-            # Add monthly profit to cumulative total
-            cumulative_profit += monthly_profit
-            
-            # Track monthly costs
-            total_expenses = production_costs + resource_costs
-            self.production_costs_history.append(production_costs)
-            self.resource_costs_history.append(resource_costs)
-            self.total_expenses_history.append(total_expenses)
-            self.monthly_profit_history.append(monthly_profit)
-
-            # Update storage
-            if total_sales > produced:
-                self.factory.soda_stored -= (total_sales - produced)
-                self.factory.soda_produced = 0
-            else:
-                self.factory.soda_stored += produced - total_sales
-            self.factory.soda_stored = max(0, self.factory.soda_stored)  # Ensure storage is never negative
-
-            # Record data
-            self.profit_history.append(cumulative_profit)  # Cumulative profit (adds up year to year)
-            self.revenue_history.append(total_revenue)
-            self.popularity_history.append(popularity)
-            self.storage_history.append(self.factory.soda_stored)
-            self.production_history.append(produced)
-            self.sold_history.append(total_sales)  # Sold = quantity of sodas
-            self.monthly_events.append(month_events)
-
-            # Apply popularity depreciation of 0.05 per month
-            base_popularity = max(0.0, popularity - 0.05)
-
-        # Return the last store_sales list
-        return store_sales
-
-
-# ------------------------------
-
-# Helper function to format month as Year/Month
-def format_year_month(month_num):
-    """Convert month number (1-based) to Year/Month format."""
-    year = ((month_num - 1) // 12) + 1
-    month = ((month_num - 1) % 12) + 1
-    return f"Year {year}, Month {month}"
+
+# The model lives in importable, UI-free modules; pandas and matplotlib are
+# only loaded once there is something to show
+from Demand_Rules import default_model
+from Downsample import lttb, lttb_rows
+from History import METRIC_NAMES
+from Jobs import CANCELLED, DONE, FAILED, JobManager
+from Profiling import Profiler
+from Result_Cache import ResultCache
+from Run_Registry import DEFAULT_PATH, RunRegistry
+from Simulation import Simulation, format_year_month
+from Stores import top_stores
+
+
+CHART_POINTS = 1000  # Samples per chart; longer histories are downsampled with LTTB
+LIVE_CHART_POINTS = 500
+TABLE_PAGE_SIZES = [100, 500, 1000]
+SURROGATE_PATH = "surrogate.npz"
+
+
+@st.cache_resource
+def get_result_cache():
+    """One result cache shared by every session; set SODA_CACHE_DIR to also keep results on disk."""
+    return ResultCache(max_entries=128, disk_dir=os.environ.get("SODA_CACHE_DIR"))
+
+
+@st.cache_resource
+def get_run_registry():
+    """Every finished dashboard run is kept here (SODA_REGISTRY, default soda_runs.sqlite) to browse later."""
+    return RunRegistry(os.environ.get("SODA_REGISTRY", DEFAULT_PATH))
+
+
+@st.cache_resource
+def get_surrogate():
+    """Instant-estimate model (SODA_SURROGATE, default surrogate.npz), if one has been trained."""
+    from Surrogate import Surrogate
+
+    path = os.environ.get("SODA_SURROGATE", SURROGATE_PATH)
+    return Surrogate.load(path) if os.path.exists(path) else None
+
+
+@st.cache_resource
+def get_job_manager():
+    """Background simulation workers shared by every session."""
+    return JobManager(max_workers=int(os.environ.get("SODA_WORKERS", 2)))
+
+
+def store_result(result, params=None):
+    """Keep a finished run (and the settings that produced it) in the session for display."""
+    st.session_state["run_params"] = params
+    st.session_state["df"] = result.history.to_frame()  # Views the history buffer, no copy
+    st.session_state["store_sales"] = result.store_sales
+    st.session_state["result"] = result
+    st.session_state["months"] = result.history.months
+
+
+@st.fragment(run_every=0.5)
+def show_job(job):
+    """Progress, partial results and a cancel button while a background run is going."""
+    if job.status == DONE:
+        del st.session_state["job"]
+        store_result(job.result, st.session_state.get("submitted_params"))
+        st.rerun()
+    if job.status == FAILED:
+        del st.session_state["job"]
+        st.error(f"Simulation failed: {job.error}")
+        return
+    if job.status == CANCELLED:
+        del st.session_state["job"]
+        st.info(f"Simulation cancelled after {job.month} months.")
+        return
+
+    months = job.months or 1
+    text = f"Simulated {format_year_month(job.month)}" if job.month else "Starting simulation..."
+    st.progress(job.progress, text=text)
+    if job.last_record is not None:
+        st.metric("Total Profit so far", f"${job.last_record['profit']:,.2f}")
+        profit = job.partial_history()["profit"]
+        # Downsampled so redraws stay cheap on long runs
+        st.line_chart(profit[lttb(profit, LIVE_CHART_POINTS)], height=250)
+    if st.button("Cancel run"):
+        job.cancel()
 
 
 # ---------------- STREAMLIT UI ----------------
-st.set_page_config(page_title="Soda Factory Simulation", layout="wide")
-st.title("🥤 Soda Factory Simulation Dashboard")
-
-# --- Sidebar Controls ---
-with st.sidebar:
-    st.header("Simulation Settings")
-    years = st.slider("Years to simulate", 1, 10, 1)
-    months = years * 12  # Convert years to months for simulation
-    growth_rate = st.number_input("Monthly Growth Rate", value=0.05, step=0.01)
-    size_button = st.number_input("Population size", value=50, step=1, min_value=1)
-    
-    st.header("Resources")
-    st.write("Adjust the number of production facilities:")
-    st.caption("💡 Operating costs: Farm $40/mo, Water Pump $25/mo, Mine $35/mo")
-    farms = st.number_input("Farms", min_value=0, value=1, step=1, help="Produces sugar - $40/month operating cost")
-    waterpumps = st.number_input("Water Pumps", min_value=0, value=1, step=1, help="Produces water - $25/month operating cost")
-    mines = st.number_input("Mines", min_value=0, value=1, step=1, help="Produces glass - $35/month operating cost")
-    
-    resources = {"farms": farms, "waterpumps": waterpumps, "mines": mines}
-    
-    run_button = st.button("Run Simulation")
-
-# --- Run simulation only when user clicks ---
-if run_button:
-    sim = Simulation(months=months, growth_rate=growth_rate, population_size=int(size_button), resources=resources)
-    store_sales = sim.run()
-
-    # Convert simulation data to a simple DataFrame for display
-    import pandas as pd
+def main():
+    st.set_page_config(page_title="Soda Factory Simulation", layout="wide")
+    st.title("🥤 Soda Factory Simulation Dashboard")
+
+    # --- Sidebar Controls ---
+    with st.sidebar:
+        st.header("Simulation Settings")
+        years = st.number_input("Years to simulate", min_value=1, max_value=1000, value=1, step=1)
+        months = years * 12  # Convert years to months for simulation
+        growth_rate = st.number_input("Monthly Growth Rate", value=0.05, step=0.01)
+        size_button = st.number_input("Population size", value=50, step=1, min_value=1)
+        store_count = st.number_input("Stores", value=5, step=1, min_value=1, max_value=100_000,
+                                      help="Retail locations; customers are spread evenly across them")
+        soda_price = st.number_input("Soda price ($ per can)", value=1.25, step=0.05, min_value=0.0)
+        seed = st.number_input("Random seed", value=0, step=1, min_value=0,
+                               help="The same seed replays the same run. 0 derives the seed from the other "
+                                    "settings, so repeating them returns the cached run.")
+
+        st.header("Resources")
+        st.write("Adjust the number of production facilities:")
+        st.caption("💡 Operating costs: Farm $40/mo, Water Pump $25/mo, Mine $35/mo")
+        farms = st.number_input("Farms", min_value=0, value=1, step=1, help="Produces sugar - $40/month operating cost")
+        waterpumps = st.number_input("Water Pumps", min_value=0, value=1, step=1, help="Produces water - $25/month operating cost")
+        mines = st.number_input("Mines", min_value=0, value=1, step=1, help="Produces glass - $35/month operating cost")
+
+        resources = {"farms": farms, "waterpumps": waterpumps, "mines": mines}
+
+        st.header("Early Stop")
+        stop_early = st.checkbox("Stop if total profit falls below a floor")
+        profit_floor = st.number_input("Profit floor ($)", value=-1000.0, step=100.0, disabled=not stop_early)
+
+        st.header("Diagnostics")
+        profile_run = st.checkbox("Profile simulation phases", help="Time events, market, production, "
+                                  "accounting and history per month (slightly slower runs)")
+
+        run_button = st.button("Run Simulation")
+
+    # --- Run simulation only when user clicks ---
+    # Clicking Run again with unchanged settings while a run is going keeps that run
+    settings = ResultCache.make_key(years=years, growth_rate=growth_rate, size=size_button, stores=store_count,
+                                    price=soda_price,
+                                    seed=seed, resources=resources, stop_early=stop_early, floor=profit_floor,
+                                    profile=profile_run)
+    job = st.session_state.get("job")
+    if run_button and job is not None and job.active and st.session_state.get("job_settings") == settings:
+        run_button = False
+
+    if run_button:
+        params = {
+            "months": months,
+            "growth_rate": growth_rate,
+            "population_size": int(size_button),
+            "stores": int(store_count),
+            "resources": resources,
+            "soda_price": soda_price,
+        }
+        # Seed 0 takes a seed from the settings, like show_estimate, so the same settings hit the cache
+        params["seed"] = int(seed) or int(ResultCache.make_key(**params)[:8], 16) or 1
+        profit_floor = profit_floor if stop_early else None
+        cache = get_result_cache()
+        # Profiled runs are cached separately, so their results always carry a profile
+        cache_key = ResultCache.make_key(profit_floor=profit_floor, demand=default_model().fingerprint, **params,
+                                         **({"profile": True} if profile_run else {}))
+        result = cache.get(cache_key)
+
+        if result is None:
+            # Run on the shared background pool; an identical run already in flight is reused
+            def make_simulation(params=params, profile_run=profile_run):
+                return Simulation(backend="columnar", production_mode="sampled",
+                                  profiler=Profiler() if profile_run else None, **params)
+
+            def on_done(job, key=cache_key, params=params):
+                cache.put(key, job.result)
+                # Runs on the worker thread, so the session never waits on the database
+                get_run_registry().record_run(params, job.result.history, seed=job.result.seed,
+                                              stopped_month=job.result.stopped_month)
+
+            stop_when = (lambda record, floor=profit_floor: record["profit"] < floor) if profit_floor is not None else None
+            st.session_state["job_settings"] = settings
+            st.session_state["submitted_params"] = params
+            st.session_state["job"] = get_job_manager().submit(cache_key, make_simulation, stop_when=stop_when,
+                                                               on_done=on_done)
+        else:
+            st.session_state.pop("job", None)
+            store_result(result, params)
+
+    if "job" in st.session_state:
+        show_job(st.session_state["job"])
+
+    show_estimate({"months": months, "growth_rate": growth_rate, "population_size": int(size_button),
+                   "resources": resources, "soda_price": soda_price})
+
+    # --- Display results ---
+    if "df" in st.session_state:
+        df = st.session_state["df"]
+
+        if "result" in st.session_state and st.session_state["result"].stopped_month:
+            st.warning(f"Stopped early in {format_year_month(st.session_state['result'].stopped_month)}: "
+                       "total profit fell below the floor.")
+
+        # Key Metrics Summary
+        if "result" in st.session_state:
+            result = st.session_state["result"]
+            total_profit = result.history["profit"]
+            monthly_profit = result.history["monthly_profit"]
+            col1, col2, col3, col4 = st.columns(4)
+
+            with col1:
+                final_profit = total_profit[-1] if len(total_profit) else 0
+                st.metric("Total Profit", f"${final_profit:,.2f}")
+
+            with col2:
+                avg_monthly_profit = monthly_profit.mean() if len(monthly_profit) else 0
+                st.metric("Avg Monthly Profit", f"${avg_monthly_profit:,.2f}")
+
+            with col3:
+                best_month_idx = int(monthly_profit.argmax()) if len(monthly_profit) else 0
+                best_month_profit = monthly_profit.max() if len(monthly_profit) else 0
+                st.metric("Best Month", f"${best_month_profit:,.2f}", 
+                         delta=format_year_month(best_month_idx + 1) if len(monthly_profit) else "")
+
+            with col4:
+                total_revenue_sum = result.history["revenue"].sum()
+                st.metric("Total Revenue", f"${total_revenue_sum:,.2f}")
+            st.caption(f"Seed: {result.seed} (enter it in the sidebar to replay this run)")
+
+        profile = getattr(st.session_state.get("result"), "profile", None)
+        if profile:
+            show_profile(profile)
+
+        st.subheader("📊 Simulation Data")
+        show_table(df, "history", height=300)
+
+        # Display events that occurred
+        if "result" in st.session_state and st.session_state["result"].event_history:
+            st.subheader("📅 Events That Occurred")
+            events_df = []
+            for event, month_num in st.session_state["result"].event_history:
+                events_df.append({
+                    "Year/Month": format_year_month(month_num),
+                    "Event": event["Name"],
+                    "Effect": f"{event['Effect']:+d}%",
+                    "Duration": f"{event['Time']} months",
+                    "Type": event["Classification"],
+                    "Description": event["Text"]
+                })
+            if events_df:
+                import pandas as pd
+                events_display = pd.DataFrame(events_df)
+                show_table(events_display, "events", height=200)
+            if st.session_state.get("run_params"):
+                show_attribution(st.session_state["run_params"], st.session_state["result"])
+
+        st.subheader("📈 Graphs")
+        graph_options = st.multiselect(
+            "Select data to display on chart (can select multiple to overlay):",
+            options=["Production", "Revenue", "Storage", "Total Profit", "Monthly Profit", 
+                    "Total Expenses", "Production Costs", "Resource Costs", "Popularity", "Sold"],
+            default=["Total Profit"]  # Default to "Total Profit"
+        )
 
-    # Create Year/Month labels
-    year_month_labels = [format_year_month(m) for m in range(1, months + 1)]
-
-    df = pd.DataFrame({
-        "Year/Month": year_month_labels,
-        "Total Profit": sim.profit_history,
-        "Monthly Profit": sim.monthly_profit_history,
-        "Revenue": sim.revenue_history,
-        "Total Expenses": sim.total_expenses_history,
-        "Production Costs": sim.production_costs_history,
-        "Resource Costs": sim.resource_costs_history,
-        "Popularity": sim.popularity_history,
-        "Storage": sim.storage_history,
-        "Production": sim.production_history,
-        "Sold": sim.sold_history,
-    })
-
-    st.session_state["df"] = df
-    st.session_state["store_sales"] = store_sales
-    st.session_state["sim"] = sim
-    st.session_state["months"] = months
-
-# --- Display results ---
-if "df" in st.session_state:
-    df = st.session_state["df"]
-
-    # Key Metrics Summary
-    if "sim" in st.session_state:
-        sim = st.session_state["sim"]
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            final_profit = sim.profit_history[-1] if sim.profit_history else 0
-            st.metric("Total Profit", f"${final_profit:,.2f}")
-        
-        with col2:
-            avg_monthly_profit = sum(sim.monthly_profit_history) / len(sim.monthly_profit_history) if sim.monthly_profit_history else 0
-            st.metric("Avg Monthly Profit", f"${avg_monthly_profit:,.2f}")
-        
-        with col3:
-            best_month_idx = sim.monthly_profit_history.index(max(sim.monthly_profit_history)) if sim.monthly_profit_history else 0
-            best_month_profit = max(sim.monthly_profit_history) if sim.monthly_profit_history else 0
-            st.metric("Best Month", f"${best_month_profit:,.2f}", 
-                     delta=format_year_month(best_month_idx + 1) if sim.monthly_profit_history else "")
-        
-        with col4:
-            total_revenue_sum = sum(sim.revenue_history)
-            st.metric("Total Revenue", f"${total_revenue_sum:,.2f}")
-    
-    st.subheader("📊 Simulation Data")
-    st.dataframe(df, use_container_width=True, height=300)
-    
-    # Display events that occurred
-    if "sim" in st.session_state and st.session_state["sim"].event_manager.event_history:
-        st.subheader("📅 Events That Occurred")
-        events_df = []
-        for event, month_num in st.session_state["sim"].event_manager.event_history:
-            events_df.append({
-                "Year/Month": format_year_month(month_num),
-                "Event": event["Name"],
-                "Effect": f"{event['Effect']:+d}%",
-                "Duration": f"{event['Time']} months",
-                "Type": event["Classification"],
-                "Description": event["Text"]
-            })
-        if events_df:
-            import pandas as pd
-            events_display = pd.DataFrame(events_df)
-            st.dataframe(events_display, use_container_width=True, height=200)
-
-    st.subheader("📈 Graphs")
-    graph_options = st.multiselect(
-        "Select data to display on chart (can select multiple to overlay):",
-        options=["Production", "Revenue", "Storage", "Total Profit", "Monthly Profit", 
-                "Total Expenses", "Production Costs", "Resource Costs", "Popularity", "Sold"],
-        default=["Total Profit"]  # Default to "Total Profit"
-    )
-
-    if graph_options:
-        # Create a chart with selected metrics overlaid
-        chart_data = df.set_index("Year/Month")[graph_options]
-        st.line_chart(chart_data, height=400, use_container_width=True)
-    else:
-        st.info("Select at least one metric to display on the chart.")
-
-    if "store_sales" in st.session_state:
-        data = st.session_state["store_sales"]
-        labels = [d["store"] for d in data]
-        values = [d["sales"] for d in data]
-        colors = ['#3c4da6', '#092142', '#275b66', '#a63c46','#092f42']
-
-        st.subheader("Store Sales Breakdown")
-        fig, ax = plt.subplots(figsize=(5, 5))
-
-        patches, texts, autotexts = ax.pie(values, labels=labels,colors=colors, autopct="%1.1f%%", startangle=0)
-        autotexts.extend(texts)
-        for autotext in autotexts:
-            autotext.set_color('white')  # Set the color to white
-            autotext.set_fontsize(10)
-        fig.set_facecolor('none')
-        ax.set_facecolor('none')
-        ax.axis("equal")
-        st.pyplot(fig)
-    
-    # Export functionality
-    st.subheader("💾 Export Data")
-    csv = df.to_csv(index=False)
-    if "months" in st.session_state:
-        years_export = st.session_state["months"] // 12
+        if graph_options:
+            # Zooming in on a month range gives that range the full point budget
+            view = df
+            if len(df) > CHART_POINTS:
+                col1, col2 = st.columns([3, 1])
+                first, last = col1.slider("Months shown", 1, len(df), (1, len(df)))
+                detail = col2.select_slider("Chart detail (points)", options=[250, 500, 1000, 2000, 4000],
+                                            value=CHART_POINTS)
+                view = df.iloc[first - 1:last]
+                view = view.iloc[lttb_rows(view, graph_options, detail)]
+            # Create a chart with selected metrics overlaid
+            chart_data = view.set_index("Year/Month")[graph_options]
+            st.line_chart(chart_data, height=400, use_container_width=True)
+        else:
+            st.info("Select at least one metric to display on the chart.")
+
+        if "store_sales" in st.session_state:
+            sales = st.session_state["store_sales"]
+            stores = st.session_state["result"].stores
+            # Past a handful of stores, the best sellers get a slice each and the rest share "Other"
+            labels, values = top_stores(sales, stores)
+
+            st.subheader("Store Sales Breakdown")
+            st.image(store_sales_pie(tuple(labels), tuple(values)), width=500)
+            if len(stores) > len(labels):
+                with st.expander(f"All {len(stores):,} stores"):
+                    table = stores.sales_frame(sales).sort_values("sales", ascending=False)
+                    st.dataframe(table, use_container_width=True, hide_index=True)
+
+        # Export functionality
+        st.subheader("💾 Export Data")
+        exports = cached_exports(st.session_state.get("result"), df)
+        csv = exports["csv"]
+        if "months" in st.session_state:
+            file_stem = f"soda_simulation_{st.session_state['months'] // 12}years"
+        else:
+            file_stem = "soda_simulation"
         st.download_button(
             label="Download simulation data as CSV",
             data=csv,
-            file_name=f"soda_simulation_{years_export}years.csv",
+            file_name=f"{file_stem}.csv",
             mime="text/csv"
         )
+        # Parquet is typed and compressed, much smaller and faster than CSV for long runs
+        parquet = exports["parquet"]
+        if parquet is not None:
+            st.download_button(
+                label="Download simulation data as Parquet",
+                data=parquet,
+                file_name=f"{file_stem}.parquet",
+                mime="application/vnd.apache.parquet"
+            )
+
+
     else:
-        st.download_button(
-            label="Download simulation data as CSV",
-            data=csv,
-            file_name="soda_simulation.csv",
-            mime="text/csv"
-        )
+        st.info("Adjust the parameters and click **Run Simulation** to begin.")
+
+    show_past_runs({"months": months, "growth_rate": growth_rate, "population_size": int(size_button),
+                    "soda_price": soda_price, **resources})
+
+
+def show_estimate(params):
+    """
+    Surrogate estimate of the sidebar settings, updated on every change
+    without simulating. Outside the surrogate's trust region a real run
+    (one seed per setting) is made in the background instead, and the
+    surrogate learns from it. Settings outside its training ranges (e.g.
+    long horizons) are only simulated when asked for.
+    """
+    from Surrogate import params_from_settings, summarize_history
+
+    surrogate = get_surrogate()
+    if surrogate is None:
+        return
+    query = params_from_settings(**params)
+    prediction = surrogate.predict(query)
+    st.subheader("⚡ Instant Estimate")
+    if prediction["trusted"]:
+        col1, col2, col3 = st.columns(3)
+        for col, target, label, unit in ((col1, "total_profit", "Total Profit", "$"),
+                                         (col2, "avg_monthly_profit", "Avg Monthly Profit", "$"),
+                                         (col3, "stockout_months", "Stockout Months", "")):
+            values = prediction[target]
+            col.metric(label, f"{unit}{values['mean']:,.0f}")
+            col.caption(f"P5 {unit}{values['p5']:,.0f} · P95 {unit}{values['p95']:,.0f}")
+        st.caption("Predicted by the surrogate model; click Run Simulation for the full monthly detail.")
+        return
+
+    # Outside the trust region: simulate these settings for real, once, and teach the surrogate
+    key = ResultCache.make_key(fallback=True, demand=default_model().fingerprint, **params)
+    cache = get_result_cache()
+    result = cache.get(key)
+    if result is None:
+        def make_simulation(params=params, seed=int(key[:8], 16)):
+            return Simulation(backend="columnar", production_mode="sampled", seed=seed, **params)
+
+        def on_done(job, key=key, query=query):
+            if surrogate.observe(query, summarize_history(job.result.history)):
+                surrogate.save(os.environ.get("SODA_SURROGATE", SURROGATE_PATH))
+            cache.put(key, job.result)
+
+        job = get_job_manager().get(key)
+        if job is None:
+            if not surrogate.in_bounds(query) and not st.button("Simulate these settings", key="estimate_fallback"):
+                st.caption("These settings are outside the surrogate's training ranges, so it can't estimate them. "
+                           "Simulate them once for an estimate, or click Run Simulation for the full detail.")
+                return
+            job = get_job_manager().submit(key, make_simulation, on_done=on_done)
+        wait_for_fallback(job)
+        return
+    history = result.history
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Profit", f"${history['profit'][-1]:,.0f}" if len(history) else "-")
+    col2.metric("Avg Monthly Profit", f"${history['monthly_profit'].mean():,.0f}" if len(history) else "-")
+    col3.metric("Stockout Months", f"{int((history['storage'] <= 0).sum())}")
+    st.caption("These settings are outside the surrogate's trust region, so this is one real simulation run "
+               f"(seed {result.seed}).")
+
+
+@st.fragment(run_every=0.5)
+def wait_for_fallback(job):
+    """Progress of the real run behind an untrusted estimate; reruns the page once it is ready."""
+    if job.status == DONE:
+        st.rerun()
+    if job.status == FAILED:
+        st.error(f"Simulation failed: {job.error}")
+        return
+    st.progress(job.progress, text="Outside the surrogate's trust region: running a real simulation...")
+
+
+def show_past_runs(settings):
+    """Browse, filter and overlay runs from the run registry, without recomputing them."""
+    registry = get_run_registry()
+    with st.expander("📚 Past runs"):
+        matching = st.checkbox("Only runs with the current settings", value=True, key="past_runs_matching")
+        runs = registry.find(limit=500, **(settings if matching else {}))
+        if runs.empty:
+            st.caption("No stored runs yet." if not matching else "No stored runs with these settings yet.")
+            return
+        show_table(runs.drop(columns=["params", "batch_id", "created"]), "past_runs", height=250)
+
+        col1, col2 = st.columns([3, 1])
+        # Unkeyed, so the selection resets to the newest runs when another run is stored
+        chosen = col1.multiselect("Overlay runs", runs["id"].tolist(), default=runs["id"].tolist()[:5])
+        metric = col2.selectbox("Metric", METRIC_NAMES, key="past_runs_metric")
+        if chosen:
+            overlay = registry.overlay(chosen, metric)
+            overlay.columns = [f"Run {run_id}" for run_id in overlay.columns]
+            if len(overlay) > CHART_POINTS:
+                overlay = overlay.iloc[lttb_rows(overlay.fillna(0), list(overlay.columns), CHART_POINTS)]
+            st.line_chart(overlay, height=300)
+
+
+def show_table(df, key, height=300):
+    """Paginated table: only one page of rows is sent to the browser per rerun."""
+    if len(df) <= TABLE_PAGE_SIZES[0]:
+        st.dataframe(df, use_container_width=True, height=height)
+        return
+    col1, col2, col3 = st.columns([1, 1, 2])
+    page_size = col1.selectbox("Rows per page", TABLE_PAGE_SIZES, key=f"{key}_page_size")
+    pages = -(-len(df) // page_size)
+    page = col2.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    col3.caption(f"Rows {start + 1:,}-{min(start + page_size, len(df)):,} of {len(df):,}")
+    st.dataframe(df.iloc[start:start + page_size], use_container_width=True, height=height)
+
+
+@st.cache_data(max_entries=64)
+def store_sales_pie(labels, values):
+    """PNG of the store sales pie; reruns with the same sales reuse the rendered image."""
+    import io
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    colors = ['#3c4da6', '#092142', '#275b66', '#a63c46', '#092f42', '#5a3ca6', '#1d4f42', '#a6793c', '#2f4a6b']
+    colors = colors[:len(values)]
+    if labels and labels[-1].startswith("Other ("):
+        colors[-1] = '#6b6b6b'
+    fig, ax = plt.subplots(figsize=(5, 5))
+
+    patches, texts, autotexts = ax.pie(values, labels=labels, colors=colors, autopct="%1.1f%%", startangle=0)
+    autotexts.extend(texts)
+    for autotext in autotexts:
+        autotext.set_color('white')  # Set the color to white
+        autotext.set_fontsize(10)
+    fig.set_facecolor('none')
+    ax.set_facecolor('none')
+    ax.axis("equal")
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", transparent=True, bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def cached_exports(result, df):
+    """CSV and Parquet downloads, built once per result instead of on every rerun."""
+    exports = st.session_state.get("exports")
+    if exports is None or exports["result"] is not result:
+        try:
+            parquet = result.history.to_parquet_bytes() if result is not None else None
+        except ImportError:
+            parquet = None
+        exports = {"result": result, "csv": df.to_csv(index=False), "parquet": parquet}
+        st.session_state["exports"] = exports
+    return exports
+
+
+def show_attribution(params, result):
+    """Per-event and per-type profit / sales / storage impact, from paired counterfactual runs."""
+    from Attribution import attribute_events
+
+    by = st.radio("Event impact by", ["Event", "Type"], horizontal=True, key="attribution_by")
+    # Early-stopped runs are attributed over the months they actually ran
+    sim_kwargs = {**params, "months": len(result.history), "backend": "columnar", "production_mode": "sampled"}
+    key = ResultCache.make_key(attribution=by, demand=default_model().fingerprint, **sim_kwargs)
+    cache = get_result_cache()
+    attribution = cache.get(key)
+    if attribution is None:
+        if not st.button("Measure event impact", help="Replays the run without each event, using the same "
+                                                      "random numbers, to see what each one earned or cost"):
+            return
+        with st.spinner("Running counterfactuals..."):
+            attribution = attribute_events(sim_kwargs, by="event" if by == "Event" else "classification")
+        cache.put(key, attribution)
+
+    impact = attribution.to_frame()
+    if impact.empty:
+        return
+    st.subheader("🔍 Event Impact")
+    if by == "Event":
+        impact.insert(0, "Year/Month", [format_year_month(m) for m in impact["month"]])
+        impact = impact.drop(columns="month")
+        by_type = impact.groupby("classification")["delta_profit"].sum()
+    else:
+        impact = impact.rename(columns={"month": "first month"})
+        by_type = impact.set_index("classification")["delta_profit"]
+    st.caption("Deltas are actual minus the same run without the event: positive profit means the event earned money.")
+    st.bar_chart(by_type.rename("Profit impact ($)"), height=200)
+    show_table(impact.rename(columns={"delta_profit": "Profit impact ($)", "delta_sold": "Sold impact (cans)",
+                                      "delta_storage": "Storage impact (cans)"}), "attribution", height=250)
+
+
+def show_profile(profile):
+    """Performance panel for a profiled run."""
+    from Profiling import report_frame
+
+    totals = profile["totals"]
+    st.subheader("⏱️ Performance Profile")
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Simulated time", f"{totals['total_seconds'] * 1000:,.1f} ms")
+    throughput = totals["agent_months_per_second"]
+    col2.metric("Agent-months / sec", f"{throughput:,.0f}" if throughput else "-")
+    col3.metric("RNG draws", f"{totals['counters']['rng_draws']:,}")
+    col4.metric("Purchases", f"{totals['counters']['purchases']:,}")
+    col5.metric("Cans demanded", f"{totals['counters']['cans_demanded']:,}")
+    import pandas as pd
 
+    phase_ms = pd.Series({phase: seconds * 1000 for phase, seconds in totals["seconds"].items()}, name="ms")
+    st.bar_chart(phase_ms, height=200)
+    with st.expander("Per-month phase timings and counters"):
+        st.dataframe(report_frame(profile), use_container_width=True, height=250)
 
-else:
-    st.info("Adjust the parameters and click **Run Simulation** to begin.")
 
+# The dashboard only runs under `streamlit run`, so the model can be imported by other scripts
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Retail stores as integer IDs with a per-store attribute table.
+
+Customers carry the ID of their store (Population.location), and per-store
+sales are arrays indexed by it. A StoreTable holds what is known about each
+store: its name, its share of the customers ("weight") and any other
+columns (e.g. region) given in a store file.
+
+resolve_stores accepts a store count, a list of names, a spec dict, a
+.json / .csv file or a StoreTable:
+
+    {"count": 2000}
+    {"names": ["Downtown", "Airport"], "weight": [3, 1], "region": ["north", "south"]}
+
+A CSV file has one row per store, with a "name" column, an optional
+"weight" column and any attribute columns.
+"""
+import csv
+import json
+
+import numpy as np
+
+DEFAULT_STORE_COUNT = 5
+TOP_STORES = 8  # Stores shown on their own in breakdowns; the rest are summed into "Other"
+
+
+def store_dtype(count):
+    """Smallest unsigned integer type that holds every store ID."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if count <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+class StoreTable:
+    """Stores 0..count-1: names, customer weights and extra attribute columns."""
+
+    def __init__(self, count=None, names=None, weight=None, attributes=None):
+        if count is None:
+            count = len(names) if names is not None else len(weight) if weight is not None else DEFAULT_STORE_COUNT
+        if count < 1:
+            raise ValueError("A store table needs at least one store")
+        self.count = int(count)
+        self._names = list(names) if names is not None else None  # None: "Store 1" ... "Store <count>"
+        if weight is not None:
+            weight = np.asarray(weight, dtype=np.float64)
+            if weight.shape != (self.count,) or np.any(weight < 0) or weight.sum() <= 0:
+                raise ValueError("Store weights need one non-negative value per store")
+            weight = weight / weight.sum()
+        self._weight = weight  # None: customers spread evenly
+        self.attributes = {name: np.asarray(values) for name, values in (attributes or {}).items()}
+        for name, values in self.attributes.items():
+            if len(values) != self.count:
+                raise ValueError(f"Store attribute {name!r} needs one value per store")
+        self.dtype = store_dtype(self.count)
+
+    @classmethod
+    def from_spec(cls, spec):
+        spec = dict(spec)
+        count, names, weight = spec.pop("count", None), spec.pop("names", None), spec.pop("weight", None)
+        return cls(count, names, weight, attributes=spec)
+
+    @classmethod
+    def read_csv(cls, path):
+        """One row per store: name, optional weight, then any attribute columns."""
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        columns = {name: [row[name] for row in rows] for name in (rows[0] if rows else {})}
+        for name, values in columns.items():
+            if name == "name":
+                continue
+            try:
+                columns[name] = [float(value) for value in values]
+            except ValueError:
+                pass
+        if "name" in columns:
+            columns["names"] = columns.pop("name")
+        return cls.from_spec(columns)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def names(self):
+        if self._names is None:
+            return [f"Store {i}" for i in range(1, self.count + 1)]
+        return self._names
+
+    def name(self, store):
+        return self._names[store] if self._names is not None else f"Store {store + 1}"
+
+    @property
+    def weight(self):
+        """Share of the customers shopping at each store."""
+        return self._weight if self._weight is not None else np.full(self.count, 1.0 / self.count)
+
+    @property
+    def spec(self):
+        """JSON-safe description (from_spec rebuilds the table), e.g. for checkpoints and file headers."""
+        spec = {"count": self.count}
+        if self._names is not None:
+            spec["names"] = self._names
+        if self._weight is not None:
+            spec["weight"] = self._weight.tolist()
+        for name, values in self.attributes.items():
+            spec[name] = values.tolist()
+        return spec
+
+    # --- Customers ---
+    def sample(self, size, rng):
+        """Store IDs of `size` new customers from a NumPy Generator."""
+        if self._weight is None:
+            return rng.integers(0, self.count, size).astype(self.dtype)
+        return rng.choice(self.count, size=size, p=self._weight).astype(self.dtype)
+
+    def choose(self, rng):
+        """Store ID of one new customer from a random.Random (Agent objects)."""
+        if self._weight is None:
+            return rng.choice(range(self.count))
+        return rng.choices(range(self.count), weights=self._weight)[0]
+
+    # --- Sales views ---
+    def sales_frame(self, sales):
+        """One row per store: its ID, name, attributes, sales and share of all sales."""
+        import pandas as pd
+
+        sales = np.asarray(sales)
+        frame = pd.DataFrame({"store": np.arange(self.count), "name": self.names, **self.attributes,
+                              "sales": sales})
+        frame["share"] = sales / sales.sum() if sales.sum() else 0.0
+        return frame
+
+    def sales_by(self, sales, attribute):
+        """Total sales per value of a store attribute, e.g. sales_by(sales, "region")."""
+        values, group = np.unique(self.attributes[attribute], return_inverse=True)
+        totals = np.bincount(group.ravel(), weights=sales, minlength=len(values)).astype(np.int64)
+        return dict(zip(values.tolist(), totals.tolist()))
+
+
+def top_stores(sales, stores, n=TOP_STORES):
+    """
+    (labels, values) of the `n` best-selling stores, largest first, with the
+    rest summed into one "Other (k stores)" entry, so a breakdown of
+    thousands of stores stays readable.
+    """
+    sales = np.asarray(sales)
+    # No "Other" for a single leftover store; otherwise only the top n are sorted
+    order = np.arange(len(sales)) if len(sales) <= n + 1 else np.argpartition(sales, -n)[-n:]
+    order = order[np.argsort(-sales[order], kind="stable")]
+    labels = [stores.name(int(i)) for i in order]
+    values = [int(sales[i]) for i in order]
+    if len(order) < len(sales):
+        labels.append(f"Other ({len(sales) - len(order):,} stores)")
+        values.append(int(sales.sum() - sales[order].sum()))
+    return labels, values
+
+
+def resolve_stores(stores=None):
+    """A StoreTable from None (the default 5 stores), a count, a list of names, a spec dict, a file path or a table."""
+    if stores is None:
+        return StoreTable(DEFAULT_STORE_COUNT)
+    if isinstance(stores, StoreTable):
+        return stores
+    if isinstance(stores, (int, np.integer)):
+        return StoreTable(int(stores))
+    if isinstance(stores, dict):
+        return StoreTable.from_spec(stores)
+    if isinstance(stores, str):
+        if stores.endswith(".csv"):
+            return StoreTable.read_csv(stores)
+        with open(stores) as f:
+            return StoreTable.from_spec(json.load(f))
+    return StoreTable(names=list(stores))
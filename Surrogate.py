@@ -0,0 +1,464 @@
+"""
+Instant what-if estimates from a surrogate model of the simulation.
+
+    python Surrogate.py train -o surrogate.npz --scenarios 200 --replicas 8
+    python Surrogate.py predict surrogate.npz --years 3 --farms 4 --mines 6
+
+The surrogate is a Gaussian process over the sidebar settings (years,
+growth_rate, population_size, farms / waterpumps / mines, soda_price),
+trained offline from ensembles of batched scenario runs. It predicts total
+profit, average monthly profit and stockout months with their spread in
+a few milliseconds. Queries outside the training ranges, or where the
+model is less sure than one real run would be, are outside its trust region: run a real
+Simulation there and observe() the result, and the model learns from it.
+Only years inside the training ranges are learned. Each observation
+extends the fitted Cholesky factor (O(n^2) instead of a full O(n^3) refit).
+Past MAX_OBSERVED learned points the oldest are dropped, at least
+REFIT_BATCH at a time, with one full refit per batch.
+"""
+import argparse
+import functools
+import threading
+
+import numpy as np
+
+from Optimizer import UNIT_YIELD, expected_demand, monthly_running_cost
+from Random_Streams import child_sequences, seed_sequence
+from Simulation import COST_PER_CAN
+
+# Setting -> (low, high, scale); "log" settings are modelled on a log scale
+PARAMETER_SPACE = {
+    "years": (1, 10, "int"),
+    "growth_rate": (0.0, 0.2, "linear"),
+    "population_size": (20, 5000, "log"),
+    "farms": (0, 10, "int"),
+    "waterpumps": (0, 10, "int"),
+    "mines": (0, 10, "int"),
+    "soda_price": (0.5, 3.0, "linear"),
+}
+PARAMETERS = list(PARAMETER_SPACE)
+TARGETS = ["total_profit", "avg_monthly_profit", "stockout_months"]
+
+LENGTH_SCALES = (0.12, 0.25, 0.5, 1.0, 2.0)  # Candidate kernel length scales per setting (unit-cube coordinates)
+AMPLITUDES = (0.03, 0.1, 0.3, 1.0)  # Candidate shares of the residual variance the process explains
+MAX_OBSERVED = 500  # Training points kept from observe(), newest first
+REFIT_BATCH = 100  # Observed points dropped at once when MAX_OBSERVED is passed, with one full refit
+TRUST_RATIO = 1.0  # Inside the trust region, the model's own uncertainty is at most this share of the run spread
+Z90 = 1.6449  # Normal quantile of the 5th / 95th percentile
+
+
+def settings_matrix(params):
+    """Settings dict(s) -> (rows, PARAMETERS) array."""
+    rows = [params] if isinstance(params, dict) else list(params)
+    return np.array([[row[name] for name in PARAMETERS] for row in rows], dtype=np.float64)
+
+
+def encode(settings):
+    """Settings array -> points in the unit cube, where the kernel measures distance."""
+    points = np.empty(settings.shape)
+    for j, name in enumerate(PARAMETERS):
+        low, high, scale = PARAMETER_SPACE[name]
+        if scale == "log":
+            points[:, j] = (np.log(settings[:, j]) - np.log(low)) / (np.log(high) - np.log(low))
+        else:
+            points[:, j] = (settings[:, j] - low) / (high - low)
+    return points
+
+
+@functools.lru_cache(maxsize=None)
+def _demand_per_customer():
+    return expected_demand(20000) / 20000
+
+
+def analytic_baseline(settings):
+    """
+    TARGETS from the Optimizer's back-of-the-envelope model (sell min(demand,
+    capacity) every month, no events or noise). The process only has to learn
+    how the simulation departs from it, which is far smoother than the
+    metrics themselves.
+    """
+    column = {name: settings[:, j] for j, name in enumerate(PARAMETERS)}
+    resources = {name: column[name] for name in UNIT_YIELD}
+    capacity = np.minimum.reduce([resources[name] * UNIT_YIELD[name] for name in UNIT_YIELD])
+    capacity = capacity * (1.0 + column["growth_rate"]) * 10
+    demand = column["population_size"] * _demand_per_customer()
+    monthly = (column["soda_price"] - COST_PER_CAN) * np.minimum(capacity, demand) - monthly_running_cost(resources)
+    months = column["years"] * 12
+    return np.column_stack([months * monthly, monthly, months * (capacity < demand)])
+
+
+def target_scale(settings):
+    """
+    Natural size of each target (money flowing through the business, months
+    run), so the process models every setting on a comparable scale instead
+    of the big, long runs dominating.
+    """
+    column = {name: settings[:, j] for j, name in enumerate(PARAMETERS)}
+    flow = (column["soda_price"] * column["population_size"] * _demand_per_customer()
+            + monthly_running_cost({name: column[name] for name in UNIT_YIELD}) + 1.0)
+    months = column["years"] * 12
+    return np.column_stack([months * flow, flow, months])
+
+
+def params_from_settings(months, growth_rate, population_size, resources, soda_price):
+    """Surrogate settings from Simulation-style arguments."""
+    return {"years": months / 12, "growth_rate": growth_rate, "population_size": population_size,
+            **{name: resources[name] for name in ("farms", "waterpumps", "mines")}, "soda_price": soda_price}
+
+
+def summarize(profit, monthly_profit, storage):
+    """
+    TARGETS of runs after 12, 24, ... months, from (runs, months) arrays: a
+    (runs, years, targets) array. Stockout months are months that ended with
+    empty storage (demand used up all the stock).
+    """
+    profit, monthly_profit, storage = np.atleast_2d(profit, monthly_profit, storage)
+    months = profit.shape[1]
+    ends = np.arange(12, months + 1, 12)
+    summary = np.empty((profit.shape[0], len(ends), len(TARGETS)))
+    summary[:, :, 0] = profit[:, ends - 1]
+    summary[:, :, 1] = np.cumsum(monthly_profit, axis=1)[:, ends - 1] / ends
+    summary[:, :, 2] = np.cumsum(storage <= 0, axis=1)[:, ends - 1]
+    return summary
+
+
+def summarize_history(history):
+    """(years, targets) summary of one run's History."""
+    return summarize(history["profit"], history["monthly_profit"], history["storage"])[0]
+
+
+# ------------------------------
+# Gaussian Process
+# ------------------------------
+def _residuals(settings, means, spreads, trend):
+    """What the process models, relative to target_scale: mean residuals from the trend, then the spreads."""
+    size = target_scale(settings)
+    baseline = analytic_baseline(settings) / size
+    return np.hstack([means / size - (trend[0] + trend[1] * baseline), spreads / size])
+
+
+def _noise(residuals, runs, scale):
+    """Observation noise of each point: a mean of k runs is uncertain by the run-to-run variance / k."""
+    return ((residuals[:, len(TARGETS):] / scale[:len(TARGETS)]) ** 2).mean(axis=1) / runs
+
+
+def _kernel(a, b, length_scale, amplitude=1.0):
+    """Squared-exponential kernel between the rows of a and b."""
+    a, b = a / length_scale, b / length_scale
+    distance = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2 * a @ b.T
+    return amplitude * np.exp(-0.5 * np.maximum(distance, 0.0))
+
+
+class Surrogate:
+    """
+    Gaussian process emulator of the simulation's summary metrics.
+
+    Every training point holds the mean and the run-to-run spread of each
+    target over an ensemble. Means are modelled as a linear function of
+    analytic_baseline plus a process over the residuals; the spread (itself
+    modelled) plus the model's own uncertainty gives the predicted std of a
+    single run. Safe to share between threads: observe() refits off to the
+    side and swaps the fitted model in at once.
+    """
+
+    def __init__(self, settings, means, spreads, runs, length_scale=None, amplitude=None, observed=0):
+        self.settings = np.asarray(settings, dtype=np.float64)  # (n, parameters) training settings
+        self.means = np.asarray(means, dtype=np.float64)  # (n, targets) ensemble means
+        self.spreads = np.asarray(spreads, dtype=np.float64)  # (n, targets) run-to-run std
+        self.runs = np.asarray(runs, dtype=np.float64)  # (n,) runs averaged into each mean
+        self.observed = int(observed)  # Trailing points that came from observe(), oldest first
+        self.length_scale = length_scale
+        self.amplitude = amplitude
+        self._lock = threading.Lock()
+        self._fitted = None
+        self.fit(select=length_scale is None or amplitude is None)
+
+    def fit(self, select=False):
+        """Fit the process; with select, pick the kernel with the best marginal likelihood."""
+        points = encode(self.settings)
+        size = target_scale(self.settings)
+        baseline = analytic_baseline(self.settings) / size
+        means = self.means / size
+        # Per-target trend: intercept + slope on the analytic baseline
+        trend = np.empty((2, len(TARGETS)))
+        for i in range(len(TARGETS)):
+            design = np.column_stack([np.ones(len(baseline)), baseline[:, i]])
+            trend[:, i] = np.linalg.lstsq(design, means[:, i], rcond=None)[0]
+        values = _residuals(self.settings, self.means, self.spreads, trend)
+        center, scale = values.mean(axis=0), values.std(axis=0) + 1e-9
+        standardized = (values - center) / scale
+        noise = _noise(values, self.runs, scale)
+        if select:
+            self.length_scale, self.amplitude = self._select_kernel(points, standardized, noise)
+
+        cov = _kernel(points, points, self.length_scale, self.amplitude)
+        cov[np.diag_indices_from(cov)] += noise + 1e-6
+        # Inverse of the Cholesky factor L: predictions are then products only,
+        # with variance = |L^-1 k|^2 and weights L^-T L^-1 y
+        whiten = np.linalg.solve(np.linalg.cholesky(cov), np.eye(len(cov)))
+        self._fitted = (points, whiten, whiten.T @ (whiten @ standardized), center, scale, trend, standardized, noise)
+
+    def _extend(self, settings, means, spreads, runs):
+        """
+        Add k points to the fitted process in O(n^2 k), keeping the trend and
+        standardization of the last full fit: the Cholesky factor grows by a
+        block, L = [[L11, 0], [L21, L22]], and so does its inverse.
+        """
+        points, whiten, _, center, scale, trend, standardized, noise = self._fitted
+        new_points = encode(settings)
+        values = _residuals(settings, means, spreads, trend)
+        new_noise = _noise(values, runs, scale)
+        own = _kernel(new_points, new_points, self.length_scale, self.amplitude)
+        own[np.diag_indices_from(own)] += new_noise + 1e-6
+        lower = (whiten @ _kernel(points, new_points, self.length_scale, self.amplitude)).T  # L21
+        try:
+            corner = np.linalg.solve(np.linalg.cholesky(own - lower @ lower.T), np.eye(len(own)))  # L22^-1
+        except np.linalg.LinAlgError:  # Too close to existing points to extend stably
+            self.fit()
+            return
+        n, k = len(points), len(new_points)
+        grown = np.zeros((n + k, n + k))
+        grown[:n, :n] = whiten
+        grown[n:, :n] = -corner @ (lower @ whiten)
+        grown[n:, n:] = corner
+        standardized = np.vstack([standardized, (values - center) / scale])
+        self._fitted = (np.vstack([points, new_points]), grown, grown.T @ (grown @ standardized), center, scale,
+                        trend, standardized, np.concatenate([noise, new_noise]))
+
+    def _select_kernel(self, points, values, noise, passes=2):
+        """
+        Amplitude and one length scale per setting, by coordinate ascent on
+        the marginal likelihood: settings the metrics barely depend on get
+        long scales.
+        """
+        # Judge candidates on a subsample, so training stays quick on big designs
+        sample = np.random.default_rng(0).permutation(len(points))[:600]
+        points, values, noise = points[sample], values[sample], noise[sample]
+        length_scale, amplitude = np.full(len(PARAMETERS), 0.25), 1.0
+        for _ in range(passes):
+            for j in range(len(PARAMETERS)):
+                def likelihood(candidate, j=j):
+                    trial = length_scale.copy()
+                    trial[j] = candidate
+                    return self._log_likelihood(points, values, noise, trial, amplitude)
+                length_scale[j] = max(LENGTH_SCALES, key=likelihood)
+            amplitude = max(AMPLITUDES, key=lambda candidate: self._log_likelihood(
+                points, values, noise, length_scale, candidate))
+        return length_scale, amplitude
+
+    @staticmethod
+    def _log_likelihood(points, values, noise, length_scale, amplitude):
+        cov = _kernel(points, points, length_scale, amplitude)
+        cov[np.diag_indices_from(cov)] += noise + 1e-6
+        try:
+            chol = np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            return -np.inf
+        alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, values))
+        return float(-0.5 * (values * alpha).sum() - values.shape[1] * np.log(np.diag(chol)).sum())
+
+    def _raw_prediction(self, settings):
+        """
+        (means then spreads, uncertainty as a share of the prior, prior std of
+        each target's mean) for a settings array.
+        """
+        points, whiten, alpha, center, scale, trend = self._fitted[:6]
+        size = target_scale(settings)
+        cross = _kernel(encode(settings), points, self.length_scale, self.amplitude)
+        mean = cross @ alpha * scale + center
+        mean[:, :len(TARGETS)] += trend[0] + trend[1] * analytic_baseline(settings) / size
+        mean *= np.hstack([size, size])
+        projected = whiten @ cross.T
+        variance = np.clip(self.amplitude - (projected * projected).sum(axis=0), 0.0, self.amplitude)
+        uncertainty = np.sqrt(variance / self.amplitude)
+        return mean, uncertainty, np.sqrt(self.amplitude) * scale[:len(TARGETS)] * size
+
+    # --- Queries ---
+    def in_bounds(self, params):
+        points = encode(settings_matrix(params))
+        return bool(np.all((points >= -1e-9) & (points <= 1 + 1e-9)))
+
+    def predict(self, params):
+        """
+        Prediction for one settings dict: {"trusted": bool, "uncertainty": share
+        of the prior spread, target: {"mean", "std", "p5", "p95", "run_std",
+        "model_std"}}. std covers both the run-to-run spread and the model's
+        own uncertainty.
+        """
+        mean, uncertainty, prior_std = self._raw_prediction(settings_matrix(params))
+        count = len(TARGETS)
+        prediction = {"uncertainty": float(uncertainty[0])}
+        for i, target in enumerate(TARGETS):
+            run_std = max(0.0, float(mean[0, count + i]))
+            model_std = float(uncertainty[0] * prior_std[0, i])
+            std = float(np.hypot(run_std, model_std))
+            value = float(mean[0, i])
+            if target == "stockout_months":
+                value = float(np.clip(value, 0, params["years"] * 12))
+            prediction[target] = {"mean": value, "std": std, "p5": value - Z90 * std, "p95": value + Z90 * std,
+                                  "run_std": run_std, "model_std": model_std}
+        # Trusted when the estimate is about as good as one real run would be
+        profit = prediction["total_profit"]
+        prediction["trusted"] = self.in_bounds(params) and profit["model_std"] <= TRUST_RATIO * max(
+            profit["run_std"], 0.01 * abs(profit["mean"]), 1.0)
+        return prediction
+
+    def trusted(self, params):
+        return self.predict(params)["trusted"]
+
+    # --- Learning from real runs ---
+    def observe(self, params, summary):
+        """
+        Add a real run to the training data and update the fit; returns the
+        number of points learned. `summary` is a (years, targets) array from
+        summarize(), one row per full year, so a 3-year run teaches the model
+        about years 1, 2 and 3. Years outside PARAMETER_SPACE are skipped.
+        Past MAX_OBSERVED, the oldest REFIT_BATCH observed points are dropped
+        and the model is refitted in full.
+        """
+        summary = np.asarray(summary, dtype=np.float64).reshape(-1, len(TARGETS))
+        rows = [{**params, "years": year} for year in range(1, len(summary) + 1)]
+        keep = [i for i, row in enumerate(rows) if self.in_bounds(row)][-MAX_OBSERVED:]
+        if not keep:
+            return 0
+        with self._lock:
+            settings = settings_matrix([rows[i] for i in keep])
+            # A single run says nothing about the spread, so keep the predicted one
+            spreads = np.maximum(self._raw_prediction(settings)[0][:, len(TARGETS):], 0.0)
+            self.settings = np.vstack([self.settings, settings])
+            self.means = np.vstack([self.means, summary[keep]])
+            self.spreads = np.vstack([self.spreads, spreads])
+            self.runs = np.concatenate([self.runs, np.ones(len(keep))])
+            self.observed += len(keep)
+            if self.observed > MAX_OBSERVED:
+                # The trained points come first; drop the oldest observed ones after them
+                kept = max(0, MAX_OBSERVED - REFIT_BATCH)
+                start = len(self.settings) - self.observed
+                drop = slice(start, start + self.observed - kept)
+                self.settings, self.means, self.spreads, self.runs = (
+                    np.delete(values, drop, axis=0) for values in (self.settings, self.means, self.spreads, self.runs))
+                self.observed = kept
+                self.fit()
+            else:
+                self._extend(settings, summary[keep], spreads, np.ones(len(keep)))
+        return len(keep)
+
+    def __len__(self):
+        return len(self.settings)
+
+    # --- Persistence ---
+    def save(self, path):
+        with self._lock:
+            np.savez(path, settings=self.settings, means=self.means, spreads=self.spreads, runs=self.runs,
+                     length_scale=self.length_scale, amplitude=self.amplitude, observed=self.observed,
+                     parameters=np.array(PARAMETERS), targets=np.array(TARGETS))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if list(data["parameters"]) != PARAMETERS or list(data["targets"]) != TARGETS:
+                raise ValueError(f"{path} was trained for other settings or metrics")
+            observed = int(data["observed"]) if "observed" in data else 0
+            return cls(data["settings"], data["means"], data["spreads"], data["runs"], data["length_scale"],
+                       float(data["amplitude"]), observed)
+
+
+# ------------------------------
+# Training
+# ------------------------------
+def sample_design(count, rng):
+    """`count` random settings (without years) spread over PARAMETER_SPACE."""
+    design = []
+    for _ in range(count):
+        params = {}
+        for name, (low, high, scale) in PARAMETER_SPACE.items():
+            if name == "years":
+                continue
+            if scale == "int":
+                params[name] = int(rng.integers(low, high + 1))
+            elif scale == "log":
+                params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+            else:
+                params[name] = float(rng.uniform(low, high))
+        design.append(params)
+    return design
+
+
+def train_surrogate(scenarios=200, replicas=8, seed=None, population_levels=10, backend="cohort"):
+    """
+    Train a Surrogate from ensembles over PARAMETER_SPACE.
+
+    Population sizes are rounded to `population_levels` log-spaced levels, so
+    every level runs as one batch of scenarios (see Scenarios.run_scenarios)
+    per replica. Each run lasts the longest horizon, and every full year of
+    it is a training point.
+    """
+    from Scenarios import run_scenarios
+
+    sequence = seed_sequence(seed)
+    rng = np.random.default_rng(sequence)
+    design = sample_design(scenarios, rng)
+    low, high, _ = PARAMETER_SPACE["population_size"]
+    levels = np.unique(np.round(np.geomspace(low, high, population_levels)).astype(int))
+    for params in design:
+        params["population_size"] = int(levels[np.argmin(np.abs(np.log(levels) - np.log(params["population_size"])))])
+    months = PARAMETER_SPACE["years"][1] * 12
+
+    replica_seeds = child_sequences(sequence, len(levels) * replicas)
+    points, means, spreads = [], [], []
+    for level_index, level in enumerate(levels):
+        group = [params for params in design if params["population_size"] == level]
+        if not group:
+            continue
+        batch = [{"growth_rate": p["growth_rate"], "soda_price": p["soda_price"],
+                  "resources": {name: p[name] for name in ("farms", "waterpumps", "mines")}} for p in group]
+        runs = []
+        for replica_seed in replica_seeds[level_index * replicas:(level_index + 1) * replicas]:
+            result = run_scenarios(batch, months, int(level), backend=backend, seed=replica_seed)
+            runs.append(summarize(result["profit"], result["monthly_profit"], result["storage"]))
+        runs = np.stack(runs)  # (replicas, scenarios, years, targets)
+        for i, params in enumerate(group):
+            for year in range(runs.shape[2]):
+                points.append({**params, "years": year + 1})
+                means.append(runs[:, i, year].mean(axis=0))
+                spreads.append(runs[:, i, year].std(axis=0, ddof=1) if replicas > 1 else np.zeros(len(TARGETS)))
+
+    return Surrogate(settings_matrix(points), np.array(means), np.array(spreads), np.full(len(points), replicas))
+
+
+# ------------------------------
+# Command Line
+# ------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or query the simulation surrogate.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = commands.add_parser("train", help="train a surrogate from batched ensembles")
+    train_parser.add_argument("-o", "--output", default="surrogate.npz")
+    train_parser.add_argument("--scenarios", type=int, default=200, help="settings sampled from the parameter space")
+    train_parser.add_argument("--replicas", type=int, default=8, help="runs per setting")
+    train_parser.add_argument("--seed", type=int, default=None)
+
+    predict_parser = commands.add_parser("predict", help="predict the metrics of one setting")
+    predict_parser.add_argument("surrogate")
+    defaults = {"years": 1, "growth_rate": 0.05, "population_size": 50, "farms": 1, "waterpumps": 1, "mines": 1,
+                "soda_price": 1.25}
+    for name, value in defaults.items():
+        predict_parser.add_argument(f"--{name}", type=type(value), default=value)
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        surrogate = train_surrogate(args.scenarios, args.replicas, args.seed)
+        surrogate.save(args.output)
+        print(f"Trained on {len(surrogate)} points; saved {args.output}")
+    else:
+        surrogate = Surrogate.load(args.surrogate)
+        prediction = surrogate.predict({name: getattr(args, name) for name in defaults})
+        for target in TARGETS:
+            values = prediction[target]
+            print(f"{target:>20}: {values['mean']:12.2f}  (P5 {values['p5']:12.2f}, P95 {values['p95']:12.2f})")
+        print("trusted" if prediction["trusted"] else "outside the trust region: run a real simulation")
+
+
+if __name__ == "__main__":
+    main()
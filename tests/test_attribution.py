@@ -0,0 +1,40 @@
+from Attribution import attribute_events
+from Simulation import Simulation
+
+SETUP = {"months": 120, "growth_rate": 0.05, "population_size": 200, "backend": "columnar", "seed": 7,
+         "resources": {"farms": 5, "waterpumps": 3, "mines": 8}}
+
+
+def event_sequence(suppressed=(), **overrides):
+    sim = Simulation(**{**SETUP, **overrides})
+    sim.event_manager.suppressed = set(suppressed)
+    sim.run()
+    return [(event["Name"], month) for event, month in sim.event_manager.event_history]
+
+
+def test_suppressing_an_event_leaves_the_rest_of_the_sequence():
+    actual = event_sequence()
+    assert len(actual) > 3
+    for occurrence in actual:
+        assert event_sequence([occurrence]) == [other for other in actual if other != occurrence]
+
+
+def test_attribution_covers_every_event():
+    result = attribute_events({**SETUP, "months": 36}, processes=1)
+    assert [(impact["event"], impact["month"]) for impact in result.impacts] == event_sequence(months=36)
+    assert all({"delta_profit", "delta_sold", "delta_storage"} <= impact.keys() for impact in result.impacts)
+
+
+def final_profit(suppressed=(), **overrides):
+    sim = Simulation(**{**SETUP, **overrides})
+    sim.event_manager.suppressed = set(suppressed)
+    sim.run()
+    return float(sim.history["profit"][-1])
+
+
+def test_deltas_match_full_counterfactual_runs():
+    result = attribute_events({**SETUP, "months": 60}, processes=1)
+    actual = final_profit(months=60)
+    for impact in result.impacts[:4]:
+        without = final_profit([(impact["event"], impact["month"])], months=60)
+        assert abs(impact["delta_profit"] - (actual - without)) < 1e-6
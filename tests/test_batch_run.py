@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from Batch_Run import main as batch_main
+
+
+def run_batch(tmp_path, runs, **defaults):
+    config = tmp_path / "batch.json"
+    config.write_text(json.dumps({"defaults": {"population_size": 200, "seed": 4, **defaults}, "runs": runs}))
+    return batch_main([str(config), "--output", str(tmp_path / "results"), "--processes", "1"])
+
+
+@pytest.mark.parametrize("extra", [{}, {"ensemble": 4}])
+def test_soda_price_reaches_the_simulation(tmp_path, extra):
+    summary = run_batch(tmp_path, [{"name": "cheap", "soda_price": 0.5, **extra},
+                                   {"name": "dear", "soda_price": 3.0, **extra}])
+    key = "total_profit_mean" if extra else "total_profit"
+    assert summary["cheap"][key] != summary["dear"][key]
+
+
+@pytest.mark.parametrize("extra", [{}, {"ensemble": 3}])
+def test_registered_runs_are_found_by_price(tmp_path, extra):
+    from Run_Registry import RunRegistry
+
+    path = str(tmp_path / "runs.sqlite")
+    config = tmp_path / "batch.json"
+    config.write_text(json.dumps({"defaults": {"population_size": 100, "seed": 4},
+                                  "runs": [{"name": "dear", "soda_price": 1.75, **extra}, {"name": "default"}]}))
+    batch_main([str(config), "--output", str(tmp_path / "results"), "--processes", "1", "--registry", path])
+    found = RunRegistry(path).find(soda_price=1.75)
+    assert set(found["name"]) == {"dear"} and len(found) == extra.get("ensemble", 1)
+    assert len(RunRegistry(path).find(soda_price=1.25, name="default")) == 1
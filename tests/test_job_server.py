@@ -0,0 +1,98 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from Ensemble import run_ensemble
+from Job_Client import JobClient, JobError
+from Job_Server import JobServer, _run_batch, job_params, population_key
+from Simulation import Simulation
+
+RESOURCES = {"farms": 3, "waterpumps": 2, "mines": 4}
+PARAMS = {"years": 1, "population_size": 300, "seed": 11, "resources": RESOURCES}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with JobServer(port=0, workers=2) as server:
+        yield JobClient(server.url)
+
+
+def simulate(soda_price):
+    sim = Simulation(12, 0.05, 300, resources=RESOURCES, soda_price=soda_price, seed=11, backend="columnar",
+                     production_mode="sampled")
+    sim.run()
+    return sim
+
+
+def test_run_matches_simulation(client):
+    status, table = client.run("run", {**PARAMS, "soda_price": 1.4})
+    assert status["status"] == "done"
+    np.testing.assert_allclose(table["profit"], simulate(1.4).history["profit"])
+
+
+def test_identical_requests_share_a_job(client):
+    first = client.submit("run", {**PARAMS, "soda_price": 1.3})
+    second = client.submit("run", {**PARAMS, "soda_price": 1.3})
+    assert second["merged"] and second["id"] == first["id"]
+
+
+def test_batched_runs_match_single_runs(client):
+    prices = [1.0 + 0.05 * i for i in range(8)]
+    jobs = [client.submit("run", {**PARAMS, "soda_price": price}) for price in prices]
+    for job, price in zip(jobs, prices):
+        client.wait(job["id"])
+        np.testing.assert_allclose(client.result(job["id"], ["profit"])["profit"], simulate(price).history["profit"])
+
+
+def test_ensemble_matches_run_ensemble(client):
+    _, table = client.run("ensemble", {"years": 1, "population_size": 200, "seed": 5}, runs=12)
+    expected = run_ensemble(12, 12, 0.05, 200, processes=1, seed=5).bands()
+    np.testing.assert_allclose(table["profit_mean"], expected["profit"]["mean"], rtol=1e-6)
+
+
+def test_sweep_pages_and_streams(client):
+    status, table = client.run("sweep", {"years": 1, "population_size": 200, "seed": 5},
+                               scenarios=[{"soda_price": 1.0}, {"soda_price": 1.5}])
+    assert len(table["month"]) == 24 and len(status["summary"]["scenarios"]) == 2
+    page = client._json(f"/jobs/{status['id']}/result", offset=20, limit=10)
+    assert page["total"] == 24 and len(page["rows"]) == 4 and page["next_offset"] is None
+    rows = list(client.stream(status["id"], ["scenario", "month", "profit"]))
+    assert [row["profit"] for row in rows] == table["profit"]
+
+
+def test_bad_requests_are_rejected(client):
+    with pytest.raises(JobError):
+        client.submit("nope")
+    with pytest.raises(JobError):
+        client.submit("run", {"bogus": 1})
+    with pytest.raises(JobError):
+        client.result("ffff")
+    for params in ({"stores": -3}, {"soda_price": "abc"}, {"growth_rate": "x"}, {"resources": {"farms": "two"}},
+                   {"resources": {"wells": 1}}, {"years": 0}):
+        with pytest.raises(JobError):
+            client.submit("run", params)
+
+
+def test_a_failing_run_only_fails_its_own_job():
+    params = [job_params({**PARAMS, "soda_price": price}) for price in (1.0, 1.1, 1.2)]
+    bad = {**params[0], "soda_price": "abc"}  # Past validation, as if it broke inside the worker
+    results, _, _ = _run_batch(OrderedDict(), population_key(params[0]), [params[0], bad, *params[1:]])
+    assert isinstance(results[1], str) and "TypeError" in results[1]
+    for result, price in zip([results[0], *results[2:]], (1.0, 1.1, 1.2)):
+        np.testing.assert_allclose(result.history["profit"], simulate(price).history["profit"])
+
+
+def test_output_errors_fail_the_job_not_the_worker(client, monkeypatch):
+    import Job_Server
+
+    def broken(result):
+        raise RuntimeError("no table")
+
+    monkeypatch.setattr(Job_Server, "_sweep_output", broken)
+    job = client.submit("sweep", {"years": 1, "population_size": 100, "seed": 3}, scenarios=[{"soda_price": 2.0}])
+    with pytest.raises(JobError, match="no table"):
+        client.wait(job["id"], timeout=60)
+    monkeypatch.undo()
+    for seed in (21, 22, 23):  # Every dispatcher still takes work
+        assert client.run("run", {**PARAMS, "seed": seed})[0]["status"] == "done"
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from Network import Link, Network, Site
+
+RESOURCES = {"farms": 3, "waterpumps": 2, "mines": 4}
+
+
+def make_sites():
+    north = {"names": ["Harbor", "Station"], "region": ["north", "north"]}
+    south = {"count": 3, "region": ["south", "south", "coast"]}
+    return [Site("north", RESOURCES, 300, stores=north), Site("south", RESOURCES, 200, stores=south)]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_sites_sell_through_their_own_stores(processes):
+    result = Network(make_sites(), [Link("north", "south", 50)], months=12, seed=3, processes=processes).run()
+    assert [len(sales) for sales in result.store_sales] == [2, 3]
+    frame = result.store_frame()
+    assert list(frame["site"]) == ["north"] * 2 + ["south"] * 3
+    assert list(frame["name"][:2]) == ["Harbor", "Station"]
+    by_region = result.sales_by("region")
+    assert set(by_region) == {"north", "south", "coast"}
+    assert sum(by_region.values()) == sum(int(sales.sum()) for sales in result.store_sales)
+
+
+def test_sharding_does_not_change_store_sales():
+    local = Network(make_sites(), [], months=6, seed=5, processes=1).run()
+    sharded = Network(make_sites(), [], months=6, seed=5, processes=2).run()
+    for a, b in zip(local.store_sales, sharded.store_sales):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_shard_errors_carry_the_worker_traceback():
+    sites = [*make_sites(), Site("broken", {"farms": "x", "waterpumps": 1, "mines": 1}, 100)]
+    with pytest.raises(RuntimeError, match="(?s)Traceback.*ValueError"):
+        Network(sites, [], months=6, seed=1, processes=2).run()
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from Optimizer import optimize, profit_upper_bound
+from Simulation import Simulation
+
+
+@pytest.mark.parametrize("resources", [{"farms": 1, "waterpumps": 1, "mines": 1},
+                                       {"farms": 4, "waterpumps": 2, "mines": 6},
+                                       {"farms": 12, "waterpumps": 6, "mines": 18}])
+@pytest.mark.parametrize("price", [0.2, 1.25, 3.0])
+def test_profit_bound_holds_for_every_run(resources, price):
+    bound = profit_upper_bound(resources, price, 24, 0.1, 300)
+    for seed in range(5):
+        sim = Simulation(24, 0.1, 300, resources=resources, soda_price=price, backend="columnar",
+                         production_mode="sampled", seed=seed)
+        sim.run()
+        assert sim.history["profit"][-1] <= bound
+
+
+def test_optimize_scores_percentile_objective():
+    result = optimize(6, 0.05, 100, max_facilities=2, objective="p5", min_replicas=2, max_replicas=4, processes=2)
+    assert result.best is not None
+    assert result.best_score == max(c["score"] for c in result.candidates if c["replicas"] == result.best["replicas"])
+    assert np.isfinite(result.best_score)
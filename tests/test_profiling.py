@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from History import METRIC_NAMES
+from Profiling import COUNTERS, PHASES, Profiler
+from Simulation import Simulation
+
+
+@pytest.mark.parametrize("backend", ["agents", "columnar", "cohort"])
+def test_profiling_does_not_change_the_run(backend):
+    plain = Simulation(12, 0.05, 200, backend=backend, seed=5)
+    plain.run()
+    profiler = Profiler()
+    profiled = Simulation(12, 0.05, 200, backend=backend, seed=5, profiler=profiler)
+    profiled.run()
+    for metric in METRIC_NAMES:
+        np.testing.assert_array_equal(profiled.history[metric], plain.history[metric])
+
+
+def test_profiler_records_every_month():
+    seen = []
+    profiler = Profiler(callbacks=[seen.append])
+    sim = Simulation(12, 0.05, 200, backend="columnar", seed=5, profiler=profiler)
+    sim.run()
+    assert [record["month"] for record in seen] == list(range(1, 13))
+    totals = profiler.totals()
+    assert set(totals["seconds"]) == set(PHASES) and set(totals["counters"]) == set(COUNTERS)
+    assert totals["counters"]["agents_evaluated"] == 200 * 12
+    assert totals["counters"]["cans_demanded"] >= sim.history["sold"].sum()
+    assert totals["counters"]["events_triggered"] == len(sim.event_manager.event_history)
+    assert totals["counters"]["rng_draws"] > 0
+
+
+@pytest.mark.parametrize("backend", ["agents", "columnar", "cohort"])
+def test_purchases_count_buying_customers(backend):
+    profiler = Profiler()
+    sim = Simulation(6, 0.05, 300, backend=backend, seed=8, profiler=profiler)
+    sim.run()
+    months = profiler.months
+    assert all(0 < m["counters"]["purchases"] <= m["counters"]["cans_demanded"] for m in months)
+    assert all(m["counters"]["purchases"] <= 300 for m in months)
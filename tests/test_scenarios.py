@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from History import METRIC_NAMES
+from Scenarios import run_scenarios, scenario_grid
+from Simulation import Simulation
+
+RESOURCES = {"farms": 2, "waterpumps": 1, "mines": 3}
+
+
+@pytest.mark.parametrize("backend", ["columnar", "cohort"])
+def test_reference_scenario_replays_the_simulation(backend):
+    sim = Simulation(24, 0.05, 300, resources=RESOURCES, backend=backend, production_mode="sampled", seed=11)
+    sim.run()
+    result = run_scenarios([{"growth_rate": 0.05, "resources": RESOURCES}, {"soda_price": 1.6}], 24, 300,
+                           backend=backend, seed=11)
+    for metric in METRIC_NAMES:
+        np.testing.assert_allclose(result[metric][0], sim.history[metric], err_msg=metric)
+    np.testing.assert_array_equal(result.store_sales[0], sim.store_sales)
+
+
+def test_scenarios_share_customers_and_events():
+    scenarios = scenario_grid(growth_rate=[0.0, 0.1], soda_price=[1.0, 1.5])
+    result = run_scenarios(scenarios, 12, 300, seed=3)
+    assert len(result) == 4 and result["profit"].shape == (4, 12)
+    # A higher price never finds more buyers among the same customers and draws
+    assert np.all(result["demand"][0] >= result["demand"][1])
+    assert list(result.to_frame()["soda_price"]) == [1.0, 1.5, 1.0, 1.5]
+
+
+def test_stores_are_not_combined_with_a_population_file(tmp_path):
+    from Population import save_population
+
+    path = str(tmp_path / "customers.npz")
+    save_population(path, 200, seed=1, stores=7)
+    with pytest.raises(ValueError, match="stores"):
+        run_scenarios([{}], 3, 200, population_file=path, stores=12)
+    result = run_scenarios([{}], 3, 200, population_file=path)
+    assert result.store_sales.shape == (1, 7)
@@ -0,0 +1,31 @@
+import random
+
+import numpy as np
+
+import Population as population_module
+from Agent import create_population, simulate_market_agents
+from Population import Population
+from Simulation import Simulation
+
+
+def test_agent_columns_are_built_once_per_run(monkeypatch):
+    calls = []
+    from_agents = Population.from_agents.__func__
+
+    def counting(cls, agents, stores=None):
+        calls.append(len(agents))
+        return from_agents(cls, agents, stores)
+
+    monkeypatch.setattr(population_module.Population, "from_agents", classmethod(counting))
+    Simulation(12, 0.05, 200, backend="agents", seed=5).run()
+    assert calls == [200]
+
+
+def test_shared_agent_columns_give_the_same_market():
+    agents = create_population(300, rng=random.Random(1))
+    columns = Population.from_agents(agents)
+    for price in (1.0, 1.25, 2.5):
+        rebuilt = simulate_market_agents(agents, price, rng=random.Random(7))
+        shared = simulate_market_agents(agents, price, rng=random.Random(7), columns=columns)
+        assert rebuilt[:3] == shared[:3]
+        np.testing.assert_array_equal(rebuilt[3], shared[3])
@@ -0,0 +1,58 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pytest
+
+from Batch_Run import main as batch_main
+from Population import Population
+from Stores import StoreTable, resolve_stores, store_dtype, top_stores
+
+
+def test_resolve_stores_forms(tmp_path):
+    assert len(resolve_stores()) == 5
+    assert len(resolve_stores(300)) == 300
+    assert resolve_stores(["A", "B"]).names == ["A", "B"]
+    path = tmp_path / "stores.csv"
+    path.write_text("name,weight,region\nDowntown,3,north\nAirport,1,south\n")
+    table = resolve_stores(str(path))
+    assert table.names == ["Downtown", "Airport"]
+    np.testing.assert_allclose(table.weight, [0.75, 0.25])
+    assert table.sales_by(np.array([10, 4]), "region") == {"north": 10, "south": 4}
+    assert StoreTable.from_spec(table.spec).spec == table.spec
+
+
+def test_store_ids_use_smallest_dtype():
+    assert store_dtype(256) == np.uint8
+    assert store_dtype(257) == np.uint16
+    population = Population.generate(1000, np.random.default_rng(1), resolve_stores(2000))
+    assert population.location.dtype == np.uint16
+    assert population.location.max() < 2000
+
+
+def test_top_stores_sums_the_rest():
+    sales = np.arange(20)
+    labels, values = top_stores(sales, resolve_stores(20), n=3)
+    assert labels == ["Store 20", "Store 19", "Store 18", "Other (17 stores)"]
+    assert sum(values) == sales.sum()
+
+
+def test_store_weights_must_match_count():
+    with pytest.raises(ValueError):
+        StoreTable(3, weight=[1, 2])
+
+
+@pytest.mark.parametrize("stores", [None, 12])
+def test_batch_run_writes_history_and_store_sales(tmp_path, stores):
+    config = tmp_path / "batch.json"
+    config.write_text(json.dumps({"defaults": {"population_size": 50, "seed": 3, "stores": stores},
+                                  "runs": [{"name": "small"}]}))
+    output = tmp_path / "results"
+    batch_main([str(config), "--output", str(output)])
+    with open(output / "small.csv") as f:
+        assert len(list(csv.reader(f))) == 13  # Header and 12 months
+    assert os.path.exists(output / "small_stores.csv") == (stores is not None)
+    if stores is not None:
+        with open(output / "small_stores.csv") as f:
+            assert len(list(csv.DictReader(f))) == stores
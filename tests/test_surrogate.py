@@ -0,0 +1,56 @@
+import numpy as np
+
+import Surrogate
+from Surrogate import PARAMETERS, TARGETS, Surrogate as Model, analytic_baseline, sample_design, settings_matrix
+
+QUERY = {"growth_rate": 0.05, "population_size": 500, "farms": 3, "waterpumps": 2, "mines": 4, "soda_price": 1.5}
+
+
+def small_model():
+    rng = np.random.default_rng(0)
+    points = [{**params, "years": int(rng.integers(1, 11))} for params in sample_design(40, rng)]
+    settings = settings_matrix(points)
+    means = analytic_baseline(settings)
+    return Model(settings, means, np.abs(means) * 0.1 + 1.0, np.full(len(points), 4),
+                 length_scale=np.full(len(PARAMETERS), 0.5), amplitude=0.3)
+
+
+def test_observe_learns_only_years_in_the_training_range():
+    model = small_model()
+    summary = np.ones((1000, len(TARGETS)))  # A 1000-year run
+    assert model.observe(QUERY, summary) == 10
+    assert len(model) == 50 and model.observed == 10
+
+
+def test_observed_points_are_capped(monkeypatch):
+    monkeypatch.setattr(Surrogate, "MAX_OBSERVED", 15)
+    monkeypatch.setattr(Surrogate, "REFIT_BATCH", 5)
+    model = small_model()
+    trained = model.settings.copy()
+    for price in (1.0, 1.5, 2.0):
+        model.observe({**QUERY, "soda_price": price}, np.ones((10, len(TARGETS))))
+    # The third run passed the cap: back down to 10 points, the newest ones
+    assert len(model) == 40 + 10 and model.observed == 10
+    np.testing.assert_array_equal(model.settings[:40], trained)
+    assert set(model.settings[40:, PARAMETERS.index("soda_price")]) == {2.0}
+    assert len(model._fitted[0]) == len(model)
+
+
+def test_observe_extends_the_factorization():
+    model = small_model()
+    model.observe(QUERY, np.ones((4, len(TARGETS))))
+    points, whiten, noise = model._fitted[0], model._fitted[1], model._fitted[-1]
+    assert len(points) == 44
+    cov = Surrogate._kernel(points, points, model.length_scale, model.amplitude) + np.diag(noise + 1e-6)
+    np.testing.assert_allclose(whiten @ cov @ whiten.T, np.eye(44), atol=1e-6)
+
+
+def test_save_and_load_keep_observed_points(tmp_path):
+    model = small_model()
+    model.observe(QUERY, np.ones((3, len(TARGETS))))
+    model.save(tmp_path / "surrogate.npz")
+    loaded = Model.load(tmp_path / "surrogate.npz")
+    assert loaded.observed == 3
+    model.fit()  # Loading refits in full, while observe() only extended the fit
+    assert loaded.predict({**QUERY, "years": 2})["total_profit"]["mean"] == model.predict(
+        {**QUERY, "years": 2})["total_profit"]["mean"]